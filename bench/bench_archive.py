@@ -0,0 +1,90 @@
+# bench/bench_archive.py
+#
+# records a crawl of a synthetic site (served by the local cache server
+# emulator, utils/cache_server.py) into an archive, then replays the
+# same crawl from the archive (crawler2/archive.py)
+#
+# reports the throughput of:
+#   -   the recorded crawl (cache server protocol over HTTP)
+#   -   the replayed crawl (whole worker pipeline, no network)
+#   -   reading every record of the archive
+#
+# --quiet disables logging (the crawler logs every page to the console)
+#
+# usage: python -m bench.bench_archive [--pages N] [--threads N] [--quiet] [--config config.ini]
+
+from argparse import ArgumentParser
+from configparser import ConfigParser
+from crawler2.archive import ArchiveReader, INDEX_FILE
+from crawler2.crawler import Crawler
+from utils.cache_server import start_local_cache_server
+from utils.config import Config
+import logging
+import os
+import tempfile
+import time
+
+
+def crawl(config):
+    """Crawls until the frontier is empty.
+    Returns the amount of nurls and the elapsed time.
+    """
+    crawler = Crawler(config, True, True)
+    start = time.perf_counter()
+    crawler.start_async()
+    crawler.frontier.nurls.join()
+    elapsed = time.perf_counter() - start
+
+    nurls = len(crawler.frontier.nap.dict)
+    crawler.frontier.nap.close()
+    return nurls, elapsed
+
+
+def main(args):
+    if args.quiet:
+        logging.disable(logging.INFO)
+
+    cparser = ConfigParser()
+    cparser.read(args.config)
+    config = Config(cparser)
+    config.threads_count = args.threads
+    config.time_delay = 0.0
+    config.politeness_floor = config.politeness_ceiling = 0.0
+    config.local_cache = {"SOURCE": "synthetic", "PAGES": str(args.pages)}
+
+    with tempfile.TemporaryDirectory() as tmp:
+        archive = os.path.join(tmp, "archive")
+        config.save_file = os.path.join(tmp, "bench.nap")
+        config.cache_server = start_local_cache_server(config)
+
+        config.archive = {"RECORD": archive}
+        recorded, record_time = crawl(config)
+
+        config.archive = {"REPLAY": archive}
+        replayed, replay_time = crawl(config)
+
+        reader = ArchiveReader(archive)
+        with open(os.path.join(archive, INDEX_FILE), "r", encoding="utf-8") as fh:
+            urls = [line.rstrip("\n").split("\t", 4)[4] for line in fh]
+        start = time.perf_counter()
+        for url in urls:
+            reader.get(url)
+        read_time = time.perf_counter() - start
+        reader.close()
+
+        size = sum(os.path.getsize(os.path.join(archive, name)) for name in os.listdir(archive))
+
+    print(f"archive:     {len(urls)} records, {size / 1e6:.2f} MB")
+    print(f"recorded:    {recorded} nurls in {record_time:.2f}s ({recorded / record_time:.1f} pages/s)")
+    print(f"replayed:    {replayed} nurls in {replay_time:.2f}s ({replayed / replay_time:.1f} pages/s)")
+    print(f"read:        {len(urls) / read_time:.0f} records/s")
+
+
+if __name__ == "__main__":
+    parser = ArgumentParser()
+    parser.add_argument("--pages", type=int, default=500)
+    parser.add_argument("--threads", type=int, default=4)
+    parser.add_argument("--quiet", action="store_true", default=False)
+    parser.add_argument("--config", type=str, default="config.ini")
+    args = parser.parse_args()
+    main(args)
@@ -0,0 +1,65 @@
+# bench/bench_batch.py
+#
+# downloads the pages of a synthetic site from the local cache server
+# emulator (utils/cache_server.py) with worker threads, the way the
+# workers download them (see worker_get_resp), and reports the throughput:
+#   -   single      one request per URL, under the global polite mutex
+#   -   batched     URLs coalesced by crawler2/batch.py (BATCH = --batch)
+#
+# --latency is the latency of every response of the cache server,
+# --politeness the delay of the global polite mutex
+#
+# usage: python -m bench.bench_batch [--pages N] [--threads N]
+#        [--batch N] [--latency S] [--politeness S]
+
+from argparse import ArgumentParser
+from concurrent.futures import ThreadPoolExecutor
+from crawler2.batch import BatchDownloader
+from crawler2.polmut import PoliteMutex
+from types import SimpleNamespace
+from utils.cache_server import CacheServer, SyntheticSite
+from utils.download import download
+import time
+
+
+def run(urls, threads, fetch):
+    start = time.perf_counter()
+    with ThreadPoolExecutor(threads) as executor:
+        statuses = list(executor.map(fetch, urls))
+    elapsed = time.perf_counter() - start
+    assert all(status == 200 for status in statuses)
+    return elapsed
+
+
+def main(args):
+    site = SyntheticSite(pages=args.pages, links=0)
+    server = CacheServer(site, latency=args.latency)
+    config = SimpleNamespace(cache_server=server.start(), user_agent="IR_BENCH")
+    urls = [f"{site.base_url}page/{n}" for n in range(args.pages)]
+
+    try:
+        dpolmut = PoliteMutex(args.politeness)
+        def single(url):
+            with dpolmut:
+                return download(url, config).status
+        elapsed = run(urls, args.threads, single)
+        print(f"single:   {elapsed:.2f}s, {len(urls) / elapsed:.1f} pages/s")
+
+        batcher = BatchDownloader(config, None, PoliteMutex(args.politeness), args.batch)
+        elapsed = run(urls, args.threads, lambda url: batcher.download(url).status)
+        stats = batcher.stats()
+        print(f"batched:  {elapsed:.2f}s, {len(urls) / elapsed:.1f} pages/s "
+              f"({stats['batches']} batches, {stats['per_batch']} URLs per batch)")
+    finally:
+        server.stop()
+
+
+if __name__ == "__main__":
+    parser = ArgumentParser()
+    parser.add_argument("--pages", type=int, default=200)
+    parser.add_argument("--threads", type=int, default=8)
+    parser.add_argument("--batch", type=int, default=8)
+    parser.add_argument("--latency", type=float, default=0.02)
+    parser.add_argument("--politeness", type=float, default=0.0)
+    args = parser.parse_args()
+    main(args)
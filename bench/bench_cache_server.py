@@ -0,0 +1,99 @@
+# bench/bench_cache_server.py
+#
+# crawls a synthetic site through the local cache server emulator
+# (utils/cache_server.py) with no network, and reports the throughput
+# of the whole crawler (download, parse, dedup, frontier)
+#
+# politeness is disabled unless --politeness is given, so the
+# throughput is bounded by the crawler and the injected latency
+# --ceiling lets the per-host delay adapt between --politeness and
+# the ceiling (see crawler2/pacer.py)
+#
+# the throughput and error rate of every host are reported,
+# and so are the latencies of the worker pipeline stages (see crawler2/stages.py)
+#
+# usage: python -m bench.bench_cache_server [--pages N] [--threads N]
+#        [--latency S] [--jitter S] [--error_rate P]
+#        [--politeness S] [--ceiling S] [--config config.ini]
+
+from argparse import ArgumentParser
+from configparser import ConfigParser
+from crawler2.crawler import Crawler
+from utils.cache_server import start_local_cache_server
+from utils.config import Config
+import os
+import tempfile
+import time
+
+
+def main(args):
+    cparser = ConfigParser()
+    cparser.read(args.config)
+    config = Config(cparser)
+    config.threads_count = args.threads
+    config.time_delay = args.politeness
+    config.politeness_floor = args.politeness
+    config.politeness_ceiling = max(args.ceiling, args.politeness)
+    config.local_cache = {
+        "SOURCE": "synthetic",
+        "PAGES": str(args.pages),
+        "LINKS": str(args.links),
+        "LATENCY": str(args.latency),
+        "JITTER": str(args.jitter),
+        "ERROR_RATE": str(args.error_rate),
+        "SEED": str(args.seed),
+    }
+
+    with tempfile.TemporaryDirectory() as tmp:
+        config.save_file = os.path.join(tmp, "bench.nap")
+        config.cache_server = start_local_cache_server(config)
+
+        # workers block on an empty frontier, so wait for every
+        # queued nurl to be processed instead of joining the workers
+        crawler = Crawler(config, True, True)
+        start = time.perf_counter()
+        crawler.start_async()
+        crawler.frontier.nurls.join()
+        elapsed = time.perf_counter() - start
+
+        nurls = list(crawler.frontier.nap.dict.values())
+        hosts = crawler.frontier.host_stats()
+        stages = crawler.frontier.stages.stats()
+        crawler.frontier.nap.close()
+
+    finishes = dict()
+    for dic in nurls:
+        finishes[dic["finish"]] = finishes.get(dic["finish"], 0) + 1
+
+    print(f"pages:       {len(nurls)}")
+    print(f"elapsed:     {elapsed:.2f}s")
+    print(f"throughput:  {len(nurls) / elapsed:.1f} pages/s")
+    print("nurls by finish state:")
+    for finish, cnt in sorted(finishes.items()):
+        print(f"{' ' * 4}finish={finish:#x}: {cnt}")
+    print("hosts:")
+    for base_url, stats in hosts.items():
+        print(f"{' ' * 4}{base_url}: {stats['requests']} requests, "
+              f"{stats['throughput']:.1f} req/s, {stats['error_rate']:.1%} 5xx, "
+              f"latency {stats['latency'] * 1e3:.1f}ms, delay {stats['delay']:.3f}s")
+    print("stages (ms):")
+    print(f"{' ' * 4}{'stage':<14}{'count':>7}{'total':>10}{'p50':>9}{'p95':>9}{'p99':>9}")
+    for name, stats in stages.items():
+        print(f"{' ' * 4}{name:<14}{stats['count']:>7}{stats['total'] * 1e3:>10.1f}"
+              f"{stats['p50'] * 1e3:>9.3f}{stats['p95'] * 1e3:>9.3f}{stats['p99'] * 1e3:>9.3f}")
+
+
+if __name__ == "__main__":
+    parser = ArgumentParser()
+    parser.add_argument("--pages", type=int, default=500)
+    parser.add_argument("--links", type=int, default=20)
+    parser.add_argument("--threads", type=int, default=4)
+    parser.add_argument("--latency", type=float, default=0.0)
+    parser.add_argument("--jitter", type=float, default=0.0)
+    parser.add_argument("--error_rate", type=float, default=0.0)
+    parser.add_argument("--politeness", type=float, default=0.0)
+    parser.add_argument("--ceiling", type=float, default=0.0)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--config", type=str, default="config.ini")
+    args = parser.parse_args()
+    main(args)
@@ -0,0 +1,111 @@
+# bench/bench_canonical.py
+#
+# measures the reduction in fetches from URL canonicalization
+# (utils/canonical.py) on a recorded crawl
+#
+# every URL of the recorded crawl is hashed with the old normalize
+# (strip trailing slashes) and with the canonicalizer; each hash that
+# collapses into an existing canonical hash is a fetch that is saved
+#
+# if no nap file is given, the URLs are the links of the fixture pages
+# plus variants of them (host case, default port, tracking parameters,
+# index files and parameter order)
+#
+# usage: python -m bench.bench_canonical [napfile] [--config config.ini]
+
+from argparse import ArgumentParser
+from configparser import ConfigParser
+from urllib.parse import urljoin, urldefrag
+from utils.canonical import Canonicalizer
+from utils import get_urlhash
+import msgpack
+import random
+import re
+import time
+
+
+def _old_normalize(url):
+    """utils.normalize before canonicalization."""
+    if url.endswith("/"):
+        return url.rstrip("/")
+    return url
+
+
+def nap_urls(napfile):
+    """Returns (url, finish) for every nurl in the nap.
+    The dict is read as it was saved: loading it as a Nap would
+    rekey (and merge) the nurls of naps older than ver4.
+    """
+    with open(napfile, "rb") as fh:
+        size = int.from_bytes(fh.read(4), "little")
+        data = msgpack.unpackb(fh.read(size), raw=False)
+    return [(dic["url"], dic["finish"]) for dic in data.values()]
+
+
+def fixture_urls(seed=121):
+    """Returns (url, None) for the links of the fixture pages and their variants."""
+    from test.fixtures import FIXTURE_BASE_URL, page_names, read_page
+
+    rng = random.Random(seed)
+    urls = []
+    for name in page_names():
+        base = FIXTURE_BASE_URL + name
+        for href in re.findall(rb'href="([^"]*)"', read_page(name)):
+            url = urldefrag(urljoin(base, href.decode("utf-8"))).url
+            if not url.startswith("http"):
+                continue
+            urls.append(url)
+
+            # variants that are seen when crawling the same site
+            sep = "&" if "?" in url else "?"
+            urls.append(url + f"{sep}utm_source=feed&utm_medium=rss")
+            urls.append(url.replace("://www.", "://WWW.", 1))
+            urls.append(url.replace(".edu/", ".edu:443/", 1) if url.startswith("https") else url)
+            urls.append(url.rstrip("/") + "/index.html" if sep == "?" else url)
+            urls.append(url + f"{sep}sid={rng.getrandbits(32):08x}")
+    return [(url, None) for url in urls]
+
+
+def main(napfile, config_file):
+    options = dict()
+    cparser = ConfigParser()
+    if cparser.read(config_file) and cparser.has_section("CANONICAL"):
+        options = dict(cparser["CANONICAL"])
+    canon = Canonicalizer.from_options(options)
+
+    urls = nap_urls(napfile) if napfile else fixture_urls()
+
+    old_hashes = {get_urlhash(_old_normalize(url)) for url, _ in urls}
+
+    start = time.perf_counter()
+    canonical = [canon.canonicalize(url) for url, _ in urls]
+    elapsed = time.perf_counter() - start
+    new_hashes = {get_urlhash(url) for url in canonical}
+
+    # finish states of URLs that collapse into an earlier canonical URL
+    # i.e. fetches that were only caught after downloading
+    collapsed = dict()
+    seen = set()
+    for (url, finish), canonical_url in zip(urls, canonical):
+        if canonical_url in seen:
+            collapsed[finish] = collapsed.get(finish, 0) + 1
+        seen.add(canonical_url)
+
+    saved = len(old_hashes) - len(new_hashes)
+    print(f"URLs:                  {len(urls)}")
+    print(f"unique (old normalize): {len(old_hashes)}")
+    print(f"unique (canonical):     {len(new_hashes)}")
+    print(f"fetches saved:          {saved} ({100 * saved / max(1, len(old_hashes)):.1f}%)")
+    print(f"canonicalize:           {len(urls) / elapsed:.0f} URLs/s")
+    if napfile:
+        print("collapsed URLs by finish state:")
+        for finish, cnt in sorted(collapsed.items(), key=lambda x: str(x[0])):
+            print(f"{' ' * 4}finish={finish}: {cnt}")
+
+
+if __name__ == "__main__":
+    parser = ArgumentParser()
+    parser.add_argument("napfile", nargs="?", default=None)
+    parser.add_argument("--config", type=str, default="config.ini")
+    args = parser.parse_args()
+    main(args.napfile, args.config)
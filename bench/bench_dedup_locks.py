@@ -0,0 +1,93 @@
+# bench/bench_dedup_locks.py
+#
+# contention benchmark for the dedup buckets (crawler2/buckets.py)
+#
+# each thread repeatedly does what a worker does per page:
+#   -   writes a nurl to the nap (nap.mutex)
+#   -   claims an exact bucket (dedup)
+# while the nap autosaves in the background (nap.mutex held for the save)
+#
+# modes:
+#   -   global: dedup claims are wrapped in nap.mutex (old behaviour)
+#   -   striped: dedup claims lock only the stripe of the bucket
+#
+# reports pages/s and the p50/p99 latency of the dedup claim
+#
+# usage: python -m bench.bench_dedup_locks [--pages N] [--preload N]
+
+from argparse import ArgumentParser
+from crawler2.nap import Nap
+from crawler2.nurl import Nurl
+from threading import Thread
+import os
+import random
+import tempfile
+import time
+
+
+THREADS = [4, 16, 64]
+
+
+def _preload(nap, count):
+    """Fills the nap with nurls so that saving is expensive."""
+    words = {f"word{i}": i for i in range(200)}
+    for i in range(count):
+        nurl = Nurl(f"https://www.ics.uci.edu/preload/{i}")
+        nurl.words = words
+        nap[nurl.url] = nurl
+
+
+def _run(nap, threads, pages, mode):
+    latencies = [[] for _ in range(threads)]
+
+    def work(tid):
+        rng = random.Random(tid)
+        lat = latencies[tid]
+        for i in range(pages):
+            nurl = Nurl(f"https://www.ics.uci.edu/t{tid}/{i}")
+            nap[nurl.url] = nurl
+
+            # 1 in 4 pages is an exact duplicate of an earlier page
+            key = f"{rng.randrange(pages * threads * 4):016x}"
+            start = time.perf_counter()
+            if mode == "global":
+                with nap.mutex:
+                    nap.exdict.claim(key, nurl.hash)
+            else:
+                nap.exdict.claim(key, nurl.hash)
+            lat.append(time.perf_counter() - start)
+
+    workers = [Thread(target=work, args=(tid,)) for tid in range(threads)]
+    start = time.perf_counter()
+    for t in workers:
+        t.start()
+    for t in workers:
+        t.join()
+    elapsed = time.perf_counter() - start
+
+    lat = sorted(x for l in latencies for x in l)
+    p50 = lat[len(lat) // 2] * 1e6
+    p99 = lat[int(len(lat) * 0.99)] * 1e6
+    return threads * pages / elapsed, p50, p99
+
+
+def main(pages, preload):
+    tmpdir = tempfile.mkdtemp()
+    print(f"{'mode':<8} {'threads':>7} {'pages/s':>10} {'p50 us':>8} {'p99 us':>10}")
+    for threads in THREADS:
+        for mode in ("global", "striped"):
+            fname = os.path.join(tmpdir, f"{mode}-{threads}.nap")
+            nap = Nap(fname, autosave_interval=0.05, autosave_threshold=1)
+            _preload(nap, preload)
+            rate, p50, p99 = _run(nap, threads, pages, mode)
+            nap.close()
+            os.remove(fname)
+            print(f"{mode:<8} {threads:>7} {rate:>10.0f} {p50:>8.1f} {p99:>10.1f}")
+
+
+if __name__ == "__main__":
+    parser = ArgumentParser()
+    parser.add_argument("--pages", type=int, default=500)
+    parser.add_argument("--preload", type=int, default=5000)
+    args = parser.parse_args()
+    main(args.pages, args.preload)
@@ -0,0 +1,31 @@
+# bench/bench_parser.py
+#
+# compares the HTML backends of helpers/parser.py
+# over the fixture corpus (pages/s and MB/s)
+#
+# usage: python -m bench.bench_parser [--rounds N]
+
+from argparse import ArgumentParser
+from helpers.parser import HTML_BACKENDS
+from test.fixtures import FIXTURE_BASE_URL, page_names, read_page
+import time
+
+
+def main(rounds):
+    pages = [(FIXTURE_BASE_URL + name, read_page(name)) for name in page_names()]
+    size = sum(len(content) for _, content in pages) * rounds
+
+    for name, backend in HTML_BACKENDS.items():
+        start = time.perf_counter()
+        for _ in range(rounds):
+            for url, content in pages:
+                backend(content, url)
+        elapsed = time.perf_counter() - start
+        print(f"{name:<6} {len(pages) * rounds / elapsed:>8.0f} pages/s {size / elapsed / 1e6:>8.2f} MB/s")
+
+
+if __name__ == "__main__":
+    parser = ArgumentParser()
+    parser.add_argument("--rounds", type=int, default=200)
+    args = parser.parse_args()
+    main(args.rounds)
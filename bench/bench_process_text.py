@@ -0,0 +1,82 @@
+# bench/bench_process_text.py
+#
+# compares the list-based text pipeline (to_tokens -> word_count -> simhash)
+# with the streaming pipeline (count_tokens with a simhash accumulator)
+# on the longest page (time per page and peak memory)
+#
+# the longest page of the crawl (REPORT.txt) had 59249 words
+# the page is made by repeating the text of the fixture pages
+# until it has at least --words words
+#
+# usage: python -m bench.bench_process_text [--words N] [--rounds N]
+
+from argparse import ArgumentParser
+from helpers.parser import parse_html_bs4
+from helpers.simengine import get_engine
+from helpers.simhash import simhash
+from helpers.word_count import count_tokens, to_tokens, word_count
+from test.fixtures import FIXTURE_BASE_URL, page_names, read_page
+import time
+import tracemalloc
+
+
+def list_pipeline(text_content):
+    tokens = to_tokens(text_content)
+    words = word_count(tokens)
+    return words, simhash(words)
+
+
+def stream_pipeline(text_content):
+    accumulator = get_engine("simhash").accumulator()
+    words = count_tokens(text_content, accumulator)
+    return words, accumulator.fingerprint(words)
+
+
+PIPELINES = {
+    "list": list_pipeline,
+    "stream": stream_pipeline,
+}
+
+
+def long_page(min_words):
+    """Returns the text content of a page with at least min_words words."""
+    texts = []
+    for name in page_names():
+        texts.extend(parse_html_bs4(read_page(name), FIXTURE_BASE_URL + name)[1])
+
+    text_content = []
+    nwords = 0
+    while nwords < min_words:
+        for text in texts:
+            text_content.append(text)
+            nwords += len(text.split())
+    return text_content, nwords
+
+
+def main(min_words, rounds):
+    text_content, nwords = long_page(min_words)
+    print(f"page: {nwords} words, {len(text_content)} text partitions")
+
+    results = {name: pipeline(text_content) for name, pipeline in PIPELINES.items()}
+    assert results["list"] == results["stream"]
+
+    for name, pipeline in PIPELINES.items():
+        start = time.perf_counter()
+        for _ in range(rounds):
+            pipeline(text_content)
+        elapsed = (time.perf_counter() - start) / rounds
+
+        tracemalloc.start()
+        pipeline(text_content)
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+        print(f"{name:<7} {elapsed * 1000:>8.1f} ms/page {peak / 1e6:>8.2f} MB peak")
+
+
+if __name__ == "__main__":
+    parser = ArgumentParser()
+    parser.add_argument("--words", type=int, default=59249)
+    parser.add_argument("--rounds", type=int, default=10)
+    args = parser.parse_args()
+    main(args.words, args.rounds)
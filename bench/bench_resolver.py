@@ -0,0 +1,78 @@
+# bench/bench_resolver.py
+#
+# compares link resolution before and after utils.resolver.UrlResolver
+# on the hrefs of the fixture pages
+#
+#   -   old: urljoin + urldefrag + normalize per href, then Nurl(url)
+#       normalizes and hashes the URL again
+#   -   new: one UrlResolver per page; Nurl(url, urlhash) reuses the hash
+#
+# usage: python -m bench.bench_resolver [--rounds N]
+
+from argparse import ArgumentParser
+from crawler2.nurl import Nurl
+from test.fixtures import FIXTURE_BASE_URL, page_names, read_page
+from utils.resolver import UrlResolver, resolve_url
+import re
+import time
+
+
+def fixture_hrefs():
+    """Returns (base URL, hrefs) for every fixture page."""
+    pages = []
+    for name in page_names():
+        hrefs = [href.decode("utf-8") for href in re.findall(rb'href="([^"]*)"', read_page(name))]
+        pages.append((FIXTURE_BASE_URL + name, hrefs))
+    return pages
+
+
+def old_links(base_url, hrefs):
+    links = set()
+    for href in hrefs:
+        url = resolve_url(base_url, href)
+        if url is not None:
+            links.add(url)
+    return [Nurl(url) for url in links]
+
+
+def new_links(base_url, hrefs):
+    links = dict()
+    resolver = UrlResolver(base_url)
+    for href in hrefs:
+        resolved = resolver.resolve(href)
+        if resolved:
+            links[resolved[0]] = resolved[1]
+    return [Nurl(url, urlhash) for url, urlhash in links.items()]
+
+
+def bench(fn, pages, rounds):
+    start = time.perf_counter()
+    for _ in range(rounds):
+        for base_url, hrefs in pages:
+            fn(base_url, hrefs)
+    return time.perf_counter() - start
+
+
+def main(rounds):
+    pages = fixture_hrefs()
+    total = sum(len(hrefs) for _, hrefs in pages) * rounds
+
+    # same links and hashes
+    for base_url, hrefs in pages:
+        old = {n.url: n.hash for n in old_links(base_url, hrefs)}
+        new = {n.url: n.hash for n in new_links(base_url, hrefs)}
+        assert old == new, base_url
+
+    old_time = bench(old_links, pages, rounds)
+    new_time = bench(new_links, pages, rounds)
+    print(f"hrefs:    {total}")
+    print(f"old:      {total / old_time:.0f} hrefs/s ({old_time:.3f}s)")
+    print(f"resolver: {total / new_time:.0f} hrefs/s ({new_time:.3f}s)")
+    print(f"speedup:  {old_time / new_time:.2f}x")
+
+
+if __name__ == "__main__":
+    parser = ArgumentParser()
+    parser.add_argument("--rounds", type=int, default=50)
+    args = parser.parse_args()
+    main(args.rounds)
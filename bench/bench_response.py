@@ -0,0 +1,114 @@
+# bench/bench_response.py
+#
+# measures the per-page savings of decoding cache server responses into
+# a compact RawResponse (utils/response.py) over unpickling a full
+# requests.Response, on the fixture corpus
+#
+# each page is pickled like the cache server does (a requests.Response
+# with its request, cookies, headers and elapsed time) and wrapped in CBOR
+#
+# reports, per page:
+#   -   decode time (CBOR + pickle)
+#   -   memory retained by a decoded response (tracemalloc)
+#
+# usage: python -m bench.bench_response [--rounds N] [--keep N]
+
+from argparse import ArgumentParser
+from test.fixtures import FIXTURE_BASE_URL, page_names, read_page
+from utils.response import Response
+import cbor
+import datetime
+import pickle
+import requests
+import time
+import tracemalloc
+
+
+# headers of a typical origin response
+ORIGIN_HEADERS = {
+    "Date": "Mon, 19 Oct 2026 10:00:00 GMT",
+    "Server": "Apache/2.4.37 (Red Hat Enterprise Linux)",
+    "Last-Modified": "Mon, 05 Oct 2026 10:00:00 GMT",
+    "ETag": '"3a5f-5f1c2b3d4e5f6"',
+    "Accept-Ranges": "bytes",
+    "Vary": "Accept-Encoding",
+    "Content-Encoding": "gzip",
+    "Keep-Alive": "timeout=5, max=100",
+    "Connection": "Keep-Alive",
+    "Content-Type": "text/html; charset=UTF-8",
+}
+
+
+def cache_body(url, content):
+    """Returns the CBOR body of a cache server response of the page."""
+    raw = requests.Response()
+    raw.url = url
+    raw.status_code = 200
+    raw.reason = "OK"
+    raw._content = content
+    raw.encoding = "UTF-8"
+    raw.headers.update(ORIGIN_HEADERS)
+    raw.request = requests.Request("GET", url, headers={"User-Agent": "IR_US24"}).prepare()
+    raw.cookies.set("JSESSIONID", "0123456789abcdef", domain="www.ics.uci.edu")
+    raw.elapsed = datetime.timedelta(milliseconds=120)
+    return cbor.dumps({"url": url, "status": 200, "response": pickle.dumps(raw)})
+
+
+def decode_full(body):
+    """Decodes like before (unpickles a requests.Response)."""
+    resp_dict = cbor.loads(body)
+    resp = Response.__new__(Response)
+    resp.url = resp_dict["url"]
+    resp.status = resp_dict["status"]
+    resp.error = None
+    resp.raw_response = pickle.loads(resp_dict["response"])
+    return resp
+
+
+def decode_compact(body):
+    """Decodes into a RawResponse (see utils.download.download)."""
+    return Response(cbor.loads(body))
+
+
+def _time(func, bodies, rounds):
+    start = time.perf_counter()
+    for _ in range(rounds):
+        for body in bodies:
+            func(body)
+    return (time.perf_counter() - start) / (rounds * len(bodies))
+
+
+def _retained(func, bodies, keep):
+    """Returns the bytes retained per decoded response."""
+    bodies = (bodies * (keep // len(bodies) + 1))[:keep]
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    kept = [func(body) for body in bodies]
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del kept
+    return (after - before) / len(bodies)
+
+
+def main(rounds, keep):
+    bodies = [cache_body(FIXTURE_BASE_URL + name, read_page(name)) for name in page_names()]
+    body_len = sum(len(read_page(name)) for name in page_names()) / len(bodies)
+
+    t_full = _time(decode_full, bodies, rounds)
+    t_compact = _time(decode_compact, bodies, rounds)
+    m_full = _retained(decode_full, bodies, keep)
+    m_compact = _retained(decode_compact, bodies, keep)
+
+    print(f"pages:    {len(bodies)} (avg body {body_len:.0f} bytes)")
+    print(f"decode:   {t_full * 1e6:>7.1f} -> {t_compact * 1e6:>7.1f} us/page "
+          f"({t_full / t_compact:.2f}x)")
+    print(f"retained: {m_full:>7.0f} -> {m_compact:>7.0f} bytes/page "
+          f"(body included, saved {m_full - m_compact:.0f} bytes/page)")
+
+
+if __name__ == "__main__":
+    parser = ArgumentParser()
+    parser.add_argument("--rounds", type=int, default=500)
+    parser.add_argument("--keep", type=int, default=2000)
+    args = parser.parse_args()
+    main(args.rounds, args.keep)
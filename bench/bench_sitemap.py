@@ -0,0 +1,69 @@
+# bench/bench_sitemap.py
+#
+# compares the BeautifulSoup sitemap parser (the original parser) with the
+# streaming sitemap reader (helpers/sitemap.py) on a generated sitemap
+# (time and peak memory)
+#
+# usage: python -m bench.bench_sitemap [--entries N] [--gzip]
+
+from argparse import ArgumentParser
+from bs4 import BeautifulSoup
+from helpers.sitemap import iter_sitemap
+import gzip
+import time
+import tracemalloc
+
+
+BASE_URL = "https://www.ics.uci.edu/sitemap.xml"
+
+
+def make_sitemap(entries):
+    urls = "".join(
+        f"<url><loc>https://www.ics.uci.edu/page/{i}</loc>"
+        f"<lastmod>2024-10-{i % 28 + 1:02d}</lastmod><priority>0.{i % 10}</priority></url>"
+        for i in range(entries)
+    )
+    return (
+        '<?xml version="1.0" encoding="UTF-8"?>'
+        f'<urlset xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">{urls}</urlset>'
+    ).encode("utf-8")
+
+
+def soup_reader(content):
+    soup = BeautifulSoup(content, "lxml-xml")
+    return sum(1 for url in soup.urlset.find_all("url") if url.loc)
+
+
+def stream_reader(content):
+    return sum(1 for _ in iter_sitemap(content, BASE_URL))
+
+
+def main(entries, compress):
+    content = make_sitemap(entries)
+    print(f"sitemap: {entries} entries, {len(content) / 1e6:.2f} MB")
+
+    readers = {"stream": stream_reader}
+    if compress:
+        content = gzip.compress(content)
+        print(f"gzip: {len(content) / 1e6:.2f} MB (not supported by soup)")
+    else:
+        readers["soup"] = soup_reader
+
+    for name, reader in readers.items():
+        start = time.perf_counter()
+        count = reader(content)
+        elapsed = time.perf_counter() - start
+
+        tracemalloc.start()
+        reader(content)
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        print(f"{name:<7} {count:>8} URLs {elapsed * 1000:>8.1f} ms {peak / 1e6:>8.2f} MB peak")
+
+
+if __name__ == "__main__":
+    parser = ArgumentParser()
+    parser.add_argument("--entries", type=int, default=50000)
+    parser.add_argument("--gzip", action="store_true")
+    args = parser.parse_args()
+    main(args.entries, args.gzip)
@@ -0,0 +1,41 @@
+# bench/bench_tokenize.py
+#
+# compares tokenize (compiled) with tokenize_graphemes (reference)
+# over the text of the fixture corpus (MB/s of text)
+#
+# usage: python -m bench.bench_tokenize [--rounds N]
+
+from argparse import ArgumentParser
+from helpers.parser import parse_html_bs4
+from helpers.tokenize import tokenize, tokenize_graphemes
+from test.fixtures import FIXTURE_BASE_URL, page_names, read_page
+import time
+
+
+TOKENIZERS = {
+    "compiled": tokenize,
+    "graphemes": tokenize_graphemes,
+}
+
+
+def main(rounds):
+    texts = [
+        " ".join(parse_html_bs4(read_page(name), FIXTURE_BASE_URL + name)[1])
+        for name in page_names()
+    ]
+    size = sum(len(text.encode("utf-8")) for text in texts) * rounds
+
+    for name, tokenizer in TOKENIZERS.items():
+        start = time.perf_counter()
+        for _ in range(rounds):
+            for text in texts:
+                tokenizer(text)
+        elapsed = time.perf_counter() - start
+        print(f"{name:<10} {size / elapsed / 1e6:>8.2f} MB/s")
+
+
+if __name__ == "__main__":
+    parser = ArgumentParser()
+    parser.add_argument("--rounds", type=int, default=200)
+    args = parser.parse_args()
+    main(args.rounds)
@@ -0,0 +1,73 @@
+# bench/bench_urlfilter.py
+#
+# compares the original scraper2.is_valid (a regex string and a set built
+# per call, urlparse, and a chain of endswith) with utils.urlfilter.UrlFilter
+# (per URL and batched) on the links of the link-heavy fixture pages
+#
+# usage: python -m bench.bench_urlfilter [--rounds N]
+
+from argparse import ArgumentParser
+from helpers.parser import parse_html_lxml
+from test.fixtures import FIXTURE_BASE_URL, page_names, read_page
+from urllib.parse import urlparse
+from utils.urlfilter import UrlFilter
+import re
+import time
+
+
+def original_is_valid(url, strict=True):
+    """scraper2.is_valid before the URL filter."""
+    parsed = urlparse(url)
+    if parsed.scheme not in set(["http", "https"]):
+        return False
+    if strict:
+        netlocation = parsed.netloc
+        if not (netlocation.endswith(".ics.uci.edu")
+            or netlocation.endswith(".cs.uci.edu")
+            or netlocation.endswith(".informatics.uci.edu")
+            or netlocation.endswith(".stat.uci.edu")):
+            return False
+    if re.search(r".*\.(css|js|bmp|gif|jpe?g|ico"
+        + r"|png|tiff?|mid|mp2|mp3|mp4"
+        + r"|wav|avi|mov|mpeg|ram|m4v|mkv|ogg|ogv|pdf"
+        + r"|ps|eps|tex|ppt|pptx|doc|docx|xls|xlsx|names"
+        + r"|data|dat|exe|bz2|tar|msi|bin|7z|psd|dmg|iso"
+        + r"|epub|dll|cnf|tgz|sha1"
+        + r"|thmx|mso|arff|rtf|jar|csv"
+        + r"|rm|smil|wmv|swf|wma|zip|rar|gz)$", parsed.path.lower()):
+        return False
+    return True
+
+
+def main(rounds):
+    # link sets of the pages, most links first
+    pages = sorted(
+        (parse_html_lxml(read_page(name), FIXTURE_BASE_URL + name)[0] for name in page_names()),
+        key=len, reverse=True,
+    )
+    url_filter = UrlFilter()
+    nlinks = sum(len(links) for links in pages)
+    print(f"pages: {len(pages)}, links: {nlinks} (most on one page: {len(pages[0])})")
+
+    for links in pages:
+        assert [u for u in links if original_is_valid(u)] == url_filter.filter(links)
+
+    runs = {
+        "original": lambda links: [u for u in links if original_is_valid(u)],
+        "filter": lambda links: [u for u in links if url_filter.is_valid(u)],
+        "batch": url_filter.filter,
+    }
+    for name, run in runs.items():
+        start = time.perf_counter()
+        for _ in range(rounds):
+            for links in pages:
+                run(links)
+        elapsed = time.perf_counter() - start
+        print(f"{name:<9} {nlinks * rounds / elapsed:>10.0f} links/s")
+
+
+if __name__ == "__main__":
+    parser = ArgumentParser()
+    parser.add_argument("--rounds", type=int, default=500)
+    args = parser.parse_args()
+    main(args.rounds)
@@ -0,0 +1,165 @@
+# bench/eval_similarity.py
+#
+# offline evaluation of the similarity engines (helpers/simengine.py)
+# reports precision, recall and throughput for each engine
+#
+# pairs are sourced from:
+#   -   test/fixtures/pages/pairs.txt (labelled fixture pairs)
+#   -   synthetic pairs made by perturbing fixture pages
+#       (reordered partitions, dropped tokens => similar;
+#       pages from different fixtures => not similar)
+#   -   similar_pages.similar_pair_testing (only with --live)
+#
+# usage: python -m bench.eval_similarity [--live] [--rounds N]
+
+from argparse import ArgumentParser
+from helpers.parser import parse_response
+from helpers.simengine import get_engine
+from helpers.word_count import to_tokens, word_count
+from test.fixtures import load_pairs, load_response, page_names, make_response
+import random
+import time
+
+
+ENGINES = ["simhash", "minhash"]
+
+
+# manual labels for similar_pages.similar_pair_testing (same order)
+LIVE_LABELS = [
+    True, True, False, False, False, False, False,
+    True, False, False, True, True, True,
+]
+
+
+def _features(resp):
+    """Returns the (tokens, words) of a response."""
+    tokens = to_tokens(parse_response(resp).text_content)
+    return tokens, word_count(tokens)
+
+
+def _perturb(text_content, rng, blocks=4):
+    """Returns the tokens of a near-duplicate of the text content.
+    Blocks of partitions are reordered and a few tokens are dropped.
+    """
+    size = max(1, len(text_content) // blocks)
+    parts = [text_content[i:i+size] for i in range(0, len(text_content), size)]
+    rng.shuffle(parts)
+    tokens = to_tokens([text for part in parts for text in part])
+    return [t for t in tokens if rng.random() > 0.01]
+
+
+def _group(name):
+    """Returns the fixture group of a page (e.g. "calendar" for calendar_2024_10.html)."""
+    return name.split(".")[0].split("_")[0]
+
+
+def fixture_pairs():
+    """Returns labelled feature pairs from the fixture corpus."""
+    feats = {name: _features(load_response(name)) for name in page_names()}
+    return [
+        (feats[a], feats[b], label)
+        for a, b, label in load_pairs()
+    ]
+
+
+def synthetic_pairs(seed=221):
+    """Returns labelled feature pairs made by perturbing fixture pages."""
+    rng = random.Random(seed)
+    names = page_names()
+    pairs = []
+    for name in names:
+        text_content = parse_response(load_response(name)).text_content
+        tokens = to_tokens(text_content)
+        near = _perturb(text_content, rng)
+        pairs.append(((tokens, word_count(tokens)), (near, word_count(near)), True))
+
+    for a, b in zip(names, names[1:] + names[:1]):
+        if _group(a) == _group(b):
+            continue
+        pairs.append((_features(load_response(a)), _features(load_response(b)), False))
+    return pairs
+
+
+def live_pairs():
+    """Returns labelled feature pairs from similar_pages.py (downloads pages)."""
+    import requests
+    from similar_pages import similar_pair_testing
+
+    pairs = []
+    for (first, second), label in zip(similar_pair_testing, LIVE_LABELS):
+        resps = []
+        for url in (first, second):
+            raw = requests.get(url)
+            resps.append(make_response(raw.url, raw.content, raw.status_code, raw.headers))
+            time.sleep(1)
+        if any(r.status != 200 for r in resps):
+            print(f"skipped {first} vs. {second} (status != 200)")
+            continue
+        pairs.append((_features(resps[0]), _features(resps[1]), label))
+    return pairs
+
+
+def evaluate(name, pairs):
+    """Evaluates the engine over the pairs.
+
+    :return: (precision, recall, true positives, false positives, false negatives)
+    :rtype: tuple
+    """
+    tp = fp = fn = 0
+    for (tok1, wc1), (tok2, wc2), label in pairs:
+        engine = get_engine(name)
+        engine.index(engine.fingerprint(tok1, wc1))
+        found = engine.find(engine.fingerprint(tok2, wc2)) is not None
+        if found and label:
+            tp += 1
+        elif found:
+            fp += 1
+        elif label:
+            fn += 1
+    precision = tp / (tp + fp) if tp + fp else 1.0
+    recall = tp / (tp + fn) if tp + fn else 1.0
+    return precision, recall, tp, fp, fn
+
+
+def throughput(name, docs, rounds):
+    """Measures fingerprints per second and lookups per second.
+    Lookups run against an index of every fingerprint computed.
+    """
+    engine = get_engine(name)
+
+    start = time.perf_counter()
+    keys = [engine.fingerprint(tokens, words) for _ in range(rounds) for tokens, words in docs]
+    fp_rate = len(keys) / (time.perf_counter() - start)
+
+    for key in set(keys):
+        engine.index(key)
+
+    start = time.perf_counter()
+    for key in keys:
+        engine.find(key)
+    find_rate = len(keys) / (time.perf_counter() - start)
+
+    return fp_rate, find_rate
+
+
+def main(live, rounds):
+    pairs = fixture_pairs() + synthetic_pairs()
+    if live:
+        pairs += live_pairs()
+    docs = [_features(load_response(name)) for name in page_names()]
+
+    print(f"{len(pairs)} pairs ({sum(1 for p in pairs if p[2])} similar)\n")
+    for name in ENGINES:
+        precision, recall, tp, fp, fn = evaluate(name, pairs)
+        fp_rate, find_rate = throughput(name, docs, rounds)
+        print(f"{name}")
+        print(f"{' ' * 4}precision={precision:.3f} recall={recall:.3f} (tp={tp},fp={fp},fn={fn})")
+        print(f"{' ' * 4}fingerprint={fp_rate:.0f} pages/s, find={find_rate:.0f} lookups/s")
+
+
+if __name__ == "__main__":
+    parser = ArgumentParser()
+    parser.add_argument("--live", action="store_true", default=False)
+    parser.add_argument("--rounds", type=int, default=50)
+    args = parser.parse_args()
+    main(args.live, args.rounds)
@@ -0,0 +1,285 @@
+# crawler2/archive.py
+#
+# WARC-style recording and replay of downloaded responses
+# used by crawler2/download.py (see configure)
+#
+# an archive is a directory of segments and an index:
+#   -   segment-NNNNN.warc.gz   WARC/1.1 response records; each record is
+#                               its own gzip member, so any record can be
+#                               decompressed on its own from its offset
+#   -   index.tsv               one line per record (appended and flushed):
+#                               <urlhash> <segment> <offset> <length> <url>
+# segments are rotated once they exceed `segment_size` bytes
+#
+# records are keyed by the requested URL (hashed with utils.get_urlhash);
+# the HTTP block holds the status, headers and body of the response
+# cache server errors (600-606) have no HTTP block; the status and error
+# are kept in WARC-X-* fields, as is the reason of aborted downloads
+#
+# replaying reads the record at its offset and decompresses it, so
+# experiments on the worker pipeline run without the network
+# (the exhash of replayed bodies is computed while decoding)
+
+from helpers.exhash import Exhasher
+from threading import Lock
+from uuid import uuid4
+from utils import get_urlhash
+import utils.response
+import datetime
+import os
+import zlib
+
+
+DEFAULT_SEGMENT_SIZE = 256 * 1024 * 1024
+
+INDEX_FILE = "index.tsv"
+SEGMENT_FORMAT = "segment-{:05d}.warc.gz"
+
+WARC_VERSION = b"WARC/1.1"
+
+# crawler-specific WARC fields
+WARC_STATUS = "WARC-X-Status"
+WARC_ERROR = "WARC-X-Error"
+WARC_ABORTED = "WARC-X-Aborted"
+WARC_RESPONSE_URL = "WARC-X-Response-URL"
+
+
+def _gzip_member(data):
+    """Compresses data as one gzip member."""
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31)
+    return compressor.compress(data) + compressor.flush()
+
+
+def _header_value(value):
+    """Returns the value without line breaks (header values are one line)."""
+    return str(value).replace("\r", " ").replace("\n", " ")
+
+
+def _http_block(raw):
+    """Serializes the status, headers and body of a raw response."""
+    lines = [f"HTTP/1.1 {raw.status_code} {_header_value(raw.reason or '')}"]
+    for key, value in raw.headers.items():
+        lines.append(f"{key}: {_header_value(value)}")
+    head = ("\r\n".join(lines) + "\r\n\r\n").encode("utf-8")
+    return head + (raw.content or b"")
+
+
+def _parse_fields(block):
+    """Parses "Key: value" lines into a dict (keys as is)."""
+    fields = dict()
+    for line in block.split(b"\r\n"):
+        key, sep, value = line.decode("utf-8").partition(":")
+        if sep:
+            fields[key.strip()] = value.strip()
+    return fields
+
+
+def encode_record(url, resp):
+    """Serializes the response as a WARC response record.
+
+    :param url str: The requested URL
+    :param resp Response: The response (see utils.response.Response)
+    :rtype: bytes
+    """
+    raw = resp.raw_response
+    block = _http_block(raw) if raw is not None else b""
+
+    fields = [
+        ("WARC-Type", "response"),
+        ("WARC-Record-ID", f"<urn:uuid:{uuid4()}>"),
+        ("WARC-Date", datetime.datetime.now(datetime.timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ")),
+        ("WARC-Target-URI", url),
+        (WARC_RESPONSE_URL, resp.url),
+        (WARC_STATUS, resp.status),
+    ]
+    if resp.error:
+        fields.append((WARC_ERROR, resp.error))
+    if resp.aborted:
+        fields.append((WARC_ABORTED, resp.aborted))
+    fields.append(("Content-Type", "application/http; msgtype=response"))
+    fields.append(("Content-Length", len(block)))
+
+    head = WARC_VERSION + b"\r\n" + "".join(
+        f"{key}: {_header_value(value)}\r\n" for key, value in fields
+    ).encode("utf-8")
+    return head + b"\r\n" + block + b"\r\n\r\n"
+
+
+def decode_record(record):
+    """Deserializes a WARC response record (see encode_record).
+
+    :param record bytes: The record
+    :return: The requested URL and the response
+    :rtype: (str, Response)
+    """
+    head, _, rest = record.partition(b"\r\n\r\n")
+    fields = _parse_fields(head)
+    block = rest[:int(fields["Content-Length"])]
+
+    resp = utils.response.Response.__new__(utils.response.Response)
+    resp.url = fields.get(WARC_RESPONSE_URL, fields["WARC-Target-URI"])
+    resp.status = int(fields[WARC_STATUS])
+    resp.error = fields.get(WARC_ERROR, "")
+    resp.raw_response = None
+    if WARC_ABORTED in fields:
+        resp.aborted = fields[WARC_ABORTED]
+
+    if block:
+        http_head, _, body = block.partition(b"\r\n\r\n")
+        status_line, _, header_lines = http_head.partition(b"\r\n")
+        status = status_line.split(b" ", 2)
+        resp.raw_response = utils.response.RawResponse(
+            resp.url, int(status[1]), _parse_fields(header_lines), body,
+            status[2].decode("utf-8") if len(status) > 2 else "")
+
+        # like complete streamed downloads, the exhash of the body is known
+        if not resp.aborted:
+            hasher = Exhasher()
+            hasher.update(body)
+            resp.exhash = hasher.hexdigest()
+
+    return fields["WARC-Target-URI"], resp
+
+
+class ArchiveWriter:
+    """Thread-safe recorder of responses into an archive.
+
+    directory       The archive directory
+    segment_size    Bytes after which a new segment is started
+    records         Amount of records written
+
+    """
+    def __init__(self, directory, segment_size=DEFAULT_SEGMENT_SIZE):
+        self.directory = directory
+        self.segment_size = segment_size
+        self.records = 0
+        self._mutex = Lock()
+
+        os.makedirs(directory, exist_ok=True)
+
+        # continue after the segments of a previous recording
+        segments = [name for name in os.listdir(directory) if name.startswith("segment-")]
+        self._segment = len(segments)
+        self._fh = None
+        self._index = open(os.path.join(directory, INDEX_FILE), "a", encoding="utf-8")
+
+
+    def _segment_fh(self):
+        """Returns the current segment (rotated if it is full)."""
+        if self._fh is not None and self._fh.tell() >= self.segment_size:
+            self._fh.close()
+            self._fh = None
+            self._segment += 1
+        if self._fh is None:
+            path = os.path.join(self.directory, SEGMENT_FORMAT.format(self._segment))
+            self._fh = open(path, "ab")
+        return self._fh
+
+
+    def record(self, url, resp):
+        """Appends the response of the URL to the archive.
+
+        :param url str: The requested URL
+        :param resp Response: The response
+        """
+        member = _gzip_member(encode_record(url, resp))
+        with self._mutex:
+            fh = self._segment_fh()
+            offset = fh.tell()
+            fh.write(member)
+            fh.flush()
+            self._index.write(f"{get_urlhash(url)}\t{self._segment}\t{offset}\t{len(member)}\t{_header_value(url)}\n")
+            self._index.flush()
+            self.records += 1
+
+
+    def close(self):
+        with self._mutex:
+            if self._fh is not None:
+                self._fh.close()
+                self._fh = None
+            self._index.close()
+
+
+class ArchiveReader:
+    """Thread-safe replay of the responses of an archive.
+    The index is loaded in memory; records are read from their offsets.
+
+    directory       The archive directory
+    hits            Amount of responses replayed
+    misses          Amount of URLs not in the archive
+
+    """
+    def __init__(self, directory):
+        self.directory = directory
+        self.hits = 0
+        self.misses = 0
+        self._index = dict() # urlhash => (segment, offset, length)
+        self._fds = dict() # segment => file descriptor
+        self._mutex = Lock()
+
+        with open(os.path.join(directory, INDEX_FILE), "r", encoding="utf-8") as fh:
+            for line in fh:
+                parts = line.rstrip("\n").split("\t", 4)
+                if len(parts) == 5:
+                    # later records of the same URL replace earlier ones
+                    self._index[parts[0]] = (int(parts[1]), int(parts[2]), int(parts[3]))
+
+
+    def __len__(self):
+        return len(self._index)
+
+
+    def _fd(self, segment):
+        with self._mutex:
+            fd = self._fds.get(segment, None)
+            if fd is None:
+                fd = os.open(os.path.join(self.directory, SEGMENT_FORMAT.format(segment)), os.O_RDONLY)
+                self._fds[segment] = fd
+            return fd
+
+
+    def get(self, url):
+        """Returns the recorded response of the URL (or None if it was not recorded).
+
+        :param url str: The requested URL
+        :rtype: Response | None
+        """
+        entry = self._index.get(get_urlhash(url), None)
+        if entry is None:
+            with self._mutex:
+                self.misses += 1
+            return None
+
+        segment, offset, length = entry
+        member = os.pread(self._fd(segment), length, offset)
+        _, resp = decode_record(zlib.decompress(member, 31))
+        with self._mutex:
+            self.hits += 1
+        return resp
+
+
+    def download(self, url):
+        """Replays the response of the URL like crawler2.download.download.
+        URLs that were not recorded are served as 404s.
+
+        :param url str: The requested URL
+        :rtype: Response
+        """
+        resp = self.get(url)
+        if resp is not None:
+            return resp
+
+        resp = utils.response.Response.__new__(utils.response.Response)
+        resp.url = url
+        resp.status = 404
+        resp.error = "Not in archive"
+        resp.raw_response = utils.response.RawResponse(url, 404)
+        return resp
+
+
+    def close(self):
+        with self._mutex:
+            for fd in self._fds.values():
+                os.close(fd)
+            self._fds.clear()
@@ -0,0 +1,142 @@
+# crawler2/batch.py
+#
+# batched downloads from the cache server
+# used by the frontier when BATCH > 1 (see [CONNECTION] in config.ini)
+#
+# every download from the cache server pays a round trip (and waits for
+# the global polite mutex, frontier.dpolmut); instead, the downloads that
+# worker threads request concurrently are coalesced into one batch request
+# (see utils.download.download_batch):
+#   -   the first thread to request a download leads: it locks the global
+#       polite mutex, takes up to `size` pending downloads, and sends them
+#   -   other threads wait for their response; each one is woken as soon
+#       as its response is streamed back
+#   -   once its batch is sent, the leader hands the lead to the oldest
+#       pending download (requested while the batch was in flight)
+#
+# per-host politeness is unchanged: each worker thread still holds the
+# polite mutex of its URL's domain while its download is batched, so a
+# batch never holds two URLs of the same domain from the workers
+
+from crawler2.download import download_batch
+from threading import Event, Lock
+
+
+class _Download:
+    __slots__ = ("url", "resp", "lead", "done")
+
+    def __init__(self, url):
+        self.url = url
+        self.resp = None
+        self.lead = False
+        self.done = Event() # answered, or promoted to lead
+
+
+class BatchDownloader:
+    """Thread-safe coalescing of cache server downloads into batches.
+
+    size        Maximum amount of URLs per batch
+    batches     Amount of batches sent
+    downloads   Amount of downloads answered by batches
+
+    """
+    def __init__(self, config, logger, dpolmut, size):
+        """Initializes the batch downloader.
+
+        :param config Config: The config object
+        :param logger Logger: The logger object
+        :param dpolmut PoliteMutex: The polite mutex on downloading any URLs
+        :param size int: Maximum amount of URLs per batch
+        """
+        self.config = config
+        self.logger = logger
+        self.dpolmut = dpolmut
+        self.size = size
+        self.batches = 0
+        self.downloads = 0
+
+        self._pending = []
+        self._leading = False
+        self._mutex = Lock()
+
+
+    def download(self, url):
+        """Downloads the URL from the cache server in a batch.
+        Blocks until its response is received.
+
+        :param url str: The URL string
+        :return: The response
+        :rtype: Response
+        """
+        req = _Download(url)
+        with self._mutex:
+            self._pending.append(req)
+            req.lead = not self._leading
+            self._leading = True
+
+        if not req.lead:
+            req.done.wait()
+        if req.lead:
+            self._send()
+        return req.resp
+
+
+    def _send(self):
+        """Sends a batch of the pending downloads (as the leader),
+        then hands the lead over.
+        The leader's own download is the oldest pending one,
+        so it is always part of the batch.
+        If the batch fails (e.g. the cache server is unreachable), the error
+        is logged, and its unanswered downloads get no response (None).
+        """
+        batch = []
+        reqs = dict() # url => downloads
+        try:
+            with self.dpolmut:
+                # taken once the global polite mutex is locked, so that
+                # downloads requested while waiting for it join the batch
+                with self._mutex:
+                    batch = self._pending[:self.size]
+                    del self._pending[:self.size]
+                for req in batch:
+                    reqs.setdefault(req.url, []).append(req)
+
+                for url, resp in download_batch(list(reqs), self.config, self.logger):
+                    for req in reqs.pop(url, []):
+                        req.resp = resp
+                        req.done.set()
+        except Exception as e:
+            if self.logger:
+                self.logger.error(f"Batch of {len(batch)} downloads failed ({e!r}); "
+                    f"{len(reqs)} URLs were not answered")
+        finally:
+            for waiting in reqs.values():
+                for req in waiting:
+                    req.done.set()
+            self._handoff(len(batch))
+
+
+    def _handoff(self, downloads):
+        """Hands the lead to the oldest pending download (if any)."""
+        with self._mutex:
+            self.batches += 1
+            self.downloads += downloads
+            if self._pending:
+                nxt = self._pending[0]
+                nxt.lead = True
+                nxt.done.set()
+            else:
+                self._leading = False
+
+
+    def stats(self):
+        """Returns the statistics of the batches.
+
+        :rtype: dict
+        """
+        with self._mutex:
+            return {
+                "batches": self.batches,
+                "downloads": self.downloads,
+                "per_batch": round(self.downloads / self.batches, 2) if self.batches else 0.0,
+            }
@@ -0,0 +1,231 @@
+# crawler2/breaker.py
+#
+# failing hosts: per-host circuit breakers and a negative cache
+#
+# when a host is down, every URL queued for it used to be downloaded,
+# retried (see crawler2/retry.py) and requeued, wasting worker time
+#
+# circuit breaker (one per host, kept in Frontier.domains):
+#   -   closed      downloads are allowed
+#   -   open        after BREAKER_THRESHOLD consecutive failures (5xx,
+#                   cache server errors, DNS and connection failures);
+#                   the host's nurls are parked instead of downloaded
+#   -   half-open   once the cooldown elapsed, one nurl is downloaded as a probe
+#                   success closes the breaker and releases the parked nurls
+#                   failure opens it again with a doubled cooldown
+#                   a probe that ends without a result (e.g. it failed on the
+#                   negative cache) is cancelled: the breaker is open again,
+#                   and lets the next nurl through as the probe
+#
+# negative cache (used by direct downloads, see crawler2/download.py):
+#   DNS and connection failures (before a connection is made) are remembered
+#   per host for NEGATIVE_TTL seconds; downloads from those hosts fail
+#   without touching the network, and wait for the entry to expire
+#   (they do not use up the retries of their nurls)
+
+from threading import Lock
+import time
+
+
+# consecutive failures that open a breaker
+BREAKER_THRESHOLD = 5
+
+# seconds before an open breaker lets a probe through
+# (doubled after each failed probe, up to BREAKER_MAX_COOLDOWN)
+BREAKER_COOLDOWN = 30.0
+BREAKER_MAX_COOLDOWN = 600.0
+
+# breaker states
+BREAKER_CLOSED = 0x0
+BREAKER_OPEN = 0x1
+BREAKER_HALF_OPEN = 0x2
+
+# seconds that DNS and connection failures are remembered
+# (shorter than BREAKER_COOLDOWN, so probes reach the network)
+NEGATIVE_TTL = 15.0
+
+
+def is_failure(status):
+    """Returns whether the status counts as a failure of the host
+    (server errors, cache server errors, DNS and connection failures).
+
+    :param status int: The status of the response
+    :rtype: bool
+    """
+    return status >= 500
+
+
+class CircuitBreaker:
+    """Thread-safe circuit breaker of a host.
+
+    state       BREAKER_CLOSED, BREAKER_OPEN or BREAKER_HALF_OPEN
+    failures    Consecutive failures
+    cooldown    Seconds before a probe is let through (when open)
+    parked      Nurls parked while the breaker is open
+    opened      Amount of times the breaker opened
+
+    """
+    def __init__(self, threshold=BREAKER_THRESHOLD, cooldown=BREAKER_COOLDOWN,
+                 max_cooldown=BREAKER_MAX_COOLDOWN):
+        self.threshold = threshold
+        self.base_cooldown = cooldown
+        self.max_cooldown = max_cooldown
+
+        self.state = BREAKER_CLOSED
+        self.failures = 0
+        self.cooldown = cooldown
+        self.parked = []
+        self.opened = 0
+        self._opened_at = 0.0
+        self._waking = False # a parked nurl waits for the cooldown
+        self._mutex = Lock()
+
+
+    def allow(self):
+        """Returns whether a download from the host is allowed.
+        Once the cooldown of an open breaker elapsed, exactly one
+        download (the probe) is allowed until its result is recorded.
+
+        :rtype: bool
+        """
+        with self._mutex:
+            if self.state == BREAKER_CLOSED:
+                return True
+            if self.state == BREAKER_OPEN and self._remaining() <= 0:
+                self.state = BREAKER_HALF_OPEN
+                return True
+            return False
+
+
+    def park(self, nurl):
+        """Parks the nurl until the breaker closes.
+        The first nurl parked after the breaker opened is not parked:
+        it should come back once the cooldown elapsed (as the probe).
+
+        :param nurl Nurl: The nurl object
+        :return: The delay before the nurl comes back (or None if it is parked)
+        :rtype: float | None
+        """
+        with self._mutex:
+            if self.state == BREAKER_CLOSED:
+                # closed since the nurl was not allowed
+                return 0.0
+            if self.state == BREAKER_OPEN and not self._waking:
+                self._waking = True
+                return self._remaining()
+            self.parked.append(nurl)
+            return None
+
+
+    def record(self, status):
+        """Records the result of a download from the host.
+
+        Returns the parked nurls to release now (if the breaker closed),
+        and a parked nurl that should come back after `delay` seconds
+        as the next probe (if a failed probe opened the breaker again).
+
+        :param status int: The status of the response
+        :return: The nurls to release, the next probe and its delay
+        :rtype: (list[Nurl], Nurl | None, float)
+        """
+        with self._mutex:
+            if not is_failure(status):
+                self.failures = 0
+                if self.state == BREAKER_CLOSED:
+                    return ([], None, 0.0)
+                self.state = BREAKER_CLOSED
+                self.cooldown = self.base_cooldown
+                parked, self.parked = self.parked, []
+                return (parked, None, 0.0)
+
+            self.failures += 1
+            if self.state == BREAKER_HALF_OPEN:
+                # failed probe
+                self.cooldown = min(self.cooldown * 2, self.max_cooldown)
+                self._open()
+            elif self.state == BREAKER_CLOSED and self.failures >= self.threshold:
+                self._open()
+
+            # nurls parked during the probe wait for the next one
+            if self.state == BREAKER_OPEN and self.parked and not self._waking:
+                self._waking = True
+                return ([], self.parked.pop(0), self._remaining())
+            return ([], None, 0.0)
+
+
+    def cancel_probe(self):
+        """Cancels the probe of a half-open breaker, whose download ended
+        without a result to record. The breaker opens again, with its
+        cooldown elapsed, so the next allowed nurl is the probe.
+        The cancelled probe is expected to come back (it is retried).
+        """
+        with self._mutex:
+            if self.state == BREAKER_HALF_OPEN:
+                self.state = BREAKER_OPEN
+                self._waking = True
+
+
+    def _open(self):
+        self.state = BREAKER_OPEN
+        self.opened += 1
+        self._opened_at = time.monotonic()
+        self._waking = False
+
+
+    def _remaining(self):
+        """Returns the seconds left in the cooldown."""
+        return max(0.0, self._opened_at + self.cooldown - time.monotonic())
+
+
+class NegativeCache:
+    """Thread-safe cache of hosts whose DNS or connection failed.
+
+    ttl     Seconds that a failure is remembered
+    hits    Amount of downloads failed by the cache
+
+    """
+    def __init__(self, ttl=NEGATIVE_TTL):
+        self.ttl = ttl
+        self.hits = 0
+        self._failures = dict() # host => (expiry, reason)
+        self._mutex = Lock()
+
+
+    def add(self, host, reason):
+        """Remembers the failure of the host.
+
+        :param host str: The host
+        :param reason str: The reason of the failure
+        """
+        with self._mutex:
+            self._failures[host] = (time.monotonic() + self.ttl, reason)
+
+
+    def get(self, host):
+        """Returns the reason of the remembered failure of the host
+        (or None if there is none, or it expired).
+
+        :param host str: The host
+        :rtype: str | None
+        """
+        with self._mutex:
+            entry = self._failures.get(host, None)
+            if entry is None:
+                return None
+            if entry[0] <= time.monotonic():
+                del self._failures[host]
+                return None
+            self.hits += 1
+            return entry[1]
+
+
+    def remaining(self, host):
+        """Returns the seconds left before the failure of the host
+        is forgotten (0 if there is none).
+
+        :param host str: The host
+        :rtype: float
+        """
+        with self._mutex:
+            entry = self._failures.get(host, None)
+            return max(0.0, entry[0] - time.monotonic()) if entry else 0.0
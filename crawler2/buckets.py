@@ -0,0 +1,167 @@
+# crawler2/buckets.py
+#
+# thread-safe duplicate buckets with lock striping
+# used by Naps for exact buckets (exdict) and similar buckets (smdict)
+#
+# buckets used to be guarded by nap.mutex, which is shared by every
+# frontier operation and every save
+# buckets are now split into stripes by key so that dedup checks
+# only contend with dedup checks on the same stripe
+#
+# buckets are bounded: they keep a count and a capped sample of
+# duplicate hashes, so trap sites cannot grow them forever
+# full membership can be appended to an optional side file
+
+from contextlib import contextmanager
+from threading import Lock, RLock
+import zlib
+
+
+# maximum amount of duplicate hashes kept in a bucket
+SAMPLE_CAP = 8
+
+
+def _bounded(bucket, sample_cap):
+    """Converts a bucket to the bounded format.
+    Legacy buckets ([master, [hashes]]) are converted by
+    counting their hashes and keeping the first `sample_cap` hashes.
+
+    :param bucket list: The bucket
+    :return: The bounded bucket
+    :rtype: list
+    """
+    if len(bucket) == 2:
+        master, hashes = bucket
+        return [master, len(hashes), hashes[:sample_cap]]
+    return bucket
+
+
+class Buckets:
+    """Thread-safe mapping of hashes to duplicate buckets.
+
+    Each bucket comprises of a list of 3 elements:
+        (1) master nurl hash
+        (2) the count of related nurls
+        (3) a sample of related nurls by hash (up to sample_cap)
+
+    Single operations lock the stripe of the key. To encapsulate
+    multiple operations on one key as one transaction, use lock(key).
+    To lock every stripe (e.g. when saving), use lock_all().
+
+    dict        Dictionary with actual data (msgpack-able)
+    mutexes     Reentrant lock objects (one per stripe)
+    sample_cap  Maximum amount of related nurls kept per bucket
+    sidefile    Append-only file of every related nurl (or None)
+                Each line is "<key> <nurl hash>"
+    sidemut     Lock object on self.sidefile
+
+    """
+    def __init__(self, data=None, stripes=64, sample_cap=SAMPLE_CAP, sidefile=None):
+        self.dict = data if isinstance(data, dict) else dict()
+        self.mutexes = [RLock() for _ in range(stripes)]
+        self.sample_cap = sample_cap
+        self.sidefile = None
+        self.sidemut = Lock()
+
+        for key, bucket in self.dict.items():
+            self.dict[key] = _bounded(bucket, sample_cap)
+
+        if sidefile:
+            self.sidefile = open(sidefile, "a", encoding="utf-8")
+
+
+    def lock(self, key):
+        """Returns the lock of the stripe the key belongs to.
+        Stripes are chosen by a crc32 of the key prefix so that
+        the stripe of a key is the same across runs.
+
+        :param key str: The bucket key (a hash)
+        :return: The stripe lock
+        :rtype: RLock
+        """
+        _idx = zlib.crc32(key[:16].encode("utf-8")) % len(self.mutexes)
+        return self.mutexes[_idx]
+
+
+    @contextmanager
+    def lock_all(self):
+        """Locks every stripe (always in the same order)."""
+        for mutex in self.mutexes:
+            mutex.acquire()
+        try:
+            yield self
+        finally:
+            for mutex in reversed(self.mutexes):
+                mutex.release()
+
+
+    def claim(self, key, nurlhash):
+        """Claims the bucket of key for the nurl hash.
+        If the bucket does not exist, it is created with the nurl as master.
+        If the bucket exists and the nurl is not its master,
+        the nurl is counted and sampled by the bucket
+        (and appended to the side file if it exists).
+
+        An intermediate state of a bucket might exist where the master
+        nurl was not marked as complete, but its bucket exists.
+        Claiming it again as the master succeeds.
+
+        :param key str: The bucket key (a hash)
+        :param nurlhash str: The hash of the nurl
+        :return: Whether the nurl is the master of the bucket
+        :rtype: bool
+        """
+        with self.lock(key):
+            bucket = self.dict.get(key, None)
+            if bucket is None:
+                self.dict[key] = [nurlhash, 0, []]
+                return True
+            if bucket[0] == nurlhash:
+                return True
+            bucket[1] += 1
+            if len(bucket[2]) < self.sample_cap:
+                bucket[2].append(nurlhash)
+
+        with self.sidemut:
+            if self.sidefile:
+                self.sidefile.write(f"{key} {nurlhash}\n")
+        return False
+
+
+    def flush(self):
+        """Flushes the side file (if it exists)."""
+        with self.sidemut:
+            if self.sidefile:
+                self.sidefile.flush()
+
+
+    def close(self):
+        """Closes the side file (if it exists)."""
+        with self.sidemut:
+            if self.sidefile:
+                self.sidefile.close()
+                self.sidefile = None
+
+
+    def get(self, key, default=None):
+        with self.lock(key):
+            return self.dict.get(key, default)
+
+    def __getitem__(self, key):
+        with self.lock(key):
+            return self.dict[key]
+
+    def __setitem__(self, key, bucket):
+        with self.lock(key):
+            self.dict[key] = bucket
+
+    def __contains__(self, key):
+        return key in self.dict
+
+    def __len__(self):
+        return len(self.dict)
+
+    def keys(self):
+        """Returns a snapshot of the bucket keys."""
+        with self.lock_all():
+            return list(self.dict.keys())
@@ -4,7 +4,15 @@
 # the only changes implemented are logger name change and imports
 
 from utils import get_logger
+from utils.canonical import configure as configure_canonical
+from utils.urlfilter import configure as configure_urlfilter
+from helpers.encoding import DECODE_STATS
+from helpers.parser import PAGE_CACHE, set_html_backend
+from crawler2.download import DOWNLOAD_STATS, close_archives
+from crawler2.download import configure as configure_archives
+from crawler2.dnscache import DNS_CACHE
 from crawler2.frontier import Frontier
+from crawler2.stages import StageReporter
 from crawler2.worker import Worker
 
 
@@ -12,9 +20,17 @@ class Crawler(object):
     def __init__(self, config, restart, use_cache, frontier_factory=Frontier, worker_factory=Worker):
         self.config = config
         self.logger = get_logger("crawler2")
+
+        # URL canonicalization rules must be set before any URL is hashed
+        configure_canonical(self.config.canonical)
+        configure_urlfilter(self.config.domains)
+        set_html_backend(self.config.html_backend)
+        configure_archives(self.config.archive)
+
         self.frontier = frontier_factory(config, restart, use_cache)
         self.workers = list()
         self.worker_factory = worker_factory
+        self.reporter = None
 
     def start_async(self):
         self.workers = [
@@ -23,9 +39,24 @@ class Crawler(object):
         for worker in self.workers:
             worker.start()
 
+        # stage latencies are reported periodically while crawling
+        self.reporter = StageReporter(self.frontier.stages, self.logger)
+        self.reporter.start()
+
     def start(self):
         self.start_async()
         self.join()
+        self.reporter.stop()
+        self.frontier.stages.report(self.logger)
+        self.logger.info(f"page cache stats {PAGE_CACHE.stats()}")
+        self.logger.info(f"decode stats {DECODE_STATS.stats()}")
+        self.logger.info(f"download stats {DOWNLOAD_STATS.stats()}")
+        self.logger.info(f"dns cache stats {DNS_CACHE.stats()}")
+        if self.frontier.batcher is not None:
+            self.logger.info(f"batch stats {self.frontier.batcher.stats()}")
+        for base_url, stats in self.frontier.host_stats().items():
+            self.logger.info(f"host stats {base_url} {stats}")
+        close_archives()
 
         # all worker threads have finished
         # close the nap file before killing the main thread
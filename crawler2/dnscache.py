@@ -0,0 +1,209 @@
+# crawler2/dnscache.py
+#
+# in-process DNS cache with asynchronous prefetch
+# used by direct downloads (see Frontier.__init__ and Frontier.add_nurl)
+#
+# every requests.get resolves its hostname with the system resolver,
+# synchronously, on the worker thread
+# instead, urllib3's create_connection is wrapped (see install) to
+# connect to the addresses of DNS_CACHE; resolutions are kept for their
+# TTL, and hosts are resolved in the background as soon as the frontier
+# discovers them, so the lookup is done by the time their URLs are downloaded
+#
+# the system resolver (getaddrinfo) does not expose record TTLs,
+# so its resolutions are kept for DNS_TTL seconds; other resolvers
+# (e.g. the stub resolvers of the tests) return their own TTLs
+# failed resolutions are kept for DNS_NEGATIVE_TTL seconds, no longer than
+# the negative cache of downloads, so that the retry of a nurl that waited
+# for the negative cache (see crawler2/breaker.py) resolves its host again
+
+from crawler2.breaker import NEGATIVE_TTL
+from concurrent.futures import ThreadPoolExecutor
+from threading import Event, Lock
+import ipaddress
+import socket
+import time
+import urllib3.util.connection
+
+
+# seconds that resolutions of the system resolver are kept
+DNS_TTL = 300.0
+
+# seconds that failed resolutions are kept
+DNS_NEGATIVE_TTL = NEGATIVE_TTL
+
+# threads resolving prefetched hosts
+DNS_PREFETCH_THREADS = 4
+
+
+def system_resolver(host):
+    """Resolves the host with the system resolver.
+
+    :param host str: The host
+    :return: The addresses (getaddrinfo entries, port 0) and their TTL
+    :rtype: (list[tuple], float)
+    """
+    return (socket.getaddrinfo(host, 0, 0, socket.SOCK_STREAM), DNS_TTL)
+
+
+class _Entry:
+    __slots__ = ("expiry", "addrs", "error", "ready")
+
+    def __init__(self):
+        self.expiry = 0.0
+        self.addrs = None
+        self.error = None
+        self.ready = Event()
+
+
+class DnsCache:
+    """Thread-safe DNS cache that honors the TTLs of its resolver.
+
+    resolver    Resolves a host into (addresses, TTL) (see system_resolver)
+    hits        Resolutions served from the cache
+    misses      Resolutions that waited for the resolver
+                (including resolutions that waited for a prefetch)
+    prefetches  Hosts resolved in the background
+
+    """
+    def __init__(self, resolver=system_resolver, threads=DNS_PREFETCH_THREADS):
+        self.resolver = resolver
+        self.hits = 0
+        self.misses = 0
+        self.prefetches = 0
+        self._entries = dict() # host => _Entry
+        self._mutex = Lock()
+        self._threads = threads
+        self._executor = None
+
+
+    def _lookup(self, host, entry):
+        """Resolves the host into the entry.
+        The entry is always made ready, so that waiters never hang.
+        Malformed hosts (e.g. an empty or too long label, which the IDNA
+        codec rejects with a UnicodeError) fail like unknown hosts.
+        """
+        ttl = DNS_NEGATIVE_TTL
+        try:
+            entry.addrs, ttl = self.resolver(host)
+            entry.error = None
+        except OSError as e:
+            entry.addrs = None
+            entry.error = e
+        except Exception as e:
+            entry.addrs = None
+            entry.error = socket.gaierror(socket.EAI_NONAME, f"Invalid host {host!r} ({e})")
+        finally:
+            entry.expiry = time.monotonic() + ttl
+            entry.ready.set()
+
+
+    def _entry(self, host):
+        """Returns the entry of the host, and whether its lookup
+        should be started by the caller (the entry is new or expired).
+        """
+        with self._mutex:
+            entry = self._entries.get(host, None)
+            if (entry is not None
+                and (not entry.ready.is_set() or entry.expiry > time.monotonic())):
+                return (entry, False)
+            entry = _Entry()
+            self._entries[host] = entry
+            return (entry, True)
+
+
+    def resolve(self, host):
+        """Returns the addresses of the host (resolved, or from the cache).
+        Waits for the lookup if the host is being prefetched.
+
+        :param host str: The host
+        :return: The addresses (getaddrinfo entries, port 0)
+        :rtype: list[tuple]
+        :raises OSError: If the host could not be resolved
+        """
+        entry, new = self._entry(host)
+        if new:
+            self._lookup(host, entry)
+        ready = entry.ready.is_set() and not new
+        entry.ready.wait()
+        with self._mutex:
+            if ready:
+                self.hits += 1
+            else:
+                self.misses += 1
+        if entry.error is not None:
+            raise type(entry.error)(*entry.error.args)
+        return entry.addrs
+
+
+    def prefetch(self, host):
+        """Resolves the host in the background (if it is not cached).
+
+        :param host str: The host
+        """
+        entry, new = self._entry(host)
+        if not new:
+            return
+        with self._mutex:
+            self.prefetches += 1
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(self._threads, thread_name_prefix="dns-prefetch")
+            executor = self._executor
+        executor.submit(self._lookup, host, entry)
+
+
+    def stats(self):
+        """Returns the statistics of the cache.
+
+        :rtype: dict
+        """
+        with self._mutex:
+            return {
+                "hosts": len(self._entries),
+                "hits": self.hits,
+                "misses": self.misses,
+                "prefetches": self.prefetches,
+            }
+
+
+DNS_CACHE = DnsCache()
+
+# urllib3's create_connection (replaced by install)
+_create_connection = urllib3.util.connection.create_connection
+
+
+def _is_ip(host):
+    try:
+        ipaddress.ip_address(host)
+        return True
+    except ValueError:
+        return False
+
+
+def create_connection(address, *args, **kwargs):
+    """urllib3.util.connection.create_connection that connects to
+    the addresses of DNS_CACHE (tried in order).
+    TLS still verifies the hostname, which urllib3 keeps separately.
+    """
+    host, port = address
+    host = host.strip("[]")
+    if _is_ip(host):
+        return _create_connection(address, *args, **kwargs)
+
+    err = None
+    for _, _, _, _, sockaddr in DNS_CACHE.resolve(host):
+        try:
+            return _create_connection((sockaddr[0], port), *args, **kwargs)
+        except OSError as e:
+            err = e
+    raise err if err is not None else OSError(f"{host} has no addresses")
+
+
+def install():
+    """Makes urllib3 (and requests) resolve hosts through DNS_CACHE."""
+    urllib3.util.connection.create_connection = create_connection
+
+
+def uninstall():
+    """Restores urllib3's own resolution."""
+    urllib3.util.connection.create_connection = _create_connection
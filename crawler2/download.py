@@ -2,28 +2,316 @@
 #
 # downloads file either using requests.get
 # or using the cache server
+#
+# direct downloads are streamed: headers are inspected first, and the
+# body is not read if its content type is never processed or if it is
+# too large (see worker_get_resp in crawler2/workerpipe.py)
+# the body is hashed (exhash) and measured while it is read
+# bandwidth and time saved by aborted downloads are kept in DOWNLOAD_STATS
+#
+# responses can be recorded into / replayed from an archive
+# (see crawler2/archive.py and configure)
+#
+# DNS and connection failures of direct downloads fail with
+# STATUS_CONNECTION_FAILED instead of raising; failures before a connection
+# is made (DNS, refused, connect timeouts) are remembered per host in
+# NEGATIVE_CACHE (see crawler2/breaker.py), failures after it (e.g. a reset
+# while the body is read) are not
 
+from crawler2.archive import ArchiveReader, ArchiveWriter, DEFAULT_SEGMENT_SIZE
+from crawler2.breaker import NegativeCache
+from helpers.exhash import Exhasher
+from threading import Lock
+from urllib.parse import urlparse
 import utils.response
 import utils.download
 import requests
+import time
+import urllib3.exceptions
+
+
+# size of chunks read from streamed downloads
+STREAM_CHUNK_SIZE = 64 * 1024
+
+# reasons for aborting streamed downloads
+ABORT_CONTENT_TYPE = "content-type"
+ABORT_CONTENT_LENGTH = "content-length"
+ABORT_SIZE = "size"
+
+# status of direct downloads that failed before any response
+# (DNS and connection failures); counts as a server error
+STATUS_CONNECTION_FAILED = 599
+
+
+class DownloadStats:
+    """Thread-safe statistics of streamed downloads.
+
+    downloads       Amount of streamed downloads
+    bytes_read      Amount of body bytes read
+    read_time       Seconds spent reading bodies
+    aborted         Amount of aborted downloads by reason
+    bytes_saved     Body bytes not read by aborted downloads
+                    (only known if the server sent Content-Length)
+
+    """
+    def __init__(self):
+        self.downloads = 0
+        self.bytes_read = 0
+        self.read_time = 0.0
+        self.aborted = dict()
+        self.bytes_saved = 0
+        self.mutex = Lock()
+
+
+    def record(self, bytes_read, read_time, aborted=None, bytes_saved=0):
+        """Records a streamed download.
+
+        :param bytes_read int: Body bytes read
+        :param read_time float: Seconds spent reading the body
+        :param aborted str: Reason the download was aborted (or None)
+        :param bytes_saved int: Body bytes not read
+        """
+        with self.mutex:
+            self.downloads += 1
+            self.bytes_read += bytes_read
+            self.read_time += read_time
+            if aborted:
+                self.aborted[aborted] = self.aborted.get(aborted, 0) + 1
+                self.bytes_saved += bytes_saved
+
+
+    def stats(self):
+        """Returns the statistics, including the time saved.
+        The time saved is estimated from the read throughput.
+
+        :rtype: dict
+        """
+        with self.mutex:
+            throughput = self.bytes_read / self.read_time if self.read_time else 0
+            return {
+                "downloads": self.downloads,
+                "bytes_read": self.bytes_read,
+                "aborted": dict(self.aborted),
+                "bytes_saved": self.bytes_saved,
+                "time_saved": round(self.bytes_saved / throughput, 3) if throughput else 0.0,
+            }
 
-def _fake_response(resp):
+
+DOWNLOAD_STATS = DownloadStats()
+
+NEGATIVE_CACHE = NegativeCache()
+
+
+# archive that downloads are recorded into (or None)
+RECORDER = None
+
+# archive that downloads are replayed from (or None)
+REPLAY = None
+
+
+def configure(options):
+    """Sets the archives downloads are recorded into / replayed from.
+
+        RECORD = <directory>
+        REPLAY = <directory>
+        SEGMENT_SIZE = <bytes>
+
+    An empty or missing option disables recording / replaying.
+
+    :param options dict[str, str]: The [ARCHIVE] options of config.ini (keys are case-insensitive)
+    """
+    global RECORDER, REPLAY
+    close_archives()
+    options = {k.strip().lower(): v.strip() for k, v in options.items()}
+
+    if options.get("record", ""):
+        segment_size = int(options.get("segment_size", "") or DEFAULT_SEGMENT_SIZE)
+        RECORDER = ArchiveWriter(options["record"], segment_size)
+    if options.get("replay", ""):
+        REPLAY = ArchiveReader(options["replay"])
+
+
+def close_archives():
+    """Closes the archives (see configure)."""
+    global RECORDER, REPLAY
+    if RECORDER is not None:
+        RECORDER.close()
+        RECORDER = None
+    if REPLAY is not None:
+        REPLAY.close()
+        REPLAY = None
+
+
+def _fake_response(resp, content=None):
     """Creates a blanket Response object that uses
     the interface defined in utils.response.Response.
+
+    The requests.Response is copied into a compact RawResponse
+    (its request, cookies and connection are not kept).
+    `content` replaces its body (e.g. a streamed body).
     """
     resp2 = utils.response.Response.__new__(utils.response.Response)
     resp2.url = resp.url
     resp2.status = resp.status_code
-    resp2.raw_response = resp
+    resp2.raw_response = utils.response.RawResponse(
+        resp.url, resp.status_code, resp.headers,
+        resp.content if content is None else content, resp.reason or "")
     resp2.error = ""
     return resp2
 
 
-def download(url, config=None, logger=None, use_cache=False):
+def _failed_response(url, reason, retry_after=None):
+    """Creates a Response object for a download that failed
+    before any response (see STATUS_CONNECTION_FAILED).
+    `retry_after` is set if it failed on the negative cache.
+    """
+    resp = utils.response.Response.__new__(utils.response.Response)
+    resp.url = url
+    resp.status = STATUS_CONNECTION_FAILED
+    resp.raw_response = None
+    resp.error = f"Connection failed ({reason})"
+    resp.retry_after = retry_after
+    return resp
+
+
+def _failure_reason(exc):
+    """Returns the reason of a DNS or connection failure."""
+    if isinstance(exc, requests.exceptions.Timeout):
+        return "timeout"
+    message = str(exc)
+    if ("NameResolution" in message
+        or "Name or service not known" in message
+        or "getaddrinfo" in message):
+        return "dns"
+    return "connect"
+
+
+def _before_connection(exc):
+    """Returns whether the failure happened before a connection was made
+    (DNS failures, refused connections and connect timeouts).
+    """
+    if isinstance(exc, requests.exceptions.ConnectTimeout):
+        return True
+    reason = getattr(exc.args[0], "reason", None) if exc.args else None
+    return isinstance(reason, (urllib3.exceptions.NewConnectionError,
+                               urllib3.exceptions.ConnectTimeoutError))
+
+
+def _content_length(resp):
+    """Returns the Content-Length of the response (or None)."""
+    try:
+        return int(resp.headers.get("Content-Length", ""))
+    except ValueError:
+        return None
+
+
+def stream_download(url, content_limit, stats=DOWNLOAD_STATS, headers=None):
+    """Downloads the URL with a streamed requests.get(...).
+
+    Headers are inspected before the body is read:
+    `content_limit(content_type)` returns the maximum content length
+    of a response by its content type (0 if it is never processed).
+    The download is aborted if the Content-Type is not processed or if
+    the Content-Length exceeds the limit. Otherwise, the body is read in
+    chunks until it exceeds the limit (then the download is aborted).
+
+    Aborted responses have an empty body and `resp.aborted` set to the reason.
+    Complete responses have `resp.exhash` set to the exhash of the body.
+    304 (Not Modified) responses have no body and are never aborted.
+
+    :param url str: The URL string
+    :param content_limit Callable[[str], int]: Maximum content length by content type
+    :param stats DownloadStats: Statistics to record the download in
+    :param headers dict[str, str]: Extra request headers (e.g. conditional headers)
+    :return: The response
+    :rtype: Response
+    """
+    raw = requests.get(url, stream=True, headers=headers)
+    start = time.perf_counter()
+    aborted = None
+    bytes_saved = 0
+    content = b""
+    hasher = Exhasher()
+
+    try:
+        max_len = content_limit(raw.headers.get("Content-Type", ""))
+        length = _content_length(raw)
+
+        if raw.status_code == 304:
+            pass
+        elif not max_len:
+            aborted = ABORT_CONTENT_TYPE
+            bytes_saved = length or 0
+        elif length is not None and length > max_len:
+            aborted = ABORT_CONTENT_LENGTH
+            bytes_saved = length
+        else:
+            chunks = []
+            for chunk in raw.iter_content(STREAM_CHUNK_SIZE):
+                hasher.update(chunk)
+                if hasher.size > max_len:
+                    aborted = ABORT_SIZE
+                    bytes_saved = max(0, (length or 0) - hasher.size)
+                    break
+                chunks.append(chunk)
+            if not aborted:
+                # one chunk is the whole body (no join copy)
+                content = chunks[0] if len(chunks) == 1 else b"".join(chunks)
+    finally:
+        raw.close()
+
+    stats.record(hasher.size, time.perf_counter() - start, aborted, bytes_saved)
+
+    resp = _fake_response(raw, content)
+    resp.aborted = aborted
+    if not aborted and raw.status_code != 304:
+        resp.exhash = hasher.hexdigest()
+    return resp
+
+
+def download_batch(urls, config, logger=None):
+    """Fetches the responses of several URLs from the cache server
+    in one request (see utils.download.download_batch).
+    Yields (url, Response) in the order the URLs complete.
+
+    Archives are replayed / recorded like download.
+
+    :param urls list[str]: The URL strings
+    :return: The URLs and their responses
+    :rtype: Iterator[(str, Response)]
+
+    """
+    if REPLAY is not None:
+        for url in urls:
+            yield url, REPLAY.download(url)
+        return
+
+    for url, resp in utils.download.download_batch(urls, config, logger):
+        if RECORDER is not None:
+            RECORDER.record(url, resp)
+        yield url, resp
+
+
+def download(url, config=None, logger=None, use_cache=False, content_limit=None, headers=None):
     """Fetches the response of the URL
     either from requests.get(...) or the cache server.
     The source is switched via `use_cache`.
 
+    Direct downloads are streamed if `content_limit` is given
+    (see stream_download).
+
+    Extra request headers (e.g. conditional headers, see Nurl.validators)
+    are only sent by direct downloads; the cache server protocol
+    does not forward headers.
+
+    DNS and connection failures of direct downloads return a response
+    with STATUS_CONNECTION_FAILED (and no raw response). Failures before
+    a connection is made are kept in NEGATIVE_CACHE, so later downloads
+    from the host fail at once (with `resp.retry_after` set).
+
+    If an archive is replayed, the response is read from it instead.
+    If an archive is recorded, the response is appended to it.
+
     The returned response object shall use the interface defined in
     utils.response.Response.
 
@@ -32,10 +320,28 @@ def download(url, config=None, logger=None, use_cache=False):
     :rtype: Response
 
     """
+    if REPLAY is not None:
+        return REPLAY.download(url)
+
     if not use_cache:
-        resp = requests.get(url)
-        return _fake_response(resp)
+        host = urlparse(url).hostname
+        reason = NEGATIVE_CACHE.get(host)
+        if reason is not None:
+            return _failed_response(url, reason, NEGATIVE_CACHE.remaining(host))
+        try:
+            if content_limit is not None:
+                resp = stream_download(url, content_limit, headers=headers)
+            else:
+                resp = _fake_response(requests.get(url, headers=headers))
+        except (requests.exceptions.ConnectionError, requests.exceptions.Timeout,
+                requests.exceptions.ChunkedEncodingError) as e:
+            reason = _failure_reason(e)
+            if _before_connection(e):
+                NEGATIVE_CACHE.add(host, reason)
+            resp = _failed_response(url, reason)
     else:
         resp = utils.download.download(url, config, logger)
-        return resp
 
+    if RECORDER is not None:
+        RECORDER.record(url, resp)
+    return resp
@@ -4,15 +4,25 @@
 # modified from crawler/frontier.py
 # interface uses Nurls (node URLS) instead of urls (strings)
 
+from crawler2.batch import BatchDownloader
+from crawler2.breaker import CircuitBreaker
+from crawler2.dnscache import DNS_CACHE
+from crawler2.dnscache import install as install_dns_cache
+from crawler2.pacer import HostPacer
 from crawler2.polmut import PoliteMutex
 from crawler2.nap import Nap
 from crawler2.nurl import *
+from crawler2.retry import RetryQueue, retry_delay
 from crawler2.robots import robots
+from crawler2.stages import StageStats, TimedLock
+from crawler2.traps import TrapDetector
+from helpers.simengine import get_engine
 from utils import get_logger
 
+from contextlib import nullcontext
 from queue import Queue, Empty
-from threading import RLock
-from urllib.parse import urlparse
+from threading import Lock, RLock
+from urllib.parse import urlparse, urlsplit
 import os
 
 
@@ -34,11 +44,30 @@ class Frontier(object):
 
     nap         The nap object (stores nurl data)
     nurls       Queue object that store nurls to download
-    domains     Mapping of domains to PoliteMutexes and RobotParsers
+    domains     Mapping of domains to PoliteMutexes, RobotParsers, HostPacers
+                and CircuitBreakers
                 Enforces multi-threaded politeness per domain.
+                Delays adapt to each domain's responses (see crawler2/pacer.py).
+                Nurls of failing domains are parked (see crawler2/breaker.py).
 
     domainmut   Reentrant lock object on self.domains
     dpolmut     PoliteMutex object on downloading any URLs
+    batcher     BatchDownloader of cache server downloads (or None)
+                Batches lock dpolmut once per batch (see crawler2/batch.py).
+
+    simengine   Similarity engine for the similar buckets (nap.smdict)
+    simmutex    Lock object on self.simengine
+
+    traps       Trap detector (statistics are stored in nap.tpdict)
+
+    retries     Time-ordered queue of nurls to retry (see retry_nurl)
+
+    hosts       Hosts discovered by add_nurl. Direct downloads resolve
+                new hosts in advance (see crawler2/dnscache.py).
+
+    stages      Latency histograms of the worker pipeline stages, and of
+                the waits for dpolmut, the domains' polmuts and nap.mutex
+                (see crawler2/stages.py)
 
     """
     def __init__(self, config, restart, use_cache):
@@ -55,7 +84,20 @@ class Frontier(object):
         self.nurls = Queue()
         self.domains = dict()
         self.domainmut = RLock()
-        self.dpolmut = PoliteMutex(self.config.time_delay)
+        self.stages = StageStats()
+        self.dpolmut = PoliteMutex(self.config.time_delay, waits=self.stages.histogram("lock:dpolmut"))
+        self.batcher = (
+            BatchDownloader(config, self.logger, self.dpolmut, config.batch_size)
+            if use_cache and config.batch_size > 1 else
+            None)
+        self.simengine = get_engine(self.config.sim_engine)
+        self.simmutex = Lock()
+        self.retries = RetryQueue(self._requeue)
+        self.hosts = set()
+
+        # direct downloads resolve hosts through the DNS cache
+        if not use_cache:
+            install_dns_cache()
 
         self._handle_restart(restart)
         self._nap_init()
@@ -73,13 +115,109 @@ class Frontier(object):
             return
 
 	    # Add nurl to nap iff it doesn't exist
-        with self.nap.mutex:
-            if not self.nap.exists(nurl.url):
-                self.nap[nurl.url] = nurl
+        self.nap.add(nurl)
+        self._discover_host(nurl.url)
 
         self.nurls.put(nurl)
 
 
+    def add_nurls(self, nurls):
+        """Adds a batch of nurls to the nurls deque (see add_nurl).
+        The nap is locked once for the whole batch.
+
+        :param nurls list[Nurl]: The nurl objects
+        """
+        nurls = [nurl for nurl in nurls if nurl.status != NURL_STATUS_IS_DOWN]
+
+        with self.nap.mutex:
+            for nurl in nurls:
+                self.nap.add(nurl)
+
+        for nurl in nurls:
+            self._discover_host(nurl.url)
+            self.nurls.put(nurl)
+
+
+    def _discover_host(self, url):
+        """Resolves the host of the URL in the background
+        the first time it is seen (direct downloads only).
+        """
+        if self.use_cache:
+            return
+        host = urlsplit(url).hostname
+        if host and host not in self.hosts:
+            self.hosts.add(host)
+            DNS_CACHE.prefetch(host)
+
+
+    def retry_nurl(self, nurl, delay=None):
+        """Schedules the nurl to be downloaded again after a jittered
+        backoff delay based on its retry count (see crawler2/retry.py),
+        or after `delay` seconds if it is given.
+        The nurl is saved un-downloaded, so restarts download it again.
+
+        The nurl's task stays unfinished while it waits: do not call
+        `nurls.task_done()` for it (it is called once the nurl is requeued).
+
+        :param nurl Nurl: The nurl object
+        :param delay float: The delay in seconds (or None)
+        """
+        nurl.status = NURL_STATUS_NO_DOWN
+        with self.nap.mutex:
+            self.nap[nurl.url] = nurl
+        self.retries.push(nurl, retry_delay(nurl.retries) if delay is None else delay)
+
+
+    def park_nurl(self, nurl, breaker):
+        """Parks the nurl while the circuit breaker of its domain is open
+        (see crawler2/breaker.py). Parked nurls are requeued once
+        the breaker closes. The nurl is saved un-downloaded.
+
+        Like retry_nurl, the nurl's task stays unfinished while it is parked.
+
+        :param nurl Nurl: The nurl object
+        :param breaker CircuitBreaker: The circuit breaker of the nurl's domain
+        """
+        nurl.status = NURL_STATUS_NO_DOWN
+        with self.nap.mutex:
+            self.nap[nurl.url] = nurl
+        delay = breaker.park(nurl)
+        if delay is not None:
+            # not parked: comes back as the probe of the breaker
+            self.retries.push(nurl, delay)
+
+
+    def record_download(self, url, status):
+        """Records the status of a download in the circuit breaker
+        of the URL's domain. Requeues the parked nurls if it closed.
+
+        :param url str: The URL
+        :param status int: The status of the response
+        """
+        breaker = self.get_domain_info(url)['breaker']
+        released, probe, delay = breaker.record(status)
+        for nurl in released:
+            self._requeue(nurl)
+        if probe is not None:
+            self.retries.push(probe, delay)
+
+
+    def cancel_probe(self, url):
+        """Cancels the probe of the circuit breaker of the URL's domain
+        (if it is half-open) when its download ends without a status
+        to record (see CircuitBreaker.cancel_probe).
+
+        :param url str: The URL
+        """
+        self.get_domain_info(url)['breaker'].cancel_probe()
+
+
+    def _requeue(self, nurl):
+        """Requeues a nurl that was retried or parked (see retry_nurl)."""
+        self.add_nurl(nurl)
+        self.nurls.task_done()
+
+
     def get_tbd_nurl(self):
         """Gets the next un-downloaded nurl not in-use to download
         based on the frontier's traversal policy.
@@ -134,19 +272,25 @@ class Frontier(object):
             if base_url not in self.domains:
 
                 # lock the PoliteMutex for the domain
-                with self.dpolmut:
+                # (batches lock it themselves)
+                with (self.dpolmut if self.batcher is None else nullcontext()):
                     rparser = robots(
                         base_url,
                         config=self.config,
                         logger=self.logger,
-                        use_cache=self.use_cache
+                        use_cache=self.use_cache,
+                        batcher=self.batcher
                     )
                     crawl_delay = rparser.crawl_delay(self.config.user_agent)
 
+                    # the pacer never undercuts the crawl-delay
+                    pacer = HostPacer.for_host(self.config, crawl_delay)
+
                     if crawl_delay is None:
                         crawl_delay = self.config.time_delay
 
-                    domain_polmut = PoliteMutex(crawl_delay)
+                    domain_polmut = PoliteMutex(crawl_delay, pacer=pacer,
+                        waits=self.stages.histogram("lock:pmut"))
 
                     # important!!!!
                     # domain_polmut should be locked/unlocked immediately
@@ -159,6 +303,8 @@ class Frontier(object):
                 self.domains[base_url] = {
                     'polmut': domain_polmut,
                     'rparser': rparser,
+                    'pacer': pacer,
+                    'breaker': CircuitBreaker(),
                 }
 
                 # add sitemaps urls if it exists
@@ -178,18 +324,44 @@ class Frontier(object):
         return self.domains[base_url]
 
 
-    def mark_nurl_complete(self, nurl, status=NURL_STATUS_IS_DOWN):
+    def host_stats(self):
+        """Returns the throughput and error statistics of every domain
+        (see HostPacer.stats), and the state of its circuit breaker.
+
+        :rtype: dict[str, dict]
+        """
+        with self.domainmut:
+            domains = list(self.domains.items())
+        stats = dict()
+        for base_url, info in domains:
+            breaker = info['breaker']
+            stats[base_url] = info['pacer'].stats()
+            stats[base_url]["breaker_opened"] = breaker.opened
+            stats[base_url]["parked"] = len(breaker.parked)
+        return stats
+
+
+    def mark_nurl_complete(self, nurl, status=NURL_STATUS_IS_DOWN, record=True):
         """Marks the nurl as complete.
         Stops the crawler from re-downloading the URL.
         Only call this after the nurl has recomputed its attributes.
         If status is defined, then sets the nurl status to the specified status code instead.
+        If record is False, the finish state of a downloaded nurl is not
+        recorded by the trap detector (e.g. it was recorded when it was
+        first downloaded, and a recrawl found it not modified).
 
         :param nurl Nurl: The nurl object
+        :param status int: The status of the nurl
+        :param record bool: Whether to record the finish state for trap detection
         """
         nurl.status = status # downloaded OR user-defined status code
         with self.nap.mutex:
             self.nap[nurl.url] = nurl
 
+            # record finish state of downloaded nurls for trap detection
+            if status == NURL_STATUS_IS_DOWN and record:
+                self.traps.record(nurl)
+
 
     def _handle_restart(self, restart):
         """Handles the restart flag.
@@ -208,6 +380,12 @@ class Frontier(object):
                 f"Found save file {self.config.save_file}, deleting it.")
             os.remove(self.config.save_file)
 
+        # Delete bucket side files (see Nap)
+        if restart:
+            for ext in (".exdup", ".smdup"):
+                if os.path.exists(f"{_save_file}{ext}"):
+                    os.remove(f"{_save_file}{ext}")
+
 
     def _nap_init(self):
         """Initializes the Nap object.
@@ -215,7 +393,13 @@ class Frontier(object):
         Then, it adds nurls that were either
         not yet downloaded or in an intermediate state.
         """
-        self.nap = Nap(self.config.save_file)
+        self.nap = Nap(self.config.save_file, dup_log=self.config.dup_log)
+        self.nap.mutex = TimedLock(self.nap.mutex, self.stages.histogram("lock:nap"))
+        self.traps = TrapDetector(self.nap.tpdict)
+
+        # Index fingerprints of existing similar buckets
+        with self.simmutex:
+            self.simengine.index_all(self.nap.smdict.keys())
 
         # Add seed urls (if it's not downloaded or in an intermediate state)
         for url in self.config.seed_urls:
@@ -230,13 +414,22 @@ class Frontier(object):
                     self.add_nurl(nurl)
 
         # Add remaining nurls found in save file
+        # Recrawls also requeue downloaded nurls that finished ok
+        # (they are revalidated, see worker_revalidate)
+        recrawl = self.config.recrawl
         with self.nap.mutex:
-            for dic in self.nap.dict.values():
+            for dic in list(self.nap.dict.values()):
                 nurl = Nurl.from_dict(dic)
                 # remove intermediate state
                 if nurl.status == NURL_STATUS_IN_USE:
                     nurl.status = NURL_STATUS_NO_DOWN
                     self.nap[nurl.url] = nurl
+                # downloaded, but revalidated by the recrawl
+                if (recrawl
+                    and nurl.status == NURL_STATUS_IS_DOWN
+                    and nurl.finish == NURL_FINISH_OK):
+                    nurl.status = NURL_STATUS_NO_DOWN
+                    self.nap[nurl.url] = nurl
                 # not yet downloaded
                 if nurl.status == NURL_STATUS_NO_DOWN:
                     self.add_nurl(nurl)
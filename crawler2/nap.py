@@ -5,10 +5,19 @@
 # with dicts and msgpack
 #
 # single operations on dicts are guaranteed thread-safe by Python
+#
+# nap versions (the verstr after the dict):
+#   -   ver1    the dict only
+#   -   ver2    + exact buckets and similar buckets
+#   -   ver3    + trap detector statistics
+#   -   ver4    keys are hashes of canonical URLs (see utils/canonical.py)
+# naps older than ver4 are rekeyed from the stored URLs when they are
+# loaded (see _rekey), since canonicalization changes the URL hashes
 
 from threading import Event, RLock, Thread, main_thread
 from utils import get_logger, get_urlhash, normalize
-from crawler2.nurl import Nurl
+from crawler2.nurl import Nurl, NURL_STATUS_NO_DOWN
+from crawler2.buckets import Buckets
 import os
 import msgpack
 
@@ -56,6 +65,50 @@ class _Nap_Autosave(Thread):
             nap.save()
 
 
+def _rekey(data, exdict, smdict):
+    """Rekeys the nurl dicts of a nap by the hashes of their canonical URLs.
+    Nurl dicts whose URLs canonicalize to the same URL are merged
+    (the most advanced status is kept). Parent hashes, link hashes and the
+    nurl hashes of buckets are remapped too. Works in place.
+
+    :param data dict: The nurl dicts by hash
+    :param exdict dict: The exact buckets by hash (or None)
+    :param smdict dict: The similar buckets by hash (or None)
+    :return: The amount of nurl dicts whose hash changed
+    :rtype: int
+    """
+    remap = dict() # old hash => new hash
+    for key, dic in data.items():
+        _hash = get_urlhash(normalize(dic["url"]))
+        if _hash != key:
+            remap[key] = _hash
+
+    for key, _hash in remap.items():
+        dic = data.pop(key)
+        dic["hash"] = _hash
+        other = data.get(_hash, None)
+        if other is None or other.get("status", NURL_STATUS_NO_DOWN) < dic.get("status", NURL_STATUS_NO_DOWN):
+            data[_hash] = dic
+
+    if not remap:
+        return 0
+
+    for dic in data.values():
+        if dic.get("parent") in remap:
+            dic["parent"] = remap[dic["parent"]]
+        if dic.get("links"):
+            dic["links"] = list(dict.fromkeys(remap.get(link, link) for link in dic["links"]))
+
+    for buckets in (exdict, smdict):
+        if not isinstance(buckets, dict):
+            continue
+        for bucket in buckets.values():
+            bucket[0] = remap.get(bucket[0], bucket[0])
+            bucket[-1] = [remap.get(h, h) for h in bucket[-1]]
+
+    return len(remap)
+
+
 class Nap:
     """Thread-safe persistent hash maps of Nurls (node urls).
     See crawler2/nurl.py for info on the Nurl class.
@@ -83,17 +136,30 @@ class Nap:
     mutex       Reentrant lock object on Nap object
 
     exdict      Buckets of exact webpages by hash
-                Each bucket comprises of a list of 2 elements:
+                Each bucket comprises of a list of 3 elements:
                     (1) master URL
-                    (2) a list of related nurls by hash
+                    (2) the count of related nurls
+                    (3) a capped sample of related nurls by hash
+                Guarded by its own striped locks (not self.mutex)
+                See crawler2/buckets.py
 
     smdict      Buckets of similar webpages by hash
-                Each bucket comprises of a list of 2 elements:
+                Each bucket comprises of a list of 3 elements:
                     (1) master URL
-                    (2) a list of related nurls by hash
+                    (2) the count of related nurls
+                    (3) a capped sample of related nurls by hash
+                Guarded by its own striped locks (not self.mutex)
+                See crawler2/buckets.py
+
+    tpdict      URL template statistics for the trap detector
+                See crawler2/traps.py
+                Guarded by self.mutex
+
+    If `dup_log` is True, every related nurl is also appended to
+    the side files `<fname>.exdup` and `<fname>.smdup`.
 
     """
-    def __init__(self, fname, autosave_interval=5, autosave_threshold=200):
+    def __init__(self, fname, autosave_interval=5, autosave_threshold=200, dup_log=False):
         self.closed = False
         self.fname = fname
         self.writecnt = 0
@@ -103,9 +169,12 @@ class Nap:
         self.dict = None
         self.exdict = None
         self.smdict = None
+        self.tpdict = None
 
         self.mutex = RLock()
 
+        _verstr = None
+
         # open file if it exists
         if os.path.exists(fname):
             with open(fname, "rb") as fh:
@@ -121,10 +190,10 @@ class Nap:
                 # read other versions
                 else:
                     _verstr = _eof
-                    if _verstr == b"ver2":
+                    if _verstr in (b"ver2", b"ver3", b"ver4"):
                         # version 2
                         # extends Nap with similar buckets and exact buckets
-                        self.logger.info("nap ver2")
+                        self.logger.info(f"nap {_verstr.decode()}")
 
                         # read exact buckets
                         ex_size = int.from_bytes(fh.read(4), "little")
@@ -134,6 +203,12 @@ class Nap:
                         sm_size = int.from_bytes(fh.read(4), "little")
                         self.smdict = msgpack.unpackb(fh.read(sm_size), raw=False)
 
+                        # version 3
+                        # extends Nap with trap detector statistics
+                        if _verstr in (b"ver3", b"ver4"):
+                            tp_size = int.from_bytes(fh.read(4), "little")
+                            self.tpdict = msgpack.unpackb(fh.read(tp_size), raw=False)
+
                     else:
                         self.logger.info("nap illegal ver, assume ver1")
 
@@ -141,11 +216,20 @@ class Nap:
         if not self.dict or not isinstance(self.dict, dict):
             self.dict = dict()
 
-        if not self.exdict or not isinstance(self.exdict, dict):
-            self.exdict = dict()
+        # naps older than ver4 were keyed before canonicalization
+        # rekey them so that their nurls are found (and saved as ver4)
+        elif _verstr != b"ver4":
+            rekeyed = _rekey(self.dict, self.exdict, self.smdict)
+            self.logger.info(f"nap rekeyed {rekeyed} of {len(self.dict)} nurls")
+            if rekeyed:
+                self.writecnt += 1
 
-        if not self.smdict or not isinstance(self.smdict, dict):
-            self.smdict = dict()
+        if not self.tpdict or not isinstance(self.tpdict, dict):
+            self.tpdict = dict()
+
+        # wrap buckets (invalid buckets are replaced by empty buckets)
+        self.exdict = Buckets(self.exdict, sidefile=f"{fname}.exdup" if dup_log else None)
+        self.smdict = Buckets(self.smdict, sidefile=f"{fname}.smdup" if dup_log else None)
 
         # log init message
         self.logger.info(
@@ -203,6 +287,22 @@ class Nap:
             return _hash in self.dict
 
 
+    def add(self, nurl):
+        """Adds the nurl as an entry iff no entry exists for its hash.
+        The precomputed hash is used (the URL is not normalized again).
+
+        :param nurl Nurl: The nurl
+        :return: Whether the nurl was added
+        :rtype: bool
+        """
+        with self.mutex:
+            if nurl.hash in self.dict:
+                return False
+            self.dict.__setitem__(nurl.hash, nurl.__dict__.copy())
+            self.writecnt += 1
+            return True
+
+
     def close(self, max_retries=3):
         """Closes the Nap object.
         Stops autosaving and saves the final dict.
@@ -228,6 +328,10 @@ class Nap:
                 write_ok = True
                 break
 
+        # close bucket side files (if they exist)
+        self.exdict.close()
+        self.smdict.close()
+
         # log close message
         self.logger.info(f"successfully closed (final_save={write_ok})")
 
@@ -245,6 +349,9 @@ class Nap:
         reads and writes during saving. This would require a separate mutex
         for saving.
 
+        Buckets are only locked while they are packed, so
+        dedup checks are not blocked while the dict is packed.
+
         :return: Whether save succeeded
         :rtype: bool
         """
@@ -266,21 +373,32 @@ class Nap:
                 fh.write(packed)
 
                 # write verstr (ver2+)
-                fh.write(b"ver2")
+                fh.write(b"ver4")
 
                 # write exdict (ver2)
-                packed_ex = msgpack.packb(self.exdict, use_bin_type=True)
+                with self.exdict.lock_all():
+                    packed_ex = msgpack.packb(self.exdict.dict, use_bin_type=True)
                 fh.write(len(packed_ex).to_bytes(4, "little"))
                 fh.write(packed_ex)
 
                 # write smdict (ver2)
-                packed_sm = msgpack.packb(self.smdict, use_bin_type=True)
+                with self.smdict.lock_all():
+                    packed_sm = msgpack.packb(self.smdict.dict, use_bin_type=True)
                 fh.write(len(packed_sm).to_bytes(4, "little"))
                 fh.write(packed_sm)
 
+                # write tpdict (ver3)
+                packed_tp = msgpack.packb(self.tpdict, use_bin_type=True)
+                fh.write(len(packed_tp).to_bytes(4, "little"))
+                fh.write(packed_tp)
+
                 self.writecnt = 0
                 write_ok = True
 
+            # side files should be at least as recent as the save
+            self.exdict.flush()
+            self.smdict.flush()
+
         # if write OK, remove and rename
         if write_ok:
             if os.path.exists(self.fname):
@@ -25,6 +25,7 @@ NURL_FINISH_TOO_SIMILAR = 0x5
 NURL_FINISH_NOT_ALLOWED = 0x6
 NURL_FINISH_REDIRECT = 0x7
 NURL_FINISH_SIFTED = 0x8
+NURL_FINISH_TRAP = 0x9
 NURL_FINISH_CACHE_ERROR = 0xFF
 
 
@@ -92,6 +93,8 @@ class Nurl:
                     -   0x5: too-similar
                     -   0x6: not-allowed
                     -   0x7: redirected
+                    -   0x8: sifted
+                    -   0x9: trap (dropped by crawler2/traps.py)
                     -   0xFF: cache server error (status=600+)
 
     absdepth    The absolute depth (relative to seed URL).
@@ -119,15 +122,26 @@ class Nurl:
     smhash      Similarity hash for comparing against webpages.
                 Also known as a fingerprint.
 
+    etag        ETag header of the last response (or None).
+
+    lastmod     Last-Modified header of the last response (or None).
+                Both are validators for conditional recrawls.
+
+    retries     Amount of times the download was retried
+                (see crawler2/retry.py). Kept across restarts.
+
     """
-    def __init__(self, url):
+    def __init__(self, url, urlhash=None):
         """Initializes a Nurl object from the URL.
+        The hash is computed unless it is given
+        (e.g. from utils.resolver.UrlResolver).
 
         :param url str: The URL
+        :param urlhash str: The hash of the normalized URL (or None)
         """
         # internals
         self.url = url
-        self.hash = get_urlhash(normalize(url))
+        self.hash = urlhash or get_urlhash(normalize(url))
         self.parent = None
         self.status = 0x0
         self.finish = 0x0
@@ -143,6 +157,9 @@ class Nurl:
         self.links = []
         self.exhash = None
         self.smhash = None
+        self.etag = None
+        self.lastmod = None
+        self.retries = 0
 
 
     @classmethod
@@ -173,10 +190,27 @@ class Nurl:
         nurl.links = dic["links"]
         nurl.exhash = dic["exhash"]
         nurl.smhash = dic["smhash"]
+        nurl.etag = dic.get("etag", None) # older naps do not have validators
+        nurl.lastmod = dic.get("lastmod", None)
+        nurl.retries = dic.get("retries", 0)
 
         return nurl
 
 
+    def validators(self):
+        """Returns the conditional request headers for the validators
+        of the last response (empty if there are none).
+
+        :rtype: dict[str, str]
+        """
+        headers = dict()
+        if self.etag:
+            headers["If-None-Match"] = self.etag
+        if self.lastmod:
+            headers["If-Modified-Since"] = self.lastmod
+        return headers
+
+
     def set_parent(self, parent):
         """Sets the parent of the nurl.
         Attributes are recomputed based on the parent.
@@ -198,8 +232,7 @@ class Nurl:
         prnt_url = normalize(parent.url)
 
         # sets parent to the parent URL hash
-        parenthash = get_urlhash(prnt_url)
-        self.parent = parenthash
+        self.parent = parent.hash
 
         # computes the absolute depth
         # child is always 1 level deeper from parent relative to seed URL
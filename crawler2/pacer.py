@@ -0,0 +1,121 @@
+# crawler2/pacer.py
+#
+# adaptive per-host politeness
+#
+# a fixed per-host delay (robots.txt crawl-delay or POLITENESS) is too slow
+# for fast, healthy hosts and too aggressive for struggling ones
+# each host has a pacer that keeps moving averages of the response time
+# and of the 5xx rate of its downloads, and derives the host's delay:
+#
+#   delay = latency / PACER_CONCURRENCY * (1 + PACER_ERROR_BACKOFF * error rate)
+#
+# clamped to [floor, ceiling] (see [CRAWLER] POLITENESS_FLOOR/CEILING)
+# the crawl-delay of robots.txt is never undercut
+#
+# the host's PoliteMutex waits for the pacer's delay (see crawler2/polmut.py)
+# and the pacer keeps per-host throughput and error statistics
+
+from threading import Lock
+import time
+
+
+# weight of the latest download in the moving averages
+PACER_ALPHA = 0.2
+
+# downloads a host is expected to serve concurrently
+# (a host that answers in 1s is waited on for 1s)
+PACER_CONCURRENCY = 1.0
+
+# how much the delay grows with the 5xx rate (5x when every response is a 5xx)
+PACER_ERROR_BACKOFF = 4.0
+
+
+class HostPacer:
+    """Thread-safe adaptive delay of a host.
+
+    floor       Minimum delay (seconds)
+    ceiling     Maximum delay (seconds)
+    delay       Current delay (seconds)
+    latency     Moving average of the response time (seconds)
+    error_rate  Moving average of the 5xx rate
+    requests    Amount of downloads observed
+    errors      Amount of 5xx responses observed
+
+    """
+    def __init__(self, delay, floor, ceiling):
+        """Initializes the pacer of a host.
+
+        :param delay float: The initial delay (e.g. the crawl-delay)
+        :param floor float: The minimum delay
+        :param ceiling float: The maximum delay
+        """
+        self.floor = floor
+        self.ceiling = max(ceiling, floor)
+        self.delay = min(max(delay, self.floor), self.ceiling)
+        self.latency = None
+        self.error_rate = 0.0
+        self.requests = 0
+        self.errors = 0
+        self._start = None
+        self._mutex = Lock()
+
+
+    @classmethod
+    def for_host(cls, config, crawl_delay=None):
+        """Creates the pacer of a host from the config.
+        The crawl-delay of robots.txt (if any) raises the floor.
+
+        :param config Config: The config object
+        :param crawl_delay float | None: The crawl-delay of robots.txt
+        :rtype: HostPacer
+        """
+        floor = config.politeness_floor
+        ceiling = config.politeness_ceiling
+        if crawl_delay is not None:
+            floor = max(floor, crawl_delay)
+            ceiling = max(ceiling, crawl_delay)
+            return cls(crawl_delay, floor, ceiling)
+        return cls(config.time_delay, floor, ceiling)
+
+
+    def observe(self, latency, status):
+        """Records a download of the host and adapts the delay.
+
+        :param latency float: The response time (seconds)
+        :param status int: The status of the response
+        :return: The new delay
+        :rtype: float
+        """
+        error = 500 <= status < 600
+        with self._mutex:
+            if self._start is None:
+                self._start = time.monotonic() - latency
+            self.requests += 1
+            self.errors += error
+
+            if self.latency is None:
+                self.latency = latency
+            else:
+                self.latency += PACER_ALPHA * (latency - self.latency)
+            self.error_rate += PACER_ALPHA * (error - self.error_rate)
+
+            delay = self.latency / PACER_CONCURRENCY * (1 + PACER_ERROR_BACKOFF * self.error_rate)
+            self.delay = min(max(delay, self.floor), self.ceiling)
+            return self.delay
+
+
+    def stats(self):
+        """Returns the statistics of the host.
+
+        :rtype: dict
+        """
+        with self._mutex:
+            elapsed = time.monotonic() - self._start if self._start is not None else 0.0
+            return {
+                "requests": self.requests,
+                "errors": self.errors,
+                "error_rate": self.errors / self.requests if self.requests else 0.0,
+                "throughput": self.requests / elapsed if elapsed > 0 else 0.0,
+                "latency": self.latency or 0.0,
+                "delay": self.delay,
+            }
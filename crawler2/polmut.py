@@ -4,6 +4,7 @@
 # politeness timer
 
 from threading import Lock, Timer
+import time
 
 
 class PoliteMutex:
@@ -11,15 +12,24 @@ class PoliteMutex:
 
     _mutex: Lock object
     _politeness: Politeness time delay
+    pacer: HostPacer whose adaptive delay is used instead (or None)
+    waits: Histogram of the waits for the mutex (or None)
     """
-    def __init__(self, politeness):
+    def __init__(self, politeness, pacer=None, waits=None):
         self._politeness = politeness
         self._mutex = Lock()
+        self.pacer = pacer
+        self.waits = waits
 
     def lock(self):
         """Locks the mutex
         """
+        if self.waits is None:
+            self._mutex.acquire()
+            return
+        start = time.perf_counter()
         self._mutex.acquire()
+        self.waits.add(time.perf_counter() - start)
 
     __enter__ = lock
 
@@ -27,7 +37,8 @@ class PoliteMutex:
         """Unlocks the mutex after waiting for the
         politeness timer delay
         """
-        Timer(self._politeness, self._mutex.release).start()
+        politeness = self.pacer.delay if self.pacer else self._politeness
+        Timer(politeness, self._mutex.release).start()
 
     def __exit__(self, t, v, tb):
         self.unlock()
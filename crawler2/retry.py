@@ -0,0 +1,103 @@
+# crawler2/retry.py
+#
+# time-ordered queue of nurls whose download is retried later
+# used by the frontier (see Frontier.retry_nurl)
+#
+# server errors used to be retried by sleeping in the worker thread,
+# which pinned the worker for up to sum(RETRY_DELAY) seconds per URL
+# instead, failed nurls wait in a heap ordered by their due time,
+# and a daemon thread hands them back to the frontier once they are due
+#
+# delays back off exponentially (RETRY_DELAY) and are jittered, so that
+# nurls that failed together are not retried together
+
+from itertools import count
+from threading import Condition, Thread
+import heapq
+import random
+import time
+
+
+# Downloads are retried up until all delays are exhausted.
+# Each element corresponds to how long the nurl waits before it is retried
+# (the worker thread is not stuck on the URL meanwhile).
+# The amount of delays can be adjusted.
+RETRY_DELAY = [1, 2, 4, 8, 16]
+
+# delays are scaled by a random factor in [1 - RETRY_JITTER, 1 + RETRY_JITTER]
+RETRY_JITTER = 0.5
+
+
+def retry_delay(retries, rng=random):
+    """Returns the jittered delay before the next retry.
+
+    :param retries int: The amount of retries so far (including the next one)
+    :param rng random.Random: The random number generator
+    :return: The delay in seconds
+    :rtype: float
+    """
+    delay = RETRY_DELAY[min(max(retries - 1, 0), len(RETRY_DELAY) - 1)]
+    return delay * rng.uniform(1 - RETRY_JITTER, 1 + RETRY_JITTER)
+
+
+class RetryQueue:
+    """Thread-safe time-ordered queue of nurls to retry.
+
+    release     Called with each nurl once it is due
+                (from the daemon thread of the queue)
+
+    """
+    def __init__(self, release):
+        self.release = release
+        self._heap = [] # (due time, sequence, nurl)
+        self._seq = count()
+        self._cond = Condition()
+        self._thread = None
+
+
+    def __len__(self):
+        with self._cond:
+            return len(self._heap)
+
+
+    def push(self, nurl, delay):
+        """Schedules the nurl to be released after the delay.
+
+        :param nurl Nurl: The nurl object
+        :param delay float: The delay in seconds
+        """
+        with self._cond:
+            heapq.heappush(self._heap, (time.monotonic() + delay, next(self._seq), nurl))
+            self._cond.notify()
+            if self._thread is None:
+                self._thread = Thread(target=self._run, daemon=True)
+                self._thread.start()
+
+
+    def pop_due(self, now=None):
+        """Removes and returns the nurls that are due (in due order).
+
+        :param now float: The time (defaults to time.monotonic())
+        :rtype: list[Nurl]
+        """
+        if now is None:
+            now = time.monotonic()
+        due = []
+        with self._cond:
+            while self._heap and self._heap[0][0] <= now:
+                due.append(heapq.heappop(self._heap)[2])
+        return due
+
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while not self._heap:
+                    self._cond.wait()
+                timeout = self._heap[0][0] - time.monotonic()
+                if timeout > 0:
+                    # woken up early by pushes of nurls that are due sooner
+                    self._cond.wait(timeout)
+                    continue
+            for nurl in self.pop_due():
+                self.release(nurl)
@@ -7,14 +7,16 @@ from crawler2.download import download
 from urllib.robotparser import RobotFileParser
 
 
-def robots(netloc, config=None, logger=None, use_cache=False):
+def robots(netloc, config=None, logger=None, use_cache=False, batcher=None):
     """Downloads robots.txt from the netloc and reads it.
     If `use_cache` is True, then it downloads from the cache server instead.
+    If `batcher` is given, the download is batched (see crawler2/batch.py).
 
     Returns a RobotFileParser for the specific domain.
 
     :param netloc str: The net location
     :param use_cache bool: Whether robots.txt should source from cache server
+    :param batcher BatchDownloader: The batch downloader (or None)
     :return: The RobotFileParser for the netloc
     :rtype: RobotFileParser
 
@@ -22,21 +24,25 @@ def robots(netloc, config=None, logger=None, use_cache=False):
     robots_url = f"{netloc}/robots.txt"
     robots_parser = RobotFileParser()
 
-    resp = download(
-        robots_url,
-        config=config,
-        logger=logger,
-        use_cache=use_cache
-    )
+    if batcher is not None:
+        resp = batcher.download(robots_url)
+    else:
+        resp = download(
+            robots_url,
+            config=config,
+            logger=logger,
+            use_cache=use_cache
+        )
 
-    logger.info(
-        f"Downloaded robots {robots_url} "
-        f"(status={resp.status}) "
-        f"(error='{resp.error}')"
-    )
+    if resp != None:
+        logger.info(
+            f"Downloaded robots {robots_url} "
+            f"(status={resp.status}) "
+            f"(error='{resp.error}')"
+        )
 
     # assume allow-all is True if the cache server fails
-    if resp.raw_response == None:
+    if resp == None or resp.raw_response == None:
         robots_parser.allow_all = True
         return robots_parser
 
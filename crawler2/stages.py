@@ -0,0 +1,231 @@
+# crawler2/stages.py
+#
+# per-stage latency histograms of the worker pipeline
+# used by crawler2/worker.py (see Frontier.stages)
+#
+# the only visibility into where a page's wall time goes used to be
+# the INFO logs of the workers
+# instead, each stage of Worker.run (sift, domain info, fetch, filters,
+# process_text, scrape, transform) is timed into a histogram, and so is
+# the time spent waiting for the crawler's locks:
+#   -   lock:dpolmut    the global polite mutex (see Frontier.dpolmut)
+#   -   lock:pmut       the per-host polite mutexes (politeness waits included)
+#   -   lock:nap        the nap's mutex (see crawler2/nap.py)
+#
+# histograms are log-linear (HISTOGRAM_SUBBUCKETS buckets per power of 2),
+# so recording a time is O(1) and percentiles are within ~12% of the exact ones
+# StageReporter logs the p50/p95/p99 of every stage every
+# STAGE_REPORT_INTERVAL seconds, and the crawler logs them at shutdown
+
+from threading import Event, Lock, Thread
+import math
+import time
+
+
+# buckets per power of 2
+HISTOGRAM_SUBBUCKETS = 8
+
+# smallest time that is told apart from zero (seconds)
+HISTOGRAM_RESOLUTION = 1e-6
+
+# seconds between the periodic reports of StageReporter
+STAGE_REPORT_INTERVAL = 60.0
+
+
+class Histogram:
+    """Thread-safe log-linear histogram of durations.
+
+    count   Amount of durations recorded
+    total   Sum of the durations (seconds)
+    max     Largest duration (seconds)
+
+    """
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self._buckets = dict() # bucket => count
+        self._mutex = Lock()
+
+
+    @staticmethod
+    def _bucket(seconds):
+        """Returns the bucket of the duration (0 below the resolution)."""
+        units = seconds / HISTOGRAM_RESOLUTION
+        if units < 1.0:
+            return 0
+        m, e = math.frexp(units) # units = m * 2**e, 0.5 <= m < 1
+        return e * HISTOGRAM_SUBBUCKETS + int((2 * m - 1) * HISTOGRAM_SUBBUCKETS) - HISTOGRAM_SUBBUCKETS + 1
+
+
+    @staticmethod
+    def _upper(bucket):
+        """Returns the upper bound of the bucket (seconds)."""
+        if bucket == 0:
+            return HISTOGRAM_RESOLUTION
+        e, sub = divmod(bucket - 1, HISTOGRAM_SUBBUCKETS)
+        return HISTOGRAM_RESOLUTION * 2 ** e * (1 + (sub + 1) / HISTOGRAM_SUBBUCKETS)
+
+
+    def add(self, seconds):
+        """Records a duration.
+
+        :param seconds float: The duration
+        """
+        bucket = self._bucket(seconds)
+        with self._mutex:
+            self.count += 1
+            self.total += seconds
+            if seconds > self.max:
+                self.max = seconds
+            self._buckets[bucket] = self._buckets.get(bucket, 0) + 1
+
+
+    def percentile(self, q):
+        """Returns the q-th percentile (the upper bound of its bucket,
+        capped by the largest duration).
+
+        :param q float: The percentile (0-100)
+        :rtype: float
+        """
+        with self._mutex:
+            if self.count == 0:
+                return 0.0
+            rank = max(1, math.ceil(q / 100 * self.count))
+            seen = 0
+            for bucket in sorted(self._buckets):
+                seen += self._buckets[bucket]
+                if seen >= rank:
+                    return min(self._upper(bucket), self.max)
+            return self.max
+
+
+    def stats(self):
+        """Returns the statistics of the histogram (in seconds).
+
+        :rtype: dict
+        """
+        with self._mutex:
+            count, total, largest = self.count, self.total, self.max
+        return {
+            "count": count,
+            "total": total,
+            "mean": total / count if count else 0.0,
+            "p50": self.percentile(50),
+            "p95": self.percentile(95),
+            "p99": self.percentile(99),
+            "max": largest,
+        }
+
+
+class TimedLock:
+    """Lock (or RLock) that records how long acquiring it waited.
+    Supports the same interface as the wrapped lock.
+
+    lock    The wrapped lock object
+    waits   Histogram of the waits
+
+    """
+    def __init__(self, lock, waits):
+        self.lock = lock
+        self.waits = waits
+
+
+    def acquire(self, blocking=True, timeout=-1):
+        start = time.perf_counter()
+        acquired = self.lock.acquire(blocking, timeout)
+        self.waits.add(time.perf_counter() - start)
+        return acquired
+
+
+    def release(self):
+        self.lock.release()
+
+
+    def __enter__(self):
+        self.acquire()
+        return self
+
+
+    def __exit__(self, t, v, tb):
+        self.release()
+
+
+class StageStats:
+    """Thread-safe histograms of the stages of the worker pipeline,
+    by stage name (see the header of crawler2/stages.py).
+    """
+    def __init__(self):
+        self._histograms = dict() # name => Histogram
+        self._mutex = Lock()
+
+
+    def histogram(self, name):
+        """Returns the histogram of the stage (created if needed).
+
+        :param name str: The name of the stage
+        :rtype: Histogram
+        """
+        hist = self._histograms.get(name, None)
+        if hist is None:
+            with self._mutex:
+                hist = self._histograms.setdefault(name, Histogram())
+        return hist
+
+
+    def lap(self, name, start):
+        """Records the time since `start` as a duration of the stage.
+        Returns the current time, which starts the next stage.
+
+        :param name str: The name of the stage
+        :param start float: The start of the stage (time.perf_counter())
+        :return: The current time (time.perf_counter())
+        :rtype: float
+        """
+        now = time.perf_counter()
+        self.histogram(name).add(now - start)
+        return now
+
+
+    def stats(self):
+        """Returns the statistics of every stage (see Histogram.stats).
+
+        :rtype: dict[str, dict]
+        """
+        with self._mutex:
+            histograms = sorted(self._histograms.items())
+        return {name: hist.stats() for name, hist in histograms}
+
+
+    def report(self, logger):
+        """Logs the percentiles of every stage (in milliseconds).
+
+        :param logger Logger: The logger object
+        """
+        for name, stats in self.stats().items():
+            logger.info(
+                f"stage stats {name} "
+                f"(count={stats['count']},total={stats['total']:.3f}s"
+                f",p50={stats['p50'] * 1e3:.3f}ms,p95={stats['p95'] * 1e3:.3f}ms"
+                f",p99={stats['p99'] * 1e3:.3f}ms,max={stats['max'] * 1e3:.3f}ms)"
+            )
+
+
+class StageReporter(Thread):
+    """Daemon thread that reports the stage statistics periodically."""
+    def __init__(self, stages, logger, interval=STAGE_REPORT_INTERVAL):
+        self.stages = stages
+        self.logger = logger
+        self.interval = interval
+        self._halt = Event()
+        super().__init__(daemon=True)
+
+
+    def run(self):
+        while not self._halt.wait(self.interval):
+            self.stages.report(self.logger)
+
+
+    def stop(self):
+        """Stops the reports (the thread exits at its next wake-up)."""
+        self._halt.set()
@@ -0,0 +1,138 @@
+# crawler2/traps.py
+#
+# pre-fetch crawler trap detector
+#
+# calendars, wiki revisions and faceted searches generate endless URLs
+# that share a template (e.g. /events/{n}-{n}-{n}, /doku.php?do&id&rev)
+# the detector keeps statistics per template from nurl.finish and
+# demotes or drops URLs whose template keeps yielding duplicate or
+# low-info pages before they are fetched
+#
+# statistics are stored in nap.tpdict and persisted with the nap
+
+from crawler2.nurl import *
+from urllib.parse import urlsplit
+import re
+
+
+# template statistics indices
+TRAP_FETCHED = 0
+TRAP_DUP = 1
+TRAP_LOWINFO = 2
+
+
+# minimum fetches of a template before it is judged
+TRAP_MIN_SAMPLES = 10
+
+# bad rate (duplicate + low-info) at which a template is demoted/dropped
+TRAP_DEMOTE_RATE = 0.5
+TRAP_DROP_RATE = 0.8
+
+
+# verdicts
+TRAP_OK = 0x0
+TRAP_DEMOTE = 0x1
+TRAP_DROP = 0x2
+
+
+_DUP_FINISHES = {NURL_FINISH_TOO_EXACT, NURL_FINISH_TOO_SIMILAR}
+_LOWINFO_FINISHES = {NURL_FINISH_LOWINFO_PRE, NURL_FINISH_LOWINFO_POST}
+_RECORD_FINISHES = _DUP_FINISHES | _LOWINFO_FINISHES | {NURL_FINISH_OK}
+
+_ID_RE = re.compile(
+    r"[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12}"  # uuid
+    r"|[0-9a-f]*[0-9][0-9a-f]*[a-f][0-9a-f]*"                         # hex ids
+    r"|[0-9a-f]*[a-f][0-9a-f]*[0-9][0-9a-f]*",
+    re.IGNORECASE
+)
+_NUM_RE = re.compile(r"\d+")
+
+
+def _segment_template(segment):
+    """Collapses the ID and numeric parts of a path segment."""
+    if len(segment) >= 8 and _ID_RE.fullmatch(segment):
+        return "{id}"
+    return _NUM_RE.sub("{n}", segment)
+
+
+def url_template(url):
+    """Returns the template of the URL.
+    Numeric and ID path segments are collapsed, and only the
+    sorted names of query parameters are kept.
+
+        https://wics.ics.uci.edu/events/2024-10-01/?ical=1
+            => wics.ics.uci.edu/events/{n}-{n}-{n}?ical
+
+    :param url str: The URL
+    :return: The template
+    :rtype: str
+    """
+    parts = urlsplit(url)
+    path = "/".join(_segment_template(seg) for seg in parts.path.rstrip("/").split("/"))
+    template = f"{parts.netloc.lower()}{path}"
+    if parts.query:
+        names = sorted({p.partition("=")[0] for p in parts.query.split("&") if p})
+        template += "?" + "&".join(names)
+    return template
+
+
+class TrapDetector:
+    """Per-host URL template statistics.
+
+    Not thread-safe on its own: record(...) must be called under
+    nap.mutex (see Frontier.mark_nurl_complete). verdict(...) only reads.
+
+    stats       Mapping of templates to [fetched, duplicates, low-info]
+                (nap.tpdict; persisted with the nap)
+    demoted     Hashes of nurls demoted during this run
+                A nurl is only demoted once per run
+
+    """
+    def __init__(self, stats):
+        self.stats = stats
+        self.demoted = set()
+
+
+    def record(self, nurl):
+        """Records the finish state of a downloaded nurl.
+        Finish states that say nothing about the page content
+        (e.g. not allowed, cache errors) are ignored.
+
+        :param nurl Nurl: The downloaded nurl
+        """
+        if nurl.finish not in _RECORD_FINISHES:
+            return
+        template = url_template(nurl.url)
+        stat = self.stats.get(template, None)
+        if stat is None:
+            stat = [0, 0, 0]
+            self.stats[template] = stat
+        stat[TRAP_FETCHED] += 1
+        if nurl.finish in _DUP_FINISHES:
+            stat[TRAP_DUP] += 1
+        elif nurl.finish in _LOWINFO_FINISHES:
+            stat[TRAP_LOWINFO] += 1
+
+
+    def verdict(self, nurl):
+        """Judges the nurl by the statistics of its template.
+        Seed nurls (absdepth 0) are always OK.
+
+        :param nurl Nurl: The nurl to fetch
+        :return: TRAP_OK, TRAP_DEMOTE or TRAP_DROP
+        :rtype: int
+        """
+        if nurl.absdepth == 0:
+            return TRAP_OK
+
+        stat = self.stats.get(url_template(nurl.url), None)
+        if stat is None or stat[TRAP_FETCHED] < TRAP_MIN_SAMPLES:
+            return TRAP_OK
+
+        rate = (stat[TRAP_DUP] + stat[TRAP_LOWINFO]) / stat[TRAP_FETCHED]
+        if rate >= TRAP_DROP_RATE:
+            return TRAP_DROP
+        if rate >= TRAP_DEMOTE_RATE and nurl.hash not in self.demoted:
+            self.demoted.add(nurl.hash)
+            return TRAP_DEMOTE
+        return TRAP_OK
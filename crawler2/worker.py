@@ -5,6 +5,7 @@
 
 from threading import Thread
 from inspect import getsource
+import time
 from utils import get_logger
 from crawler2.workerpipe import *
 
@@ -25,9 +26,14 @@ class Worker(Thread):
 
 
     def run(self):
+        # each stage is timed from the end of the previous one
+        # see crawler2/stages.py
+        stages = self.frontier.stages
         while True:
             # Fetch next nurl / URL
+            t = time.perf_counter()
             nurl = self.frontier.get_tbd_nurl()
+            t = start = stages.lap("get_nurl", t)
             if nurl == None:
                 # No more URLs
                 self.logger.info("Frontier empty; stopping worker")
@@ -37,7 +43,9 @@ class Worker(Thread):
             )
 
             # Pipe: sift URL before considering it
-            if not worker_sift_nurl(self, nurl):
+            sifted = worker_sift_nurl(self, nurl)
+            t = stages.lap("sift", t)
+            if not sifted:
                 # Do not mark URLs as complete in case the crawler changes its mind
                 # Instead, skip the URL entirely, but mark it as sifted
                 self.frontier.mark_nurl_complete(nurl, status=NURL_STATUS_NO_DOWN)
@@ -49,8 +57,32 @@ class Worker(Thread):
                 )
                 continue
 
+            # Pipe: check URL template against the trap detector
+            ok = worker_check_trap(self, nurl)
+            t = stages.lap("trap", t)
+            if ok == PIPE_AGAIN:
+                # Demoted: put the nurl back at the end of the queue
+                self.frontier.mark_nurl_complete(nurl, status=NURL_STATUS_NO_DOWN)
+                self.frontier.add_nurl(nurl)
+                self.frontier.nurls.task_done()
+                self.logger.info(
+                    f"Tried to fetch {nurl.url}, "
+                    f"but was demoted by the trap detector"
+                )
+                continue
+            if ok == PIPE_BAD:
+                self.frontier.mark_nurl_complete(nurl)
+                self.frontier.nurls.task_done()
+                self.logger.info(
+                    f"Tried to fetch {nurl.url}, "
+                    f"but was dropped by the trap detector "
+                    f"(finish={nurl.finish})"
+                )
+                continue
+
             # Pipe: get domain info
             ok, pmut = worker_get_domain_info(self, nurl)
+            t = stages.lap("domain_info", t)
             if ok == PIPE_BAD:
                 self.frontier.mark_nurl_complete(nurl)
                 self.frontier.nurls.task_done()
@@ -61,26 +93,64 @@ class Worker(Thread):
                 )
                 continue
 
+            # Pipe: check the domain's circuit breaker
+            ok = worker_check_host(self, nurl)
+            t = stages.lap("check_host", t)
+            if ok == PIPE_AGAIN:
+                # Parked: the nurl's task is done once it is requeued
+                self.logger.info(
+                    f"Tried to download {nurl.url}, "
+                    f"but its domain is failing, and was parked... "
+                )
+                continue
+
             # Pipe: get response
+            # (includes the waits for dpolmut and pmut)
             ok, resp = worker_get_resp(self, nurl, pmut, use_cache=self.frontier.use_cache)
+            t = stages.lap("fetch", t)
             if ok == PIPE_AGAIN:
-                self.frontier.add_nurl(nurl)
-                self.frontier.nurls.task_done()
+                if resp: scraper.release(resp)
+                # The nurl's task is done once it is requeued
+                self.frontier.retry_nurl(nurl, resp.retry_after if resp else None)
                 self.logger.info(
                     f"Tried to download {nurl.url}, "
-                    f"but response was None, and should try again later... "
+                    f"but response was a server error or None, and should try again later... "
+                    f"(retries={nurl.retries})"
                 )
                 continue
             if ok != PIPE_OK:
+                if resp: scraper.release(resp)
+                # Left un-downloaded (e.g. its connection kept failing)
+                self.frontier.mark_nurl_complete(nurl, status=NURL_STATUS_NO_DOWN)
                 self.frontier.nurls.task_done()
                 self.logger.info(
                     f"Tried to download {nurl.url}, "
                     f"but was skipped... "
+                    f"(status={resp.status if resp else None})"
+                )
+                continue
+
+            # Pipe: revalidate response (recrawls)
+            # Not modified responses keep the nurl's previous state
+            modified = worker_revalidate(self, nurl, resp)
+            t = stages.lap("revalidate", t)
+            if not modified:
+                scraper.release(resp)
+                # its finish state was recorded by the trap detector before
+                self.frontier.mark_nurl_complete(nurl, record=False)
+                self.frontier.nurls.task_done()
+                self.logger.info(
+                    f"Downloaded {nurl.url}, "
+                    f"but response was not modified "
+                    f"(status={resp.status},finish={nurl.finish})"
                 )
                 continue
 
             # Pipe: filter response
-            if not worker_filter_resp_pre(self, nurl, resp):
+            ok = worker_filter_resp_pre(self, nurl, resp)
+            t = stages.lap("filter_pre", t)
+            if not ok:
+                scraper.release(resp)
                 self.frontier.mark_nurl_complete(nurl)
                 self.frontier.nurls.task_done()
                 self.logger.info(
@@ -92,9 +162,15 @@ class Worker(Thread):
 
             # Pipe: process text content if and only if
             # response is not a sitemap (does not use the sitemaps protocol)
-            if not scraper.is_sitemap(resp):
-                tokens, words = scraper.process_text(resp)
-                if not worker_filter_resp_post_text(self, nurl, words):
+            sitemap = scraper.is_sitemap(resp)
+            if not sitemap:
+                accumulator = self.frontier.simengine.accumulator()
+                words = scraper.process_text(resp, accumulator)
+                t = stages.lap("process_text", t)
+                ok = worker_filter_resp_post_text(self, nurl, words, accumulator)
+                t = stages.lap("filter_post", t)
+                if not ok:
+                    scraper.release(resp)
                     self.frontier.mark_nurl_complete(nurl)
                     self.frontier.nurls.task_done()
                     self.logger.info(
@@ -105,18 +181,29 @@ class Worker(Thread):
                     continue
 
             # Pipe: scrape valid URLs and transform to nurls
-            scraped_urls = scraper.scraper(resp)
-            transformed_nurls = worker_transform_urls(self, nurl, scraped_urls)
+            # Then add nurls to frontier
+            # Sitemaps are streamed to the frontier in batches
+            if sitemap:
+                scraped = worker_add_sitemap_urls(self, nurl, resp)
+                t = stages.lap("sitemap", t)
+            else:
+                scraped_urls = scraper.scraper(resp)
+                t = stages.lap("scrape", t)
+                transformed_nurls = worker_transform_urls(self, nurl, scraped_urls)
+                t = stages.lap("transform", t)
+                self.frontier.add_nurls(transformed_nurls)
+                t = stages.lap("add_nurls", t)
+                scraped = len(transformed_nurls)
+            scraper.release(resp)
 
-            # Add nurls to frontier
-            # Then mark nurl as complete
-            for chld in transformed_nurls:
-                self.frontier.add_nurl(chld)
+            # Mark nurl as complete
             self.frontier.mark_nurl_complete(nurl)
             self.frontier.nurls.task_done()
+            t = stages.lap("complete", t)
+            stages.lap("page", start)
             self.logger.info(
                 f"Successfully downloaded {nurl.url} "
                 f"(filter='ok',finish={nurl.finish}"
-                f",scraped={len(transformed_nurls)},sitemap={scraper.is_sitemap(resp)})"
+                f",scraped={scraped},sitemap={sitemap})"
             )
 
@@ -4,10 +4,13 @@
 # crawler worker threads should import this file
 # if they wish to operate with the pipeline
 
+from contextlib import nullcontext
 from helpers.exhash import exhash
-from helpers.simhash import *
-from crawler2.download import download
+from helpers.parser import is_sitemap_response
+from crawler2.download import STATUS_CONNECTION_FAILED, download
 from crawler2.nurl import *
+from crawler2.retry import RETRY_DELAY
+from crawler2.traps import TRAP_DEMOTE, TRAP_DROP
 import scraper2 as scraper
 import time
 
@@ -19,16 +22,16 @@ PIPE_AGAIN = 0x02
 PIPE_BAD = 0x03
 
 
-# Downloads are retried up until all delays are exhausted.
-# Each element corresponds to how long the thread should sleep
-# (which means how long the worker thread is stuck on this URL).
-# The amount of delays can be adjusted.
-RETRY_DELAY = [1, 2, 4, 8, 16]
-
-
 # threshold values for exclusion/inclusion
 MIN_CONTENT_LEN = 200
 MAX_CONTENT_LEN = 1000000
+MAX_SITEMAP_CONTENT_LEN = 50000000
+
+# content types (without parameters) of responses that are processed
+# by direct downloads: text/* and markup are pages, XML and gzip data might be sitemaps
+# responses without a content type are processed too
+PAGE_CONTENT_TYPES = {"application/xhtml+xml"}
+SITEMAP_CONTENT_TYPES = {"application/xml", "text/xml", "application/gzip", "application/x-gzip"}
 
 MAX_ABSDEPTH = 8
 MAX_RELDEPTH = 2
@@ -58,6 +61,35 @@ def worker_sift_nurl(w, nurl):
 
 
 
+def worker_check_trap(w, nurl):
+    """Checks the nurl against the frontier's trap detector
+    before it is fetched (see crawler2/traps.py).
+
+    Returns an internal status code:
+        -   PIPE_OK if the nurl should be fetched
+        -   PIPE_AGAIN if the nurl is demoted (should be fetched later)
+        -   PIPE_BAD if the nurl is dropped
+
+    Recrawled nurls that were already downloaded (they have an exhash)
+    are always OK: they are revalidated instead (see worker_revalidate).
+
+    :param w Worker: The worker thread
+    :param nurl Nurl: The Nurl object
+    :return: An internal status code
+    :rtype: int
+
+    """
+    if nurl.exhash is not None:
+        return PIPE_OK
+    verdict = w.frontier.traps.verdict(nurl)
+    if verdict == TRAP_DROP:
+        nurl.finish = NURL_FINISH_TRAP
+        return PIPE_BAD
+    if verdict == TRAP_DEMOTE:
+        return PIPE_AGAIN
+    return PIPE_OK
+
+
 def worker_get_domain_info(w, nurl):
     """Gets domain info from the frontier.
     It then checks the robots.txt file for the URL.
@@ -82,11 +114,68 @@ def worker_get_domain_info(w, nurl):
     return (PIPE_OK, pmut)
 
 
+def worker_check_host(w, nurl):
+    """Checks the circuit breaker of the nurl's domain (see crawler2/breaker.py).
+    This should be called after getting the domain info, before downloading.
+    If the domain is failing, the nurl is parked until it recovers
+    (see Frontier.park_nurl).
+
+    Returns:
+        -   PIPE_OK if the nurl should be downloaded
+        -   PIPE_AGAIN if the nurl was parked
+
+    :param w Worker: The worker thread
+    :param nurl Nurl: The Nurl object
+    :return: An internal status code
+    :rtype: int
+
+    """
+    breaker = w.frontier.get_domain_info(nurl.url)['breaker']
+    if breaker.allow():
+        return PIPE_OK
+    w.frontier.park_nurl(nurl, breaker)
+    return PIPE_AGAIN
+
+
+def content_limit(content_type):
+    """Returns the maximum content length of a response by its content type.
+    Returns 0 if responses of the content type are never processed.
+    Used to abort direct downloads early (see crawler2/download.py).
+
+    :param content_type str: The Content-Type header
+    :return: The maximum content length
+    :rtype: int
+    """
+    media_type = content_type.partition(";")[0].strip().lower()
+    if media_type in SITEMAP_CONTENT_TYPES:
+        return MAX_SITEMAP_CONTENT_LEN
+    if (not media_type
+        or media_type.startswith("text/")
+        or media_type in PAGE_CONTENT_TYPES):
+        return MAX_CONTENT_LEN
+    return 0
+
+
 def worker_get_resp(w, nurl, pmut=None, use_cache=True):
     """Fetches the response of the nurl from the cache server.
     If `use_cache` is False, it instead downloads using the standard requests.get(...).
     Downloads shall abide by polite mutexes; it must lock for all domains, and for a specific domain, if it exists.
+    The response time and status are fed to the domain's pacer (see crawler2/pacer.py).
     The result is a Response object that matches the interface defined in "utils/response.py".
+    Direct downloads are conditional if the nurl has validators (see worker_revalidate).
+
+    Server errors from the cache server (and DNS / connection failures of
+    direct downloads) are not retried in the worker thread.
+    Instead, the retry count of the nurl is incremented and PIPE_AGAIN is
+    returned: the nurl should be retried later (see Frontier.retry_nurl).
+    Failures on the negative cache return PIPE_AGAIN without using up
+    a retry; the nurl should wait `resp.retry_after` seconds.
+    Connection failures that exhausted the retries return PIPE_BAD:
+    the nurl should be left un-downloaded.
+    Every status is recorded in the domain's circuit breaker; downloads
+    without a status to record cancel the breaker's probe instead.
+    If the frontier batches downloads (see crawler2/batch.py), the batch
+    locks the polite mutex for all domains instead.
 
     Returns a result tuple (ok, err) where:
         -   ok (1) is an internal status code
@@ -105,27 +194,93 @@ def worker_get_resp(w, nurl, pmut=None, use_cache=True):
 
     # Downloads the URL
     # Response interface defined in "utils.response.Response"
-    # Retry only if `use_cache` is True
+    # Retry later (see Frontier.retry_nurl)
+
+    MAX_RETRIES = len(RETRY_DELAY)
+    batcher = frontier.batcher
+
+    # Download URL
+    # Failures on the negative cache are not downloads: they are not
+    # observed, and the nurl waits for the entry to expire without
+    # using up its retries (see Frontier.retry_nurl)
+    with (frontier.dpolmut if batcher is None else nullcontext()):
+        if pmut: pmut.lock()
+        try:
+            start = time.perf_counter()
+            if batcher is not None:
+                resp = batcher.download(url)
+            else:
+                resp = download(url, config=config, logger=logger, use_cache=use_cache,
+                    content_limit=content_limit, headers=nurl.validators())
+            # adapt the domain's delay before it is waited on
+            if pmut and pmut.pacer and resp and resp.retry_after is None:
+                pmut.pacer.observe(time.perf_counter() - start, resp.status)
+        finally:
+            if pmut: pmut.unlock()
 
-    MAX_RETRIES = len(RETRY_DELAY) if use_cache else 0
-    retries = 0
-    resp = None
+    if not resp or resp.retry_after is not None:
+        frontier.cancel_probe(url)
+        return (PIPE_AGAIN, resp)
 
-    while True:
-        # Download URL
-        with frontier.dpolmut:
-            if pmut: pmut.lock()
-            resp = download(url, config=config, logger=logger, use_cache=use_cache)
-            if pmut: pmut.unlock()
+    frontier.record_download(url, resp.status)
+
+    # If retries are left and response is a server error, retry later
+    # Direct downloads only retry DNS / connection failures
+    if (nurl.retries < MAX_RETRIES
+        and (resp.status in range(500, 512) if use_cache
+             else resp.status == STATUS_CONNECTION_FAILED)):
+        nurl.retries += 1
+        return (PIPE_AGAIN, resp)
+
+    # Connection failures that exhausted the retries are given up on
+    # for now (not finished), with their retries reset for restarts
+    if resp.status == STATUS_CONNECTION_FAILED:
+        nurl.retries = 0
+        return (PIPE_BAD, resp)
 
-        # If retries exceeded or response is not a server error, stop trying
-        if (retries >= MAX_RETRIES
-            or resp.status not in range(500, 512)):
-            return (PIPE_OK if resp else PIPE_AGAIN, resp)
+    return (PIPE_OK, resp)
 
-        # Wait and increment retries
-        time.sleep(RETRY_DELAY[retries])
-        retries += 1
+
+def worker_revalidate(w, nurl, resp):
+    """Revalidates the response of a previously downloaded nurl
+    (requeued by a recrawl, see Frontier._nap_init).
+    This should be called after receiving a response, before it is filtered.
+
+    The response is not modified if:
+        -   it is a 304 (conditional GET with the nurl's validators)
+        -   its body has the same exhash as before (the cache server
+            does not forward conditional headers)
+    Then the nurl keeps its previous state, and the response skips
+    parsing, tokenizing and dedup entirely.
+
+    Otherwise, the validators of the response are stored in the nurl.
+    The links of a modified nurl are reset (they are scraped again).
+
+    :param w Worker: The worker thread
+    :param nurl Nurl: The nurl from which the response is derived
+    :param resp Response: The Response object
+    :return: Whether response was modified (and should continue)
+    :rtype: bool
+
+    """
+    raw_resp = resp.raw_response
+    if raw_resp == None:
+        return True
+
+    if resp.status == 304:
+        return False
+
+    # previously downloaded nurls have an exhash
+    if nurl.exhash is not None and resp.status == 200 and not resp.aborted:
+        if not resp.exhash:
+            resp.exhash = exhash(raw_resp.content, len(raw_resp.content))
+        if resp.exhash == nurl.exhash:
+            return False
+        nurl.links = []
+
+    nurl.etag = raw_resp.headers.get("ETag", None)
+    nurl.lastmod = raw_resp.headers.get("Last-Modified", None)
+    return True
 
 
 def worker_filter_resp_pre(w, nurl, resp):
@@ -157,6 +312,13 @@ def worker_filter_resp_pre(w, nurl, resp):
 
     raw_resp = resp.raw_response
 
+    # Filter response by streamed downloads that were aborted
+    # (content type is not processed or content is too large)
+    # Mark as low-info response
+    if resp.aborted:
+        nurl.finish = NURL_FINISH_LOWINFO_PRE
+        return False
+
     # Filter response by redirects
     # If it's a redirect, add the new redirected nurl
     # The redirected nurl shall inherit the nurl's attributes
@@ -190,42 +352,38 @@ def worker_filter_resp_pre(w, nurl, resp):
 
     # Content is either too small or too large
     # Mark as low-info response
-    if raw_content_len < MIN_CONTENT_LEN or raw_content_len > MAX_CONTENT_LEN:
+    # Sitemaps are streamed, so they may be larger than other pages
+    # (only their root tag is read here: the page is not parsed)
+    max_content_len = MAX_CONTENT_LEN
+    if raw_content_len > MAX_CONTENT_LEN and is_sitemap_response(resp):
+        max_content_len = MAX_SITEMAP_CONTENT_LEN
+    if raw_content_len < MIN_CONTENT_LEN or raw_content_len > max_content_len:
         nurl.finish = NURL_FINISH_LOWINFO_PRE
         return False
 
     # Check against exact hashes
-    raw_hash = exhash(raw_content, raw_content_len)
+    # Streamed downloads hashed the content while reading it
+    raw_hash = resp.exhash or exhash(raw_content, raw_content_len)
     nurl.exhash = raw_hash
 
-    with nap.mutex:
-        exact_bucket = nap.exdict.get(raw_hash, None)
-        if exact_bucket:
-            # An intermediate state of a bucket might exist
-            # where the master nurl was not marked as complete, but its bucket exists
-            # Therefore, check against the master nurl before continuing.
-            if exact_bucket[0] == nurl.hash:
-                return True
-
-            # append to existing bucket
-            # mark as too exact response
-            exact_bucket[1].append(nurl.hash)
-            nurl.finish = NURL_FINISH_TOO_EXACT
-            return False
-        else:
-            # make new bucket
-            nap.exdict[raw_hash] = [nurl.hash, []]
+    # Claim the exact bucket (locks only the bucket's stripe)
+    # If the nurl is not the master of the bucket, mark as too exact response
+    if not nap.exdict.claim(raw_hash, nurl.hash):
+        nurl.finish = NURL_FINISH_TOO_EXACT
+        return False
 
     return True
 
 
-def worker_filter_resp_post_text(w, nurl, words):
+def worker_filter_resp_post_text(w, nurl, words, accumulator):
     """Filters the response after its text content has been parsed.
     This should be called after the worker processes the text content of response.
 
     :param w Worker: The worker thread
     :param nurl Nurl: The nurl itself
     :param words dict[str,int]: Word counts
+    :param accumulator: Fingerprint accumulator fed with the tokens of the response
+        (see SimilarityEngine.accumulator)
     :return: Whether response should continue
     :rtype: bool
 
@@ -233,6 +391,7 @@ def worker_filter_resp_post_text(w, nurl, words):
     frontier = w.frontier
     logger = w.logger
     nap = frontier.nap
+    engine = frontier.simengine
 
     # Assign words to nurl
     # (already tokenized and counted words)
@@ -254,28 +413,50 @@ def worker_filter_resp_post_text(w, nurl, words):
         return False
 
     # Check against similar hashes
-    raw_hash = simhash(words)
+    # The fingerprint depends on the frontier's similarity engine
+    # and was accumulated while the text was tokenized
+    raw_hash = accumulator.fingerprint(words)
     nurl.smhash = raw_hash
 
-    with nap.mutex:
-        for key, similar_bucket in nap.smdict.items():
-            if compare_fingerprints(raw_hash, key):
-                # An intermediate state of a bucket might exist
-                # where the master nurl was not marked as complete, but its bucket exists
-                # Therefore, check against the master nurl before continuing.
-                if similar_bucket[0] == nurl.hash:
-                    break
+    # Find a similar fingerprint or index this one as a new bucket
+    # The engine is guarded by frontier.simmutex (not nap.mutex)
+    with frontier.simmutex:
+        key = engine.find(raw_hash)
+        if key is None:
+            key = raw_hash
+            engine.index(raw_hash)
+
+    # Claim the similar bucket (locks only the bucket's stripe)
+    # If the nurl is not the master of the bucket, mark as too similar response
+    if not nap.smdict.claim(key, nurl.hash):
+        nurl.finish = NURL_FINISH_TOO_SIMILAR
+        return False
 
-                # append to existing bucket
-                # mark as too similar response
-                similar_bucket[1].append(nurl.hash)
-                nurl.finish = NURL_FINISH_TOO_SIMILAR
-                return False
+    return True
 
-        # Make new bucket since no similar pages were found
-        nap.smdict[raw_hash] = [nurl.hash, []]
 
-    return True
+def worker_add_sitemap_urls(w, nurl, resp, strict=True):
+    """Streams the URLs of a sitemap response to the frontier in batches.
+    Each batch is transformed into nurls and added at once, so
+    the entries of large sitemaps are never materialized.
+
+    :param w Worker: The worker thread
+    :param nurl Nurl: The nurl of the sitemap
+    :param resp Response: The Response object
+    :param strict bool: Whether URLs are checked in strict mode (see scraper2.is_valid)
+    :return: The amount of nurls added
+    :rtype: int
+
+    """
+    frontier = w.frontier
+    added = 0
+
+    for batch in scraper.sitemap_batches(resp, strict):
+        chlds = worker_transform_urls(w, nurl, batch)
+        frontier.add_nurls(chlds)
+        added += len(chlds)
+
+    return added
 
 
 def worker_transform_urls(w, nurl, scraped_urls):
@@ -283,18 +464,23 @@ def worker_transform_urls(w, nurl, scraped_urls):
     This sets the parent of each child Nurl.
     This should be called after extracting the URLs from the nurl.
 
+    Hashes of the URLs are reused if scraped_urls maps them to their hashes
+    (see scraper2.scraper).
+
     :param w Worker: The worker thread
     :param nurl Nurl: The nurl itself
-    :param scraped_urls list[str]: A list of extracted URL strings
+    :param scraped_urls list[str] | dict[str, str]: The extracted URL strings
+        (or the extracted URL strings mapped to their hashes)
     :return: A list of nurls after it was transformed
     :rtype: list[Nurl]
 
     """
     transformed_nurls = []
+    urlhashes = scraped_urls if isinstance(scraped_urls, dict) else dict()
 
     # Transform each URL to a nurl
     for url in scraped_urls:
-        chld = Nurl(url)
+        chld = Nurl(url, urlhashes.get(url, None))
         chld.set_parent(nurl)
 
         # Append nurl hash to parent nurl links
@@ -4,6 +4,11 @@
 # the only changes implemented are logger name change and imports
 
 from utils import get_logger
+from utils.canonical import configure as configure_canonical
+from utils.urlfilter import configure as configure_urlfilter
+from helpers.parser import set_html_backend
+from crawler2.download import close_archives
+from crawler2.download import configure as configure_archives
 from crawler2.frontier import Frontier
 from crawlerman.worker import Worker
 
@@ -12,6 +17,13 @@ class Crawler(object):
     def __init__(self, config, restart, use_cache, frontier_factory=Frontier, worker_factory=Worker):
         self.config = config
         self.logger = get_logger("crawlerman")
+
+        # URL canonicalization rules must be set before any URL is hashed
+        configure_canonical(self.config.canonical)
+        configure_urlfilter(self.config.domains)
+        set_html_backend(self.config.html_backend)
+        configure_archives(self.config.archive)
+
         self.frontier = frontier_factory(config, restart, use_cache)
         self.workers = list()
         self.worker_factory = worker_factory
@@ -22,6 +34,7 @@ class Crawler(object):
         worker = self.worker_factory(1, self.config, self.frontier)
         worker.start()
         worker.join()
+        close_archives()
 
         # all worker threads have finished
         # close the nap file before killing the main thread
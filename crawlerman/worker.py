@@ -75,6 +75,30 @@ class Worker(Thread):
                 _flush_nurl(nurl, self.file)
                 continue
 
+            # Pipe: check URL template against the trap detector
+            ok = worker_check_trap(self, nurl)
+            if ok == PIPE_AGAIN:
+                # Demoted: put the nurl back at the end of the queue
+                self.frontier.mark_nurl_complete(nurl, status=NURL_STATUS_NO_DOWN)
+                self.frontier.add_nurl(nurl)
+                self.frontier.nurls.task_done()
+                self.logger.info(
+                    f"Tried to fetch {nurl.url}, "
+                    f"but was demoted by the trap detector"
+                )
+                _flush_nurl(nurl, self.file)
+                continue
+            if ok == PIPE_BAD:
+                self.frontier.mark_nurl_complete(nurl)
+                self.frontier.nurls.task_done()
+                self.logger.info(
+                    f"Tried to fetch {nurl.url}, "
+                    f"but was dropped by the trap detector "
+                    f"(finish={nurl.finish})"
+                )
+                _flush_nurl(nurl, self.file)
+                continue
+
             # Pipe: get domain info
             ok, pmut = worker_get_domain_info(self, nurl)
             if ok == PIPE_BAD:
@@ -88,28 +112,60 @@ class Worker(Thread):
                 _flush_nurl(nurl, self.file)
                 continue
 
+            # Pipe: check the domain's circuit breaker
+            if worker_check_host(self, nurl) == PIPE_AGAIN:
+                # Parked: the nurl's task is done once it is requeued
+                self.logger.info(
+                    f"Tried to download {nurl.url}, "
+                    f"but its domain is failing, and was parked... "
+                )
+                _flush_nurl(nurl, self.file)
+                continue
+
             # Pipe: get response
             ok, resp = worker_get_resp(self, nurl, pmut, use_cache=self.frontier.use_cache)
             if ok == PIPE_AGAIN:
-                self.frontier.add_nurl(nurl)
-                self.frontier.nurls.task_done()
+                if resp: scraper.release(resp)
+                # The nurl's task is done once it is requeued
+                self.frontier.retry_nurl(nurl, resp.retry_after if resp else None)
                 self.logger.info(
                     f"Tried to download {nurl.url}, "
-                    f"but response was None, and should try again later... "
+                    f"but response was a server error or None, and should try again later... "
+                    f"(retries={nurl.retries})"
                 )
                 _flush_nurl(nurl, self.file)
                 continue
             if ok != PIPE_OK:
+                if resp: scraper.release(resp)
+                # Left un-downloaded (e.g. its connection kept failing)
+                self.frontier.mark_nurl_complete(nurl, status=NURL_STATUS_NO_DOWN)
                 self.frontier.nurls.task_done()
                 self.logger.info(
                     f"Tried to download {nurl.url}, "
                     f"but was skipped... "
+                    f"(status={resp.status if resp else None})"
+                )
+                _flush_nurl(nurl, self.file)
+                continue
+
+            # Pipe: revalidate response (recrawls)
+            # Not modified responses keep the nurl's previous state
+            if not worker_revalidate(self, nurl, resp):
+                scraper.release(resp)
+                self.frontier.nurls.task_done()
+                # its finish state was recorded by the trap detector before
+                self.frontier.mark_nurl_complete(nurl, record=False)
+                self.logger.info(
+                    f"Downloaded {nurl.url}, "
+                    f"but response was not modified "
+                    f"(status={resp.status},finish={nurl.finish})"
                 )
                 _flush_nurl(nurl, self.file)
                 continue
 
             # Pipe: filter response
             if not worker_filter_resp_pre(self, nurl, resp):
+                scraper.release(resp)
                 self.frontier.nurls.task_done()
                 self.frontier.mark_nurl_complete(nurl)
                 self.logger.info(
@@ -122,9 +178,12 @@ class Worker(Thread):
 
             # Pipe: process text content if and only if
             # response is not a sitemap (does not use the sitemaps protocol)
-            if not scraper.is_sitemap(resp):
-                tokens, words = scraper.process_text(resp)
-                if not worker_filter_resp_post_text(self, nurl, words):
+            sitemap = scraper.is_sitemap(resp)
+            if not sitemap:
+                accumulator = self.frontier.simengine.accumulator()
+                words = scraper.process_text(resp, accumulator)
+                if not worker_filter_resp_post_text(self, nurl, words, accumulator):
+                    scraper.release(resp)
                     self.frontier.nurls.task_done()
                     self.frontier.mark_nurl_complete(nurl)
                     self.logger.info(
@@ -136,19 +195,24 @@ class Worker(Thread):
                     continue
 
             # Pipe: scrape valid URLs and transform to nurls
-            scraped_urls = scraper.scraper(resp, strict=False)
-            transformed_nurls = worker_transform_urls(self, nurl, scraped_urls)
+            # Then add nurls to frontier
+            # Sitemaps are streamed to the frontier in batches
+            if sitemap:
+                scraped = worker_add_sitemap_urls(self, nurl, resp, strict=False)
+            else:
+                scraped_urls = scraper.scraper(resp, strict=False)
+                transformed_nurls = worker_transform_urls(self, nurl, scraped_urls)
+                self.frontier.add_nurls(transformed_nurls)
+                scraped = len(transformed_nurls)
+            scraper.release(resp)
 
-            # Add nurls to frontier
-            # Then mark nurl as complete
-            for chld in transformed_nurls:
-                self.frontier.add_nurl(chld)
+            # Mark nurl as complete
             self.frontier.nurls.task_done()
             self.frontier.mark_nurl_complete(nurl)
             self.logger.info(
                 f"Successfully downloaded {nurl.url} "
                 f"(filter='ok',finish={nurl.finish}"
-                f",scraped={len(transformed_nurls)},sitemap={scraper.is_sitemap(resp)})"
+                f",scraped={scraped},sitemap={sitemap})"
             )
             _flush_nurl(nurl, self.file)
 
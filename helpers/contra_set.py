@@ -2,25 +2,64 @@
 #
 # word set for rsrc/contractions.txt
 # check if a particular word is a contraction or not
+#
+# rsrc/contractions.txt is parsed on the first check
+# generic contractions (suffixes) are compiled into a trie of reversed
+# suffixes, so each check is O(len(word)) regardless of the amount of suffixes
+
+from threading import Lock
+
+CONTRA_FILE = "rsrc/contractions.txt"
 
 CONTRA_SET = set()
 GENERIC_CONTRA_SET = set()
 
-# open rsrc/contractions.txt
-# load words/patterns into CONTRA_SET or GENERIC_CONTRA_SET
-with open("rsrc/contractions.txt", "r") as infile:
-    for word in infile:
-        word = word.strip()
+# trie of reversed generic suffixes
+# each node is a dict of graphemes to child nodes
+# nodes that end a suffix contain _SUFFIX_END
+_SUFFIX_TRIE = dict()
+_SUFFIX_END = ""
+
+_loaded = False
+_load_mutex = Lock()
+
+
+def _load():
+    """Loads words/patterns from rsrc/contractions.txt into CONTRA_SET
+    or GENERIC_CONTRA_SET and compiles the generic suffixes.
+    Only loads once.
+    """
+    global _loaded
+    with _load_mutex:
+        if not _loaded:
+            _load_locked()
+            _loaded = True
+
 
-        # normal contraction
-        # add to CONTRA_SET
-        if not word[0] == "-":
-            CONTRA_SET.add(word)
+def _load_locked():
+    """Unsafe version of _load() (must hold _load_mutex)."""
+    with open(CONTRA_FILE, "r") as infile:
+        for word in infile:
+            word = word.strip()
+            if not word:
+                continue
+
+            # normal contraction
+            # add to CONTRA_SET
+            if not word[0] == "-":
+                CONTRA_SET.add(word)
+
+            # generic contraction
+            # add suffix (exclude "-") to GENERIC_CONTRA_SET
+            else:
+                GENERIC_CONTRA_SET.add(word[1:])
+
+    for suffix in GENERIC_CONTRA_SET:
+        node = _SUFFIX_TRIE
+        for grapheme in reversed(suffix):
+            node = node.setdefault(grapheme, dict())
+        node[_SUFFIX_END] = True
 
-        # generic contraction
-        # add suffix (exclude "-") to GENERIC_CONTRA_SET
-        if word.startswith("-"):
-            GENERIC_CONTRA_SET.add(word[1:])
 
 def is_contraction(word):
     """Returns True if `word` is a contraction according to
@@ -30,9 +69,20 @@ def is_contraction(word):
     :return: Whether it's a contraction
     :rtype: bool
     """
+    if not _loaded:
+        _load()
     if word in CONTRA_SET:
         return True
-    for suffix in GENERIC_CONTRA_SET:
-        if word.endswith(suffix):
+
+    # walk the trie from the end of the word
+    # the word is a contraction if any generic suffix ends on the walk
+    node = _SUFFIX_TRIE
+    if _SUFFIX_END in node:
+        return True
+    for grapheme in reversed(word):
+        node = node.get(grapheme, None)
+        if node is None:
+            return False
+        if _SUFFIX_END in node:
             return True
     return False
@@ -0,0 +1,152 @@
+# helpers/encoding.py
+#
+# decodes HTML content to text before it is parsed
+# used by the HTML backends of helpers/parser.py
+#
+# encoding detection (UnicodeDammit) is slow, so it is a last resort:
+#   -   byte order mark
+#   -   charset declared by the Content-Type header
+#   -   charset declared by the document (<meta> or <?xml?>)
+#   -   UTF-8
+#   -   encoding previously detected for the host (HOST_ENCODINGS)
+#   -   UnicodeDammit (the detected encoding is cached for the host)
+# a declared or cached encoding is only trusted if the content decodes with it
+
+from bs4 import UnicodeDammit
+from helpers.lru import LRUCache
+from threading import Lock
+import codecs
+import re
+
+
+# declared charset in the first bytes of a document (<meta> or <?xml?>)
+DECLARED_CHARSET_RE = re.compile(rb"""(?:charset|encoding)\s*=\s*["']?\s*([a-zA-Z0-9_.:-]+)""", re.IGNORECASE)
+DECLARED_CHARSET_WINDOW = 1024
+
+_HEADER_CHARSET_RE = re.compile(r"""charset\s*=\s*["']?\s*([a-zA-Z0-9_.:-]+)""", re.IGNORECASE)
+
+_BOMS = (
+    (codecs.BOM_UTF8, "utf-8-sig"),
+    (codecs.BOM_UTF32_LE, "utf-32"),
+    (codecs.BOM_UTF32_BE, "utf-32"),
+    (codecs.BOM_UTF16_LE, "utf-16"),
+    (codecs.BOM_UTF16_BE, "utf-16"),
+)
+
+# decoding stages (see DecodeStats)
+DECODE_BOM = "bom"
+DECODE_HEADER = "header"
+DECODE_META = "meta"
+DECODE_UTF8 = "utf-8"
+DECODE_HOST = "host"
+DECODE_DETECT = "detect"
+DECODE_FAILED = "failed"
+
+
+# encodings detected by UnicodeDammit by host
+HOST_ENCODINGS = LRUCache(4096, 4096, lambda _: 1)
+
+
+class DecodeStats:
+    """Thread-safe counts of the stage that decoded each document."""
+    def __init__(self):
+        self.counts = dict()
+        self.mutex = Lock()
+
+    def record(self, stage):
+        with self.mutex:
+            self.counts[stage] = self.counts.get(stage, 0) + 1
+
+    def stats(self):
+        """Returns the counts by stage.
+
+        :rtype: dict[str, int]
+        """
+        with self.mutex:
+            return dict(self.counts)
+
+
+DECODE_STATS = DecodeStats()
+
+
+def header_charset(content_type):
+    """Returns the charset declared by the Content-Type header (or None).
+
+    :param content_type str: The Content-Type header
+    :rtype: str | None
+    """
+    match = _HEADER_CHARSET_RE.search(content_type or "")
+    return match.group(1) if match else None
+
+
+def declared_charset(content):
+    """Returns the charset declared in the first bytes of the document (or None).
+
+    :param content bytes: The HTML content
+    :rtype: str | None
+    """
+    match = DECLARED_CHARSET_RE.search(content, 0, DECLARED_CHARSET_WINDOW)
+    return match.group(1).decode("ascii") if match else None
+
+
+def _try_decode(content, encoding, declared=False):
+    """Returns the content decoded with the encoding (or None if it fails).
+    UTF-8 decodes with "utf-8-sig" so that a stray BOM is dropped.
+    Declared UTF-16/UTF-32 without a BOM is not trusted (ASCII content
+    would decode "successfully" as garbage).
+    """
+    try:
+        name = codecs.lookup(encoding).name
+        if name == "utf-8":
+            encoding = "utf-8-sig"
+        elif declared and name.startswith(("utf-16", "utf-32")):
+            return None
+        return content.decode(encoding)
+    except (LookupError, UnicodeDecodeError):
+        return None
+
+
+def decode_html(content, content_type="", host=None, stats=DECODE_STATS):
+    """Decodes HTML content to text (see the stages at the top of the file).
+
+    :param content bytes: The HTML content
+    :param content_type str: The Content-Type header of the response
+    :param host str: The host of the response (or None to not use HOST_ENCODINGS)
+    :param stats DecodeStats: Counts of the stage that decoded the content
+    :return: The decoded content (or the content itself if detection fails)
+    :rtype: str | bytes
+    """
+    for bom, encoding in _BOMS:
+        if content.startswith(bom):
+            text = _try_decode(content, encoding)
+            if text is not None:
+                stats.record(DECODE_BOM)
+                return text
+            break
+
+    for stage, encoding in ((DECODE_HEADER, header_charset(content_type)),
+                            (DECODE_META, declared_charset(content)),
+                            (DECODE_UTF8, "utf-8")):
+        if encoding:
+            text = _try_decode(content, encoding, declared=True)
+            if text is not None:
+                stats.record(stage)
+                return text
+
+    if host:
+        encoding = HOST_ENCODINGS.get(host)
+        if encoding:
+            text = _try_decode(content, encoding)
+            if text is not None:
+                stats.record(DECODE_HOST)
+                return text
+
+    dammit = UnicodeDammit(content, is_html=True)
+    if dammit.unicode_markup is None:
+        stats.record(DECODE_FAILED)
+        return content
+
+    if host and dammit.original_encoding:
+        HOST_ENCODINGS[host] = dammit.original_encoding
+    stats.record(DECODE_DETECT)
+    return dammit.unicode_markup
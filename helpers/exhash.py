@@ -7,6 +7,7 @@
 # { i32, i32 } => 64 bits
 
 from helpers.crc32 import crc32
+import zlib
 
 def exhash(content, size):
     """Computes the exhash of a page given its content in bytes
@@ -23,3 +24,37 @@ def exhash(content, size):
     exhash.extend(size.to_bytes(4, "little"))
     return exhash.hex()
 
+
+
+class Exhasher:
+    """Computes the exhash of content read in chunks.
+    The result is the same as exhash(content, len(content)).
+
+    Chunks are checked with zlib.crc32, which is the same checksum
+    as helpers/crc32.py (CRC32/ISO-HDLC).
+
+    crc         Running crc32 of the chunks
+    size        Amount of bytes read
+
+    """
+    def __init__(self):
+        self.crc = 0
+        self.size = 0
+
+    def update(self, chunk):
+        """Adds the next chunk of content.
+
+        :param chunk bytes: The chunk
+        """
+        self.crc = zlib.crc32(chunk, self.crc)
+        self.size += len(chunk)
+
+    def hexdigest(self):
+        """Returns the exhash of the content read so far.
+
+        :rtype: str
+        """
+        exhash = bytearray()
+        exhash.extend(self.crc.to_bytes(4, "little"))
+        exhash.extend(self.size.to_bytes(4, "little"))
+        return exhash.hex()
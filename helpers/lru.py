@@ -0,0 +1,107 @@
+# helpers/lru.py
+#
+# thread-safe LRU cache bounded by entry count and approximate size
+# used by helpers/parser.py for PAGE_CACHE
+
+from collections import OrderedDict
+from threading import Lock
+
+
+class LRUCache:
+    """Thread-safe least-recently-used cache.
+
+    Entries are evicted (least recently used first) when there are
+    more than `max_entries` entries or when the approximate size of
+    all entries exceeds `max_bytes`.
+
+    max_entries     Maximum amount of entries
+    max_bytes       Maximum approximate size of all entries
+    sizeof          Function that approximates the size of a value
+    size            Approximate size of all entries
+
+    hits            Amount of lookups that found an entry
+    misses          Amount of lookups that did not find an entry
+    evictions       Amount of entries evicted to fit the bounds
+
+    """
+    def __init__(self, max_entries, max_bytes, sizeof):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.sizeof = sizeof
+        self.size = 0
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+        self._entries = OrderedDict() # key => (value, size)
+        self._mutex = Lock()
+
+
+    def get(self, key, default=None):
+        """Returns the value of key and marks it as recently used.
+        Returns default if key is not cached.
+        """
+        with self._mutex:
+            entry = self._entries.get(key, None)
+            if entry is None:
+                self.misses += 1
+                return default
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+
+    def __setitem__(self, key, value):
+        """Caches the value, then evicts entries until the cache fits its bounds.
+        A value larger than max_bytes is not cached.
+        """
+        size = self.sizeof(value)
+        with self._mutex:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self.size -= old[1]
+
+            if size > self.max_bytes:
+                return
+
+            self._entries[key] = (value, size)
+            self.size += size
+
+            while (len(self._entries) > self.max_entries
+                or self.size > self.max_bytes):
+                _, (_, evicted_size) = self._entries.popitem(last=False)
+                self.size -= evicted_size
+                self.evictions += 1
+
+
+    def pop(self, key, default=None):
+        """Removes key and returns its value (or default if key is not cached)."""
+        with self._mutex:
+            entry = self._entries.pop(key, None)
+            if entry is None:
+                return default
+            self.size -= entry[1]
+            return entry[0]
+
+
+    def __contains__(self, key):
+        return key in self._entries
+
+    def __len__(self):
+        return len(self._entries)
+
+
+    def stats(self):
+        """Returns the counters and the current size of the cache.
+
+        :rtype: dict[str, int]
+        """
+        with self._mutex:
+            return {
+                "entries": len(self._entries),
+                "bytes": self.size,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+            }
@@ -0,0 +1,144 @@
+# helpers/minhash.py
+#
+# minhash over word shingles with LSH banding
+#
+# a shingle is a run of SHINGLE_SIZE consecutive tokens
+# two pages are similar if the estimated jaccard similarity
+# of their shingle sets is at least THRESHOLD
+#
+# unlike simhash, shingles keep (local) word order, and short pages
+# do not collapse onto the same few bits
+#
+# lookups use LSH banding: the signature is split into BANDS bands
+# of ROWS rows; pages that share at least one band are candidates,
+# and candidates are verified against THRESHOLD
+#
+# the hash family h(x) = (a*x + b) mod p is evaluated for all
+# permutations and shingles at once with numpy
+
+from helpers.simengine import SimilarityEngine
+import numpy as np
+import zlib
+
+
+SHINGLE_SIZE = 3
+NUM_PERM = 64
+BANDS = 16
+ROWS = NUM_PERM // BANDS
+THRESHOLD = 0.6
+
+KEY_PREFIX = "mh:"
+
+# mersenne prime 2^61 - 1
+# a, b < 2^31 and shingle ids < 2^32 guarantee a*x + b < 2^64 (no overflow)
+_PRIME = np.uint64((1 << 61) - 1)
+_MAX_HASH = np.uint64(0xFFFFFFFF)
+
+# permutations are seeded so that signatures are stable across runs
+# (signatures are persisted in nap files)
+_rng = np.random.RandomState(0x5EED)
+_PERM_A = _rng.randint(1, 1 << 31, size=NUM_PERM, dtype=np.uint64)
+_PERM_B = _rng.randint(0, 1 << 31, size=NUM_PERM, dtype=np.uint64)
+del _rng
+
+
+def shingle_ids(tokens, k=SHINGLE_SIZE):
+    """Returns the unique shingle ids (crc32) of the tokens.
+    Pages with fewer than k tokens are treated as a single shingle.
+
+    :param tokens list[str]: Tokens in document order
+    :param k int: Shingle size
+    :return: Shingle ids
+    :rtype: numpy.ndarray[uint64]
+    """
+    if len(tokens) < k:
+        shingles = {" ".join(tokens)}
+    else:
+        shingles = {
+            " ".join(tokens[i:i+k])
+            for i in range(len(tokens) - k + 1)
+        }
+    return np.fromiter(
+        (zlib.crc32(s.encode("utf-8")) for s in shingles),
+        dtype=np.uint64,
+        count=len(shingles)
+    )
+
+
+def signature(tokens):
+    """Computes the minhash signature of the tokens.
+
+    :param tokens list[str]: Tokens in document order
+    :return: The signature (NUM_PERM minimums)
+    :rtype: numpy.ndarray[uint32]
+    """
+    ids = shingle_ids(tokens)
+
+    # (NUM_PERM, shingles) matrix of permuted ids
+    # the minimum of each row is the signature value of that permutation
+    hv = (_PERM_A[:, None] * ids[None, :] + _PERM_B[:, None]) % _PRIME
+    return (hv & _MAX_HASH).min(axis=1).astype(np.uint32)
+
+
+def to_key(sig):
+    """Encodes a signature as a fingerprint string."""
+    return KEY_PREFIX + sig.astype("<u4").tobytes().hex()
+
+
+def from_key(key):
+    """Decodes a fingerprint string into a signature."""
+    return np.frombuffer(bytes.fromhex(key[len(KEY_PREFIX):]), dtype="<u4")
+
+
+def jaccard(sig1, sig2):
+    """Estimates the jaccard similarity of two signatures.
+
+    :return: The fraction of equal signature values
+    :rtype: float
+    """
+    return float(np.count_nonzero(sig1 == sig2)) / len(sig1)
+
+
+class MinhashEngine(SimilarityEngine):
+    """Minhash engine with its own LSH band tables.
+
+    _bands      One dict per band mapping band bytes to fingerprints
+    _sigs       Mapping of fingerprints to decoded signatures
+
+    """
+    name = "minhash"
+
+    def __init__(self):
+        self._bands = [dict() for _ in range(BANDS)]
+        self._sigs = dict()
+
+    def fingerprint(self, tokens, words):
+        return to_key(signature(tokens))
+
+    def owns(self, key):
+        return key.startswith(KEY_PREFIX)
+
+    def _band_keys(self, sig):
+        raw = sig.astype("<u4").tobytes()
+        step = ROWS * 4
+        return [raw[i*step:(i+1)*step] for i in range(BANDS)]
+
+    def index(self, key):
+        if key in self._sigs:
+            return
+        sig = from_key(key)
+        self._sigs[key] = sig
+        for band, band_key in zip(self._bands, self._band_keys(sig)):
+            band.setdefault(band_key, []).append(key)
+
+    def find(self, key):
+        sig = from_key(key)
+        seen = set()
+        for band, band_key in zip(self._bands, self._band_keys(sig)):
+            for other in band.get(band_key, ()):
+                if other in seen:
+                    continue
+                seen.add(other)
+                if jaccard(sig, self._sigs[other]) >= THRESHOLD:
+                    return other
+        return None
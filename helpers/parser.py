@@ -4,20 +4,52 @@
 #
 # the parsed data is cached in PAGE_CACHE, which is
 # useful for avoiding redundant work when parsing response
+# PAGE_CACHE is a bounded LRU (see helpers/lru.py); workers release
+# entries with release_response once they are done with a URL
+#
+# html is parsed by one of the backends in HTML_BACKENDS:
+#   -   "lxml" walks the lxml tree once for both links and text (default)
+#   -   "bs4" builds a BeautifulSoup tree (the original backend)
+# both backends return identical links and text content
+# (see test/test_parser_backends.py)
+# lxml drops a <!DOCTYPE> past the start of a (malformed) document, while
+# bs4 splits the text around it, so such documents are parsed with bs4
+#
+# sitemaps are only detected here; their entries are streamed
+# by helpers/sitemap.py (see scraper2.sitemap_batches)
 
+from helpers.lru import LRUCache
+from helpers.sitemap import is_gzip, sitemap_kind
 from utils import get_logger, get_urlhash, normalize
-from urllib.parse import urljoin, urlparse, urldefrag
+from utils.resolver import UrlResolver
+from urllib.parse import urlparse
+from helpers.encoding import decode_html
 from bs4 import BeautifulSoup
+from lxml import etree
+import re
+
 
+# bounds of PAGE_CACHE
+PAGE_CACHE_MAX_ENTRIES = 256
+PAGE_CACHE_MAX_BYTES = 64 * 1024 * 1024
 
-PAGE_CACHE = dict()
 PARSER_LOGGER = get_logger("parser")
 
+# the backend used by parse_response (see set_html_backend)
+HTML_BACKEND = "lxml"
+
+# text in these tags is not visible (matches BeautifulSoup.stripped_strings)
+INVISIBLE_TAGS = frozenset(("script", "style", "template"))
+
+_DOCTYPE_RE = re.compile(r"<!doctype", re.IGNORECASE)
+
+
 
 class ParsedResponse:
     """Encapsulates the data from parsing the raw response data.
 
     links           unique hyperlinks scraped from page
+                    (canonical URL => URL hash, see utils/resolver.py)
     text_content    text scraped from page
     sitemap         whether response is a sitemap / sitemap index
 
@@ -27,6 +59,14 @@ class ParsedResponse:
         self.text_content = text_content
         self.sitemap = sitemap
 
+    def sizeof(self):
+        """Returns the approximate size of the parsed response in bytes.
+        Each string is counted by its length plus a fixed overhead.
+        """
+        return (sum(len(link) + 128 for link in self.links)
+                + sum(len(text) + 64 for text in self.text_content)
+                + 256)
+
     def is_empty(self):
         """Returns whether ParsedResponse was empty (did not parse any useful data).
         If parsed response is a sitemap, then it returns False.
@@ -37,38 +77,133 @@ class ParsedResponse:
                 and len(self.text_content) == 0)
 
 
-def parse_sitemap_index(tag):
-    """Parses the soup tag as a sitemap index.
-    Returns a list of URLs.
+PAGE_CACHE = LRUCache(PAGE_CACHE_MAX_ENTRIES, PAGE_CACHE_MAX_BYTES, ParsedResponse.sizeof)
+
+
+def parse_html_bs4(content, url):
+    """Parses HTML content with BeautifulSoup.
+    Bytes are decoded first (see helpers/encoding.py).
+
+    :param content str | bytes: The HTML content
+    :param url str: The URL of the content (base for relative links)
+    :return: The links (canonical URL => URL hash) and the text content
+    :rtype: (dict[str, str], list[str])
+    """
+    links = dict()
+    text_content = []
+    resolver = UrlResolver(url)
+
+    if isinstance(content, bytes):
+        content = decode_html(content)
+    html_soup = BeautifulSoup(content, 'lxml')
+
+    # Extract all hyperlinks using html_soup.find_all('a', href=True)
+    for link in html_soup.find_all('a', href=True):
+        # Add the absolute link to the links
+        resolved = resolver.resolve(link['href'])
+        if resolved:
+            links[resolved[0]] = resolved[1]
+
+    # Extract stripped text using html_soup.stripped_strings
+    # Only include non-empty text in text_content
+    for text in html_soup.stripped_strings:
+        if text:
+            text_content.append(text)
+
+    return links, text_content
+
 
-    :param tag: The <sitemapindex> tag from the XML content
-    :return: The list of sitemap URLs in the sitemap index
-    :rtype: list[str]
+def _has_mid_doctype(content):
+    """Returns whether the HTML content has a <!DOCTYPE> past its start.
 
+    :param content str: The HTML content
+    :rtype: bool
     """
-    # For all <sitemap> tags, extract URL from its <loc> tag
-    urls = []
-    for sitemap in tag.find_all('sitemap'):
-        if sitemap.loc:
-            urls.append(sitemap.loc.string)
-    return urls
+    pos = len(content) - len(content.lstrip())
+    leading = _DOCTYPE_RE.match(content, pos)
+    if leading:
+        pos = leading.end()
+    return _DOCTYPE_RE.search(content, pos) is not None
 
 
-def parse_sitemap(tag):
-    """Parses the soup tag as a sitemap urlset.
-    Returns a list of URLs.
+def parse_html_lxml(content, url):
+    """Parses HTML content with lxml.
+    Links and text are extracted in a single pass over the tree.
 
-    :param tag: The <urlset> tag from the XML content
-    :return: The list of URLs in the sitemap
-    :rtype: list[str]
+    Text is collected like BeautifulSoup.stripped_strings:
+    an element's text is read when it starts, its tail when it ends,
+    and text inside INVISIBLE_TAGS (and their descendants) is skipped.
 
+    Bytes are decoded first (see helpers/encoding.py).
+
+    lxml drops a <!DOCTYPE> past the start of the document without
+    splitting the text around it, so such documents are parsed
+    by parse_html_bs4 instead.
+
+    :param content str | bytes: The HTML content
+    :param url str: The URL of the content (base for relative links)
+    :return: The links (canonical URL => URL hash) and the text content
+    :rtype: (dict[str, str], list[str])
+    """
+    links = dict()
+    text_content = []
+    resolver = UrlResolver(url)
+
+    if isinstance(content, bytes):
+        content = decode_html(content)
+    if _has_mid_doctype(content):
+        return parse_html_bs4(content, url)
+    parser = etree.HTMLParser()
+    parser.feed(content)
+    root = parser.close()
+    if root is None:
+        return links, text_content
+
+    invisible = 0 # depth of invisible tags
+    for event, el in etree.iterwalk(root, events=("start", "end", "comment", "pi")):
+        if event == "start":
+            if el.tag == "a":
+                href = el.get("href")
+                if href is not None:
+                    resolved = resolver.resolve(href)
+                    if resolved:
+                        links[resolved[0]] = resolved[1]
+            if el.tag in INVISIBLE_TAGS:
+                invisible += 1
+            if el.text and not invisible:
+                text = el.text.strip()
+                if text:
+                    text_content.append(text)
+            continue
+
+        # end of element, or a comment / processing instruction
+        # (comments and processing instructions do not have an end event)
+        if event == "end" and el.tag in INVISIBLE_TAGS:
+            invisible -= 1
+        if el.tail and not invisible:
+            text = el.tail.strip()
+            if text:
+                text_content.append(text)
+
+    return links, text_content
+
+
+HTML_BACKENDS = {
+    "lxml": parse_html_lxml,
+    "bs4": parse_html_bs4,
+}
+
+
+def set_html_backend(name):
+    """Sets the HTML backend used by parse_response.
+
+    :param name str: The backend name ("lxml" or "bs4")
     """
-    # For all <url> tags, extract URL from its <loc> tag
-    urls = []
-    for url in tag.find_all('url'):
-        if url.loc:
-            urls.append(url.loc.string)
-    return urls
+    global HTML_BACKEND
+    name = name.strip().lower()
+    if name not in HTML_BACKENDS:
+        raise ValueError(f"unknown html backend '{name}'")
+    HTML_BACKEND = name
 
 
 def parse_response(resp):
@@ -85,80 +220,88 @@ def parse_response(resp):
 
     """
 
-    # Hash the normalized url (removes trailing '/')
+    # Hash the normalized url
     # Try to get the cached data
     # If it wasn't found, parse the response instead
     hash = get_urlhash(normalize(resp.url))
-    if hash in PAGE_CACHE:
-        return PAGE_CACHE[hash]
+    parsed = PAGE_CACHE.get(hash)
+    if parsed is None:
+        parsed = _parse_response(resp)
+        PAGE_CACHE[hash] = parsed
+    return parsed
+
+
+def release_response(resp):
+    """Releases the cached parsed data of the response (if it exists).
+    Call this once the response is no longer needed.
+
+    :param resp Response: The response of the URL
+    """
+    PAGE_CACHE.pop(get_urlhash(normalize(resp.url)))
+
+
+def _is_xml(raw_resp):
+    """Returns whether the raw response might be a sitemap: XML data
+    (by its content type), or gzip data.
+    """
+    # https://developer.mozilla.org/en-US/docs/Web/HTTP/Basics_of_HTTP/MIME_types/Common_types
+    content_type = raw_resp.headers.get('Content-Type', '')
+    return ('application/xml' in content_type
+        or 'text/xml' in content_type
+        or is_gzip(raw_resp.content))
+
+
+def is_sitemap_response(resp):
+    """Returns whether the response follows the sitemaps protocol.
+    Unlike parse_response, only the root tag is read, and nothing is cached.
+
+    :param resp Response: The response of the URL
+    :rtype: bool
+    """
+    if (resp.status != 200
+        or not hasattr(resp.raw_response, 'content')):
+        return False
+    raw_resp = resp.raw_response
+    return _is_xml(raw_resp) and sitemap_kind(raw_resp.content) is not None
+
+
+def _parse_response(resp):
+    """Parses the response (uncached).
+    See parse_response.
+    """
 
     # If response was not successful or no content exists,
     # then assume an empty parsed response
     if (resp.status != 200
         or not hasattr(resp.raw_response, 'content')):
-        PAGE_CACHE[hash] = ParsedResponse(set(), [])
-        return PAGE_CACHE[hash]
+        return ParsedResponse(dict(), [])
 
     raw_resp = resp.raw_response
-    links = set()
+    links = dict()
     text_content = []
 
     # Retrieve 'Content-Type' header from response
     content_type = raw_resp.headers.get('Content-Type', '')
 
     # Check if content is a sitemap / sitemap index
-    # Sitemaps are XML data; check if content-type indicates XML data
-    # https://developer.mozilla.org/en-US/docs/Web/HTTP/Basics_of_HTTP/MIME_types/Common_types
-    if ('application/xml' in content_type
-        or 'text/xml' in content_type):
-        xml_soup = BeautifulSoup(raw_resp.content, 'lxml-xml')
-
+    # Sitemaps are XML data (possibly gzip compressed); check if
+    # content-type indicates XML data or if the content is gzip data
+    if _is_xml(raw_resp):
         # Sitemaps protocol
         # https://www.sitemaps.org/protocol.html
-        if xml_soup.sitemapindex:
-            # Handle sitemap index
-            urls = parse_sitemap_index(xml_soup.sitemapindex)
-        elif xml_soup.urlset:
-            # Handle sitemap
-            urls = parse_sitemap(xml_soup.urlset)
-        else:
-            # Does not follow the protocol
-            PAGE_CACHE[hash] = ParsedResponse(links, text_content)
-            return PAGE_CACHE[hash]
-
-        # Add urls from parsed sitemap
-        for url in urls:
-            abs_url = urljoin(resp.url, url)
-            links.add(abs_url)
-
-        # Add to page cache
-        PAGE_CACHE[hash] = ParsedResponse(links, text_content, sitemap=True)
-        return PAGE_CACHE[hash]
-
-
-    html_soup = BeautifulSoup(raw_resp.content, 'lxml')
-
-    # Extract all hyperlinks using html_soup.find_all('a', href=True)
-    for link in html_soup.find_all('a', href=True):
-        # Add the link to the set of links
-        abs_link = urljoin(resp.url, link['href'])
+        # Only the root tag is read; entries are not kept in the cache
+        if sitemap_kind(raw_resp.content):
+            return ParsedResponse(links, text_content, sitemap=True)
 
-        # Defrag and normalize the URL first
-        abs_link = urldefrag(abs_link).url
-        abs_link = normalize(abs_link)
+        # Does not follow the protocol
+        return ParsedResponse(links, text_content)
 
-        links.add(abs_link)
 
-    # Extract stripped text using html_soup.stripped_strings
-    # Only include non-empty text in text_content
-    for text in html_soup.stripped_strings:
-        if text:
-            text_content.append(text)
+    # Decode the content (trusting declared charsets before detection)
+    # Then parse links and text content with the HTML backend
+    text = decode_html(raw_resp.content, content_type, urlparse(resp.url).hostname)
+    links, text_content = HTML_BACKENDS[HTML_BACKEND](text, resp.url)
 
     # Make ParsedResponse consisting boths
     # the list of links and the joined text content
-    PAGE_CACHE[hash] = ParsedResponse(links, text_content)
-
-    # Return parsed response
-    return PAGE_CACHE[hash]
-
+    return ParsedResponse(links, text_content)
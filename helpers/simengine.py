@@ -0,0 +1,170 @@
+# helpers/simengine.py
+#
+# pluggable near-duplicate (similarity) engines
+#
+# an engine computes a fingerprint for a page and looks up
+# previously indexed fingerprints that are similar to it
+#
+# fingerprints are strings so they can be used directly as keys
+# in the similar buckets of a Nap (nap.smdict)
+
+from abc import ABC, abstractmethod
+from helpers.simhash import SimhashAccumulator, simhash, compare_fingerprints
+
+
+class TokenAccumulator:
+    """Default accumulator of an engine (see SimilarityEngine.accumulator).
+    Keeps every token in document order and computes the fingerprint
+    with engine.fingerprint(...) at the end.
+
+    engine      The similarity engine
+    tokens      Tokens in document order
+
+    """
+    def __init__(self, engine):
+        self.engine = engine
+        self.tokens = []
+
+    def update(self, tokens):
+        """Adds tokens in document order.
+
+        :param tokens Iterable[str]: The tokens
+        """
+        self.tokens.extend(tokens)
+
+    def fingerprint(self, words):
+        """Returns the fingerprint of the tokens added so far.
+
+        :param words dict[str, int]: Word counts of the tokens
+        :rtype: str
+        """
+        return self.engine.fingerprint(self.tokens, words)
+
+
+class SimilarityEngine(ABC):
+    """Interface for similarity engines.
+    Engines must implement fingerprint, owns, index and find
+    (an engine that does not cannot be instantiated).
+
+    name        Name of the engine (used in config.ini)
+
+    Engines are not thread-safe. Callers must lock around
+    find(...) and index(...) when they are used as one transaction
+    (see crawler2/workerpipe.py).
+
+    """
+    name = None
+
+    @abstractmethod
+    def fingerprint(self, tokens, words):
+        """Computes the fingerprint of a page.
+
+        :param tokens list[str]: Tokens in document order
+        :param words dict[str, int]: Word counts of the tokens
+        :return: The fingerprint
+        :rtype: str
+        """
+        raise NotImplementedError
+
+    def accumulator(self):
+        """Returns a new accumulator that computes the fingerprint
+        of a page while it is tokenized (see scraper2.process_text).
+        The accumulator has update(tokens) and fingerprint(words).
+
+        By default, tokens are kept and fingerprint(...) is called at the end.
+        """
+        return TokenAccumulator(self)
+
+    @abstractmethod
+    def owns(self, key):
+        """Returns whether the key is a fingerprint made by this engine.
+
+        :param key str: The fingerprint
+        :rtype: bool
+        """
+        raise NotImplementedError
+
+    @abstractmethod
+    def index(self, key):
+        """Indexes the fingerprint so it can be found by find(...).
+
+        :param key str: The fingerprint
+        """
+        raise NotImplementedError
+
+    @abstractmethod
+    def find(self, key):
+        """Finds an indexed fingerprint that is similar to key.
+
+        :param key str: The fingerprint
+        :return: The similar indexed fingerprint or None
+        :rtype: str | None
+        """
+        raise NotImplementedError
+
+    def index_all(self, keys):
+        """Indexes every fingerprint in keys made by this engine.
+
+        :param keys Iterable[str]: The fingerprints
+        """
+        for key in keys:
+            if self.owns(key):
+                self.index(key)
+
+
+class SimhashEngine(SimilarityEngine):
+    """Bag-of-words simhash (see helpers/simhash.py).
+    Lookups compare against every indexed fingerprint.
+    """
+    name = "simhash"
+
+    def __init__(self):
+        self._keys = dict() # insertion-ordered set
+
+    def fingerprint(self, tokens, words):
+        return simhash(words)
+
+    def accumulator(self):
+        # tokens are not kept: they are folded into an incremental simhash
+        return _SimhashEngineAccumulator()
+
+    def owns(self, key):
+        return not key.startswith("mh:")
+
+    def index(self, key):
+        self._keys[key] = None
+
+    def find(self, key):
+        for other in self._keys:
+            if compare_fingerprints(key, other):
+                return other
+        return None
+
+
+class _SimhashEngineAccumulator(SimhashAccumulator):
+    """SimhashAccumulator with the accumulator interface of engines.
+
+    Tokens are folded into the simhash as they are streamed
+    (see helpers.word_count.count_tokens), so the fingerprint is ready
+    once the text is tokenized; the word counts are not read again.
+    """
+    def fingerprint(self, words):
+        return SimhashAccumulator.fingerprint(self)
+
+
+def get_engine(name):
+    """Returns a new similarity engine by name.
+    Engines other than simhash are imported on demand
+    so their dependencies are only required when used.
+
+    :param name str: The engine name ("simhash" or "minhash")
+    :return: The similarity engine
+    :rtype: SimilarityEngine
+    """
+    name = name.strip().lower()
+    if name == SimhashEngine.name:
+        return SimhashEngine()
+    if name == "minhash":
+        from helpers.minhash import MinhashEngine
+        return MinhashEngine()
+    raise ValueError(f"unknown similarity engine '{name}'")
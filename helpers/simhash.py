@@ -2,6 +2,9 @@ from helpers.crc64 import crc64
 
 THRESHOLD = 5
 
+# size of the hash vector
+HASH_SIZE = 32 # MAX: 64 because of crc64
+
 def simhash(wordcnts):
     """
     Compute the simhash fingerprint of a document.
@@ -9,7 +12,7 @@ def simhash(wordcnts):
     :return: The simhash fingerprint of the document.
     """
     # Size of the hash vector
-    hash_size = 32 # MAX: 64 because of crc64
+    hash_size = HASH_SIZE
     v = [0] * hash_size
 
     for word, cnt in wordcnts.items():
@@ -27,6 +30,94 @@ def simhash(wordcnts):
 
     return fingerprint
 
+# the accumulator packs the HASH_SIZE counters of the hash vector into one
+# integer with _LANE_BITS bits per counter (lane i is fingerprint bit i)
+# adding a word is one integer addition of its "spread" hash
+_LANE_BITS = 40 # counts up to 2^40 tokens per page
+_LANE_MASK = (1 << _LANE_BITS) - 1
+
+# spread of each byte (MSB of the byte in the lowest lane)
+_BYTE_SPREAD = [
+    sum(1 << (_LANE_BITS * (7 - j)) for j in range(8) if byte >> j & 1)
+    for byte in range(0x100)
+]
+
+
+def _spread(word):
+    """Returns the hash of the word spread over the lanes of the accumulator.
+    Lane i is set if bit i of the fingerprint (MSB first) is set in the hash.
+    """
+    word_hash = crc64(word.encode("utf-8")) % (2 ** HASH_SIZE)
+    spread = 0
+    for k in range(HASH_SIZE // 8):
+        byte = word_hash >> (8 * k) & 0xFF
+        spread |= _BYTE_SPREAD[byte] << (_LANE_BITS * (HASH_SIZE - 8 * (k + 1)))
+    return spread
+
+
+class SimhashAccumulator:
+    """Incremental simhash.
+    Tokens (or word counts) can be added as they are produced,
+    and the fingerprint is the same as simhash(...) of their word counts.
+
+    total       Amount of words added
+    packed      Packed counts of set bits for each fingerprint bit
+
+    """
+    def __init__(self):
+        self.total = 0
+        self.packed = 0
+        self._spreads = dict() # word => spread (hash once per unique word)
+
+
+    def update(self, tokens):
+        """Adds every token once.
+
+        :param tokens Iterable[str]: The tokens
+        """
+        spreads = self._spreads
+        packed = self.packed
+        total = 0
+        for token in tokens:
+            spread = spreads.get(token, None)
+            if spread is None:
+                spread = _spread(token)
+                spreads[token] = spread
+            packed += spread
+            total += 1
+        self.packed = packed
+        self.total += total
+
+
+    def add(self, word, cnt=1):
+        """Adds a word `cnt` times.
+
+        :param word str: The word
+        :param cnt int: The word count
+        """
+        spread = self._spreads.get(word, None)
+        if spread is None:
+            spread = _spread(word)
+            self._spreads[word] = spread
+        self.packed += spread * cnt
+        self.total += cnt
+
+
+    def fingerprint(self):
+        """Returns the simhash fingerprint of the words added so far.
+
+        :return: The fingerprint (see simhash)
+        :rtype: str
+        """
+        # bit i is set if the words with bit i set outweigh the words without
+        # (i.e. the vector entry of simhash(...) is positive)
+        bits = []
+        for i in range(HASH_SIZE):
+            ones = self.packed >> (_LANE_BITS * i) & _LANE_MASK
+            bits.append("1" if 2 * ones > self.total else "0")
+        return "".join(bits)
+
+
 def hamming_distance(hash1, hash2):
     """
     Compute the hamming distance between two hashes.
@@ -0,0 +1,156 @@
+# helpers/sitemap.py
+#
+# streaming reader for sitemaps and sitemap indexes
+# https://www.sitemaps.org/protocol.html
+#
+# sitemaps are read with lxml's iterparse: each <url> / <sitemap> entry
+# is yielded and cleared as soon as it ends, so memory stays constant
+# regardless of the amount of entries
+#
+# gzip sitemaps (e.g. sitemap.xml.gz) are detected by their magic bytes
+# and decompressed on the fly
+
+from collections import namedtuple
+from io import BytesIO
+from urllib.parse import urljoin
+from lxml import etree
+import gzip
+import zlib
+
+
+# maximum amount of entries read from one sitemap (protocol limit)
+MAX_SITEMAP_ENTRIES = 50000
+
+# root tags of sitemaps
+SITEMAP_URLSET = "urlset"
+SITEMAP_INDEX = "sitemapindex"
+
+GZIP_MAGIC = b"\x1f\x8b"
+
+_ABSOLUTE_PREFIXES = ("http://", "https://")
+
+
+class SitemapEntry(namedtuple("SitemapEntry", ["loc", "lastmod", "priority", "index"])):
+    """An entry of a sitemap.
+
+    loc         Absolute URL of the entry
+    lastmod     Value of <lastmod> (or None)
+    priority    Value of <priority> as a float (or None)
+    index       Whether the entry is a sitemap (from a sitemap index)
+
+    """
+    __slots__ = ()
+
+
+def is_gzip(content):
+    """Returns whether the content is gzip compressed.
+
+    :param content bytes: The content
+    :rtype: bool
+    """
+    return content[:2] == GZIP_MAGIC
+
+
+def _open(content):
+    """Returns a file object over the (decompressed) content."""
+    fileobj = BytesIO(content)
+    if is_gzip(content):
+        return gzip.GzipFile(fileobj=fileobj, mode="rb")
+    return fileobj
+
+
+def _localname(tag):
+    """Returns the tag without its namespace."""
+    return tag.rpartition("}")[2] if isinstance(tag, str) else ""
+
+
+def sitemap_kind(content):
+    """Returns the kind of sitemap by its root tag.
+    Only the start of the document is read.
+
+    :param content bytes: The (possibly gzip compressed) content
+    :return: SITEMAP_URLSET, SITEMAP_INDEX or None if it is not a sitemap
+    :rtype: str | None
+    """
+    try:
+        for _, elem in etree.iterparse(_open(content), events=("start",),
+                resolve_entities=False, no_network=True):
+            kind = _localname(elem.tag)
+            if kind in (SITEMAP_URLSET, SITEMAP_INDEX):
+                return kind
+            return None
+    except (etree.XMLSyntaxError, OSError, EOFError, zlib.error):
+        return None
+    return None
+
+
+def _entry_fields(elem):
+    """Returns the stripped text of <loc>, <lastmod> and <priority> (or None)."""
+    fields = {"loc": None, "lastmod": None, "priority": None}
+    for child in elem:
+        name = _localname(child.tag)
+        if name in fields and fields[name] is None:
+            fields[name] = (child.text or "").strip() or None
+    return fields["loc"], fields["lastmod"], fields["priority"]
+
+
+def iter_sitemap(content, base_url, max_entries=MAX_SITEMAP_ENTRIES):
+    """Yields the entries of a sitemap or a sitemap index in document order.
+    Entries without a <loc> are skipped. A malformed document yields
+    the entries read before the error.
+
+    :param content bytes: The (possibly gzip compressed) content
+    :param base_url str: The URL of the sitemap (base for relative locs)
+    :param max_entries int: Maximum amount of entries to read
+    :return: A generator of entries
+    :rtype: Generator[SitemapEntry]
+    """
+    count = 0
+    try:
+        for _, elem in etree.iterparse(_open(content), events=("end",),
+                tag=("{*}url", "{*}sitemap"), resolve_entities=False, no_network=True):
+            loc, lastmod, priority = _entry_fields(elem)
+            index = _localname(elem.tag) == "sitemap"
+
+            # free the entry and the entries before it
+            elem.clear()
+            parent = elem.getparent()
+            if parent is not None:
+                while elem.getprevious() is not None:
+                    del parent[0]
+
+            if loc is None:
+                continue
+            try:
+                priority = float(priority) if priority is not None else None
+            except ValueError:
+                priority = None
+
+            # locs should be absolute; only resolve them if they are not
+            if not loc.startswith(_ABSOLUTE_PREFIXES):
+                loc = urljoin(base_url, loc)
+
+            yield SitemapEntry(loc, lastmod, priority, index)
+
+            count += 1
+            if count >= max_entries:
+                return
+    except (etree.XMLSyntaxError, OSError, EOFError, zlib.error):
+        return
+
+
+def iter_batches(iterable, size):
+    """Yields lists of up to `size` items from iterable.
+
+    :param iterable Iterable: The items
+    :param size int: Batch size
+    :rtype: Generator[list]
+    """
+    batch = []
+    for item in iterable:
+        batch.append(item)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
@@ -6,6 +6,7 @@
 
 from helpers.contra_set import is_contraction
 from helpers.stopwords_set import STOPWORDS_SET
+import re
 
 
 # symbols (non-alnum chars) that are in this set will not split the token and
@@ -21,6 +22,21 @@ NONTERM_GROUP_SYMBOLS = r"."
 NONREPEAT_GROUP_SYMBOLS = r"."
 
 
+# compiled form of the rules above (used by tokenize)
+#
+# `\w` matches exactly the graphemes where str.isalnum() is true, plus "_"
+# a word is a run of alnum graphemes and GROUP_SYMBOLS, where a
+# NONREPEAT_GROUP_SYMBOL only counts if it is not part of a repeat sequence
+# (sequences split words and are discarded since they contain no alnum)
+_GROUP_CLASS = "".join(re.escape(c) for c in sorted(set(GROUP_SYMBOLS) - set(NONREPEAT_GROUP_SYMBOLS)))
+_NONREPEAT_ALTS = "".join(
+    f"|(?<!{re.escape(c)}){re.escape(c)}(?!{re.escape(c)})"
+    for c in sorted(set(NONREPEAT_GROUP_SYMBOLS))
+)
+_WORD_RE = re.compile(rf"(?:[\w{_GROUP_CLASS}]{_NONREPEAT_ALTS})+")
+_ALNUM_RE = re.compile(r"[^\W_]")
+
+
 def _add_processed_word(word, processed_list, alnum_hit):
     """Private helper function to add word to processed_list after checking constraints"""
     # words must contain at least 1 alnum grapheme
@@ -34,6 +50,39 @@ def _add_processed_word(word, processed_list, alnum_hit):
 
 def tokenize(text):
     """Tokenizes text into a list of processed tokens.
+    Equivalent to tokenize_graphemes(text), but words are matched by
+    precompiled regular expressions instead of grapheme-by-grapheme.
+    Tokens that are entirely alnum (most of them) skip the regex.
+
+    :param text str: Text content
+    :return: A list of processed tokens based on the tokenizer policy
+    :rtype: list[str]
+    """
+    processed = []
+    append = processed.append
+    findall = _WORD_RE.findall
+    has_alnum = _ALNUM_RE.search
+
+    for token in text.split():
+        token = token.lower()
+
+        if token in STOPWORDS_SET:
+            continue
+
+        if token.isalnum() or is_contraction(token):
+            append(token)
+            continue
+
+        for word in findall(token):
+            if has_alnum(word):
+                append(word.rstrip(NONTERM_GROUP_SYMBOLS))
+
+    return processed
+
+
+def tokenize_graphemes(text):
+    """Tokenizes text into a list of processed tokens.
+    Reference implementation of the tokenizer (see tokenize).
 
     The tokenizer processes tokens under these rules:
         -   Tokens converted to lowercase
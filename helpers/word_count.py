@@ -3,8 +3,16 @@
 # computes the word frequencies of the response
 # based on the tokenizer in helpers/tokenize
 
+from collections import Counter
 from helpers.tokenize import tokenize
 
+
+# text partitions are joined into chunks of about this many chars
+# before they are tokenized by count_tokens
+# (tokens never span whitespace, so joining partitions with a space
+# does not change the tokens)
+TOKENIZE_CHUNK_SIZE = 4096
+
 def to_tokens(text_content):
     """Returns a list of tokens from after tokenizing text_content.
     See helpers/tokenize for more info on how the tokenizer works,
@@ -34,3 +42,52 @@ def word_count(tokens):
         word_dict[token] = word_dict.get(token, 0) + 1
     return word_dict
 
+
+
+def iter_tokens(text_content):
+    """Yields the tokens of text_content in document order
+    without building a list of every token.
+
+    :param text_content Iterable[str]: The text content
+    :return: A generator of tokens
+    :rtype: Generator[str]
+    """
+    for text in text_content:
+        yield from tokenize(text)
+
+def _chunks(text_content, size=TOKENIZE_CHUNK_SIZE):
+    """Yields text partitions joined into chunks of at least size chars
+    (except the last chunk).
+    """
+    chunk = []
+    chunk_size = 0
+    for text in text_content:
+        chunk.append(text)
+        chunk_size += len(text)
+        if chunk_size >= size:
+            yield " ".join(chunk)
+            chunk = []
+            chunk_size = 0
+    if chunk:
+        yield " ".join(chunk)
+
+def count_tokens(text_content, sink=None):
+    """Tokenizes and counts text_content one chunk of text partitions at a time.
+    Tokens of each chunk are counted (collections.Counter) and
+    passed to sink.update(tokens) if there is a sink (e.g. the
+    fingerprint accumulator of a similarity engine), then dropped.
+
+    Equivalent to word_count(to_tokens(text_content)).
+
+    :param text_content Iterable[str]: The text content
+    :param sink: Object with update(tokens) fed in document order (or None)
+    :return: The mapping
+    :rtype: Counter[str]
+    """
+    counts = Counter()
+    for text in _chunks(text_content):
+        tokens = tokenize(text)
+        counts.update(tokens)
+        if sink is not None:
+            sink.update(tokens)
+    return counts
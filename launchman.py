@@ -1,15 +1,21 @@
 from configparser import ConfigParser
 from argparse import ArgumentParser
 
-from utils.server_registration import get_cache_server
+from utils.cache_server import start_local_cache_server
 from utils.config import Config
 from crawlerman.crawler import Crawler
 
-def main(config_file, restart, use_cache):
+def main(config_file, restart, use_cache, local_cache, recrawl):
     cparser = ConfigParser()
     cparser.read(config_file)
     config = Config(cparser)
-    if use_cache:
+    config.recrawl = recrawl
+    if local_cache:
+        # local cache server emulator (no network)
+        use_cache = True
+        config.cache_server = start_local_cache_server(config)
+    elif use_cache:
+        from utils.server_registration import get_cache_server
         config.cache_server = get_cache_server(config, restart)
     crawler = Crawler(config, restart, use_cache)
     crawler.start()
@@ -20,5 +26,7 @@ if __name__ == "__main__":
     parser.add_argument("--restart", action="store_true", default=False)
     parser.add_argument("--config_file", type=str, default="configman.ini")
     parser.add_argument("--use_cache", action="store_true", default=False)
+    parser.add_argument("--local_cache", action="store_true", default=False)
+    parser.add_argument("--recrawl", action="store_true", default=False)
     args = parser.parse_args()
-    main(args.config_file, args.restart, args.use_cache)
+    main(args.config_file, args.restart, args.use_cache, args.local_cache, args.recrawl)
@@ -28,6 +28,7 @@ def main(napfile):
     longest_page = ('', 0)  # URL and length
     spages = 0
     epages = 0
+    tpages = 0
 
     for hash, data in nap.dict.items():
         url = data['url']
@@ -67,6 +68,9 @@ def main(napfile):
         if data['finish'] == NURL_FINISH_TOO_EXACT:
             epages += 1
 
+        if data['finish'] == NURL_FINISH_TRAP:
+            tpages += 1
+
     print("Total Number of URLs Found:", total_urls)
     print("Total number of downloads:", total_downloads)
     print("\nLongest page by word count:")
@@ -87,6 +91,7 @@ def main(napfile):
     print("\nTotal number of errors:", errors)
     print("Total number of pages that are too similar:", spages)
     print("Total number of pages that are exact duplicates:", epages)
+    print("Total number of pages dropped as traps:", tpages)
 
 if __name__ == "__main__":
     if len(sys.argv) < 2:
@@ -2,26 +2,34 @@
 #
 # the scraper for crawler2
 
-import re
-from urllib.parse import urlparse
-from helpers.parser import parse_response
-from helpers.word_count import to_tokens, word_count
+from helpers.parser import parse_response, release_response
+from helpers.sitemap import iter_batches, iter_sitemap
+from helpers.word_count import count_tokens
+from utils import urlfilter
+from utils.resolver import UrlResolver
+
+
+# amount of sitemap URLs added to the frontier at once
+SITEMAP_BATCH_SIZE = 500
+
+# priority of sitemap entries without <priority> (sitemaps protocol default)
+SITEMAP_DEFAULT_PRIORITY = 0.5
 
 
 def scraper(resp, strict=True):
     """Scrapes valid urls to crawl from response.
-    Returns the extracted URLs as a list.
+    Returns the extracted URLs mapped to their hashes (see utils/resolver.py).
     """
     # Extract URLs
     urls = extract_urls(resp)
 
-    # Return valid URLs
-    return [url for url in urls if is_valid(url, strict)]
+    # Return valid URLs (validated at once)
+    return {url: urls[url] for url in urlfilter.URL_FILTER.filter(urls, strict)}
 
 
 def extract_urls(resp):
     """Extracts URLs from the response.
-    Returns the list of absolute URLS extracted, unchecked.
+    Returns the absolute URLS extracted (mapped to their hashes), unchecked.
 
     (below is a shorter summary of params forked from scraper.py)
 
@@ -36,25 +44,60 @@ def extract_urls(resp):
     # Use parse_response from cached or newly parsed response
     parsed_resp = parse_response(resp)
     if parsed_resp.is_empty():
-        return []
+        return dict()
+
+    # Sitemap entries are not cached (see sitemap_batches)
+    if parsed_resp.sitemap:
+        resolver = UrlResolver(resp.url)
+        resolved = (resolver.resolve(entry.loc) for entry in iter_sitemap(resp.raw_response.content, resp.url))
+        return dict(r for r in resolved if r)
 
     return parsed_resp.links
 
 
-def process_text(resp):
+def sitemap_batches(resp, strict=True, size=SITEMAP_BATCH_SIZE):
+    """Streams valid URLs from a sitemap / sitemap index response.
+    Yields lists of up to `size` URLs; each list is ordered by
+    the priority of its entries (highest first).
+
+    Sitemaps listed by a sitemap index are valid even if they
+    are gzip compressed (e.g. sitemap.xml.gz).
+    """
+    entries = (
+        entry for entry in iter_sitemap(resp.raw_response.content, resp.url)
+        if is_valid(_sitemap_check_url(entry), strict)
+    )
+    for batch in iter_batches(entries, size):
+        batch.sort(key=_sitemap_priority, reverse=True)
+        yield [entry.loc for entry in batch]
+
+
+def _sitemap_check_url(entry):
+    """Returns the URL of the sitemap entry checked by is_valid."""
+    if entry.index and entry.loc.lower().endswith(".gz"):
+        return entry.loc[:-len(".gz")]
+    return entry.loc
+
+
+def _sitemap_priority(entry):
+    """Returns the priority of the sitemap entry."""
+    if entry.priority is None:
+        return SITEMAP_DEFAULT_PRIORITY
+    return entry.priority
+
+
+def process_text(resp, sink=None):
     """Processes the text content of the nurl by first extracting it.
-    This tokenizes the text and counts the tokens.
-    Returns a tuple consisting of its tokens and its word frequency mapping.
+    This tokenizes the text and counts the tokens as a stream.
+    Tokens are fed to sink.update(tokens) in document order if there is
+    a sink (e.g. a fingerprint accumulator), but are not kept.
+    Returns its word frequency mapping.
     """
     # get cached / newly parsed response
     parsed_resp = parse_response(resp)
 
-    # get tokens
-    # then compute word frequency dict
-    tokens = to_tokens(parsed_resp.text_content)
-    wordcnts = word_count(tokens)
-
-    return (tokens, wordcnts)
+    # tokenize and count each text partition
+    return count_tokens(parsed_resp.text_content, sink)
 
 
 def is_sitemap(resp):
@@ -66,44 +109,16 @@ def is_sitemap(resp):
     return False
 
 
-def is_valid(url, strict=True):
-    """Decide whether to crawl this url or not.
-    This function is forked from scraper.py with no
-    additional changes (aside from prior modifications).
+def release(resp):
+    """Releases the parsed response from the page cache.
+    Call this once the worker is done with the response.
     """
-    try:
-        parsed = urlparse(url)
-        if parsed.scheme not in set(["http", "https"]):
-            return False
-
-        # Strict mode
-        # Only consider URLs that meet the requirements spec
-        if strict:
-            # Extract network location part of the URL
-            netlocation = parsed.netloc
-
-            # Check if network location ends with specified domains (in requirements)
-            if not (netlocation.endswith(".ics.uci.edu")
-                or netlocation.endswith(".cs.uci.edu")
-                or netlocation.endswith(".informatics.uci.edu")
-                or netlocation.endswith(".stat.uci.edu")):
-                return False
-
-        # Extract path and check if path ends with file extensions and ignore it
-        path = parsed.path
-        if re.search(r".*\.(css|js|bmp|gif|jpe?g|ico"
-            + r"|png|tiff?|mid|mp2|mp3|mp4"
-            + r"|wav|avi|mov|mpeg|ram|m4v|mkv|ogg|ogv|pdf"
-            + r"|ps|eps|tex|ppt|pptx|doc|docx|xls|xlsx|names"
-            + r"|data|dat|exe|bz2|tar|msi|bin|7z|psd|dmg|iso"
-            + r"|epub|dll|cnf|tgz|sha1"
-            + r"|thmx|mso|arff|rtf|jar|csv"
-            + r"|rm|smil|wmv|swf|wma|zip|rar|gz)$", parsed.path.lower()):
-            return False
+    release_response(resp)
 
-        return True
-
-    except TypeError:
-        print ("TypeError for ", parsed)
-        raise
 
+def is_valid(url, strict=True):
+    """Decide whether to crawl this url or not.
+    This function is forked from scraper.py; the checks are
+    precompiled by utils.urlfilter.UrlFilter.
+    """
+    return urlfilter.URL_FILTER.is_valid(url, strict)
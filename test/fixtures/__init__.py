@@ -0,0 +1,82 @@
+# test/fixtures/__init__.py
+#
+# loads the local fixture corpus as responses
+# used by tests and by the offline benchmarks in bench/
+
+import os
+import utils.response
+
+
+FIXTURES_DIR = os.path.dirname(os.path.abspath(__file__))
+PAGES_DIR = os.path.join(FIXTURES_DIR, "pages")
+FIXTURE_BASE_URL = "https://www.ics.uci.edu/fixtures/"
+
+
+def page_names():
+    """Returns the names of the fixture pages (sorted).
+
+    :rtype: list[str]
+    """
+    return sorted(
+        name for name in os.listdir(PAGES_DIR)
+        if name.endswith(".html")
+    )
+
+
+def read_page(name):
+    """Returns the raw bytes of a fixture page.
+
+    :param name str: The file name in test/fixtures/pages
+    :rtype: bytes
+    """
+    with open(os.path.join(PAGES_DIR, name), "rb") as fh:
+        return fh.read()
+
+
+def make_response(url, content, status=200, headers=None):
+    """Makes a response (see utils.response.Response) wrapping a
+    RawResponse, the same shape crawler2.download returns.
+
+    :param url str: The URL
+    :param content bytes: The body
+    :param status int: The status code
+    :param headers dict[str, str]: The headers
+    :rtype: Response
+    """
+    raw = utils.response.RawResponse(url, status,
+        headers or {"Content-Type": "text/html; charset=utf-8"}, content)
+
+    resp = utils.response.Response.__new__(utils.response.Response)
+    resp.url = url
+    resp.status = status
+    resp.error = ""
+    resp.raw_response = raw
+    return resp
+
+
+def load_response(name, url=None):
+    """Loads a fixture page as a response.
+    The URL defaults to FIXTURE_BASE_URL + name.
+
+    :param name str: The file name in test/fixtures/pages
+    :param url str: The URL of the response
+    :rtype: Response
+    """
+    return make_response(url or FIXTURE_BASE_URL + name, read_page(name))
+
+
+def load_pairs():
+    """Returns the labelled pairs in test/fixtures/pages/pairs.txt.
+
+    :return: A list of (first, second, similar)
+    :rtype: list[tuple[str, str, bool]]
+    """
+    pairs = []
+    with open(os.path.join(PAGES_DIR, "pairs.txt"), "r") as fh:
+        for line in fh:
+            line = line.strip()
+            if not line or line.startswith("#"):
+                continue
+            first, second, label = line.split()
+            pairs.append((first, second, label == "1"))
+    return pairs
@@ -0,0 +1,74 @@
+import os
+import tempfile
+import unittest
+
+import crawler2.download
+from crawler2.archive import ArchiveReader, ArchiveWriter, INDEX_FILE
+from helpers.exhash import exhash
+from test.fixtures import FIXTURE_BASE_URL, load_response, page_names
+from utils.response import Response
+
+
+def _cache_error(url):
+    resp = Response.__new__(Response)
+    resp.url = url
+    resp.status = 603
+    resp.error = "Cache server error"
+    resp.raw_response = None
+    return resp
+
+
+class TestArchive(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.dir = self.tmp.name
+
+    def tearDown(self):
+        crawler2.download.close_archives()
+        self.tmp.cleanup()
+
+    def test_roundtrip(self):
+        writer = ArchiveWriter(self.dir, segment_size=4096)
+        for name in page_names():
+            writer.record(FIXTURE_BASE_URL + name, load_response(name))
+        writer.record(FIXTURE_BASE_URL + "error", _cache_error(FIXTURE_BASE_URL + "error"))
+        writer.close()
+
+        # segments were rotated
+        segments = [name for name in os.listdir(self.dir) if name != INDEX_FILE]
+        self.assertGreater(len(segments), 1)
+
+        reader = ArchiveReader(self.dir)
+        self.assertEqual(len(reader), len(page_names()) + 1)
+        for name in page_names():
+            expected = load_response(name)
+            resp = reader.get(FIXTURE_BASE_URL + name)
+            self.assertEqual(resp.url, expected.url)
+            self.assertEqual(resp.status, 200)
+            self.assertEqual(resp.raw_response.content, expected.raw_response.content)
+            self.assertEqual(resp.raw_response.headers["content-type"], "text/html; charset=utf-8")
+            self.assertEqual(resp.exhash, exhash(expected.raw_response.content, len(expected.raw_response.content)))
+
+        resp = reader.get(FIXTURE_BASE_URL + "error")
+        self.assertEqual(resp.status, 603)
+        self.assertIsNone(resp.raw_response)
+        self.assertEqual(resp.error, "Cache server error")
+
+        self.assertIsNone(reader.get(FIXTURE_BASE_URL + "missing"))
+        self.assertEqual(reader.download(FIXTURE_BASE_URL + "missing").status, 404)
+        reader.close()
+
+    def test_record_replay(self):
+        # responses downloaded while recording are replayed by download()
+        url = FIXTURE_BASE_URL + "news.html"
+        crawler2.download.configure({"RECORD": self.dir})
+        crawler2.download.RECORDER.record(url, load_response("news.html"))
+        crawler2.download.configure({"REPLAY": self.dir})
+        self.assertIsNone(crawler2.download.RECORDER)
+
+        resp = crawler2.download.download(url)
+        self.assertEqual(resp.raw_response.content, load_response("news.html").raw_response.content)
+
+
+if __name__ == "__main__":
+    unittest.main()
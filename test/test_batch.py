@@ -0,0 +1,88 @@
+import threading
+import unittest
+from types import SimpleNamespace
+
+import crawler2.batch
+from crawler2.batch import BatchDownloader
+from crawler2.polmut import PoliteMutex
+from crawler2.workerpipe import worker_get_resp
+from crawler2.nurl import Nurl
+from test.fixtures import FIXTURE_BASE_URL, read_page
+from utils.cache_server import CacheServer, DirectorySite, SyntheticSite
+from utils.download import download_batch
+
+
+class TestBatch(unittest.TestCase):
+    def _config(self, server):
+        return SimpleNamespace(cache_server=server.start(), user_agent="IR_TEST")
+
+    def test_download_batch(self):
+        server = CacheServer(DirectorySite())
+        config = self._config(server)
+        urls = [FIXTURE_BASE_URL + "news.html", FIXTURE_BASE_URL + "missing.html"]
+        try:
+            resps = dict(download_batch(urls, config))
+        finally:
+            server.stop()
+        self.assertSetEqual(set(resps), set(urls))
+        self.assertEqual(resps[urls[0]].status, 200)
+        self.assertEqual(resps[urls[0]].raw_response.content, read_page("news.html"))
+        self.assertEqual(resps[urls[1]].status, 404)
+        self.assertEqual(server.batches, 1)
+
+    def test_coalesce(self):
+        site = SyntheticSite(pages=40, links=2, seed=0)
+        server = CacheServer(site, latency=0.05)
+        config = self._config(server)
+        batcher = BatchDownloader(config, None, PoliteMutex(0), 8)
+        urls = [f"{site.base_url}page/{n}" for n in range(32)]
+        statuses = dict()
+
+        def fetch(url):
+            statuses[url] = batcher.download(url).status
+
+        threads = [threading.Thread(target=fetch, args=(url,)) for url in urls]
+        try:
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+        finally:
+            server.stop()
+        self.assertEqual(statuses, {url: 200 for url in urls})
+        self.assertEqual(batcher.downloads, len(urls))
+        self.assertLess(server.batches, len(urls))
+        self.assertEqual(batcher.stats()["batches"], server.batches)
+
+    def test_failed_batch(self):
+        def download_batch(urls, config, logger=None):
+            raise ConnectionError("cache server unreachable")
+            yield
+
+        default = crawler2.batch.download_batch
+        crawler2.batch.download_batch = download_batch
+        try:
+            batcher = BatchDownloader(None, None, PoliteMutex(0), 8)
+            self.assertIsNone(batcher.download("http://www.ics.uci.edu/a"))
+            # the lead is handed over: later downloads are sent again
+            self.assertIsNone(batcher.download("http://www.ics.uci.edu/b"))
+        finally:
+            crawler2.batch.download_batch = default
+        self.assertEqual(batcher.stats()["batches"], 2)
+
+    def test_get_resp_unlocks(self):
+        # the domain's polite mutex is unlocked even if the download raises
+        def download(url):
+            raise RuntimeError("batch failed")
+
+        pmut = PoliteMutex(0)
+        w = SimpleNamespace(
+            frontier=SimpleNamespace(dpolmut=PoliteMutex(0), batcher=SimpleNamespace(download=download)),
+            config=None, logger=None)
+        with self.assertRaises(RuntimeError):
+            worker_get_resp(w, Nurl("http://www.ics.uci.edu/a"), pmut)
+        self.assertTrue(pmut._mutex.acquire(timeout=1))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,195 @@
+import socket
+import threading
+import time
+import unittest
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from types import SimpleNamespace
+
+import crawler2.download
+from crawler2.breaker import (
+    BREAKER_CLOSED, BREAKER_HALF_OPEN, BREAKER_OPEN, CircuitBreaker, NegativeCache,
+)
+from crawler2.download import STATUS_CONNECTION_FAILED, download
+from crawler2.nurl import Nurl
+from crawler2.polmut import PoliteMutex
+from crawler2.retry import RETRY_DELAY
+from crawler2.workerpipe import PIPE_AGAIN, PIPE_BAD, content_limit, worker_get_resp
+from utils import get_logger
+
+
+def _nurl(name):
+    return Nurl(f"http://down.example.com/{name}")
+
+
+def _closed_port():
+    # a port nothing listens on
+    sock = socket.socket()
+    sock.bind(("127.0.0.1", 0))
+    port = sock.getsockname()[1]
+    sock.close()
+    return port
+
+
+class _ResetHandler(BaseHTTPRequestHandler):
+    # closes the connection in the middle of the body
+    def do_GET(self):
+        self.send_response(200)
+        self.send_header("Content-Type", "text/html")
+        self.send_header("Content-Length", "1000")
+        self.end_headers()
+        self.wfile.write(b"<html>")
+
+    def log_message(self, *args):
+        pass
+
+
+class TestBreaker(unittest.TestCase):
+    def test_open(self):
+        breaker = CircuitBreaker(threshold=3, cooldown=60)
+        for _ in range(2):
+            breaker.record(503)
+        breaker.record(200) # failures are consecutive
+        for _ in range(3):
+            self.assertTrue(breaker.allow())
+            breaker.record(503)
+        self.assertEqual(breaker.state, BREAKER_OPEN)
+        self.assertFalse(breaker.allow())
+
+        # the first nurl comes back after the cooldown, the others are parked
+        self.assertAlmostEqual(breaker.park(_nurl("a")), 60, delta=1)
+        self.assertIsNone(breaker.park(_nurl("b")))
+        self.assertIsNone(breaker.park(_nurl("c")))
+        self.assertEqual(len(breaker.parked), 2)
+
+    def test_probe(self):
+        breaker = CircuitBreaker(threshold=1, cooldown=0.05)
+        breaker.record(599)
+        breaker.park(_nurl("a"))
+        breaker.park(_nurl("b"))
+        time.sleep(0.06)
+
+        # one probe at a time
+        self.assertTrue(breaker.allow())
+        self.assertEqual(breaker.state, BREAKER_HALF_OPEN)
+        self.assertFalse(breaker.allow())
+        self.assertIsNone(breaker.park(_nurl("c")))
+
+        # failed probe: reopens with a doubled cooldown, and a parked
+        # nurl comes back for the next probe
+        released, probe, delay = breaker.record(503)
+        self.assertEqual(breaker.state, BREAKER_OPEN)
+        self.assertEqual(breaker.cooldown, 0.1)
+        self.assertListEqual(released, [])
+        self.assertEqual(probe.url, _nurl("b").url)
+        self.assertAlmostEqual(delay, 0.1, delta=0.05)
+        time.sleep(0.11)
+
+        # successful probe: closes and releases the parked nurls
+        self.assertTrue(breaker.allow())
+        released, probe, _ = breaker.record(200)
+        self.assertEqual(breaker.state, BREAKER_CLOSED)
+        self.assertListEqual([nurl.url for nurl in released], [_nurl("c").url])
+        self.assertIsNone(probe)
+        self.assertEqual(breaker.cooldown, 0.05)
+        self.assertEqual(breaker.opened, 2)
+
+    def test_cancel_probe(self):
+        breaker = CircuitBreaker(threshold=1, cooldown=0.01)
+        breaker.record(503)
+        time.sleep(0.02)
+        self.assertTrue(breaker.allow()) # probe
+        self.assertIsNone(breaker.park(_nurl("a")))
+
+        # the probe ended without a status (e.g. on the negative cache)
+        breaker.cancel_probe()
+        self.assertEqual(breaker.state, BREAKER_OPEN)
+        self.assertTrue(breaker.allow()) # the probe comes back
+        self.assertEqual(breaker.state, BREAKER_HALF_OPEN)
+        released, _, _ = breaker.record(200)
+        self.assertListEqual([nurl.url for nurl in released], [_nurl("a").url])
+        self.assertEqual(breaker.state, BREAKER_CLOSED)
+
+        # cancelling without a probe does nothing
+        breaker.cancel_probe()
+        self.assertEqual(breaker.state, BREAKER_CLOSED)
+
+    def test_negative_cache(self):
+        cache = NegativeCache(ttl=0.05)
+        cache.add("down.example.com", "dns")
+        self.assertEqual(cache.get("down.example.com"), "dns")
+        self.assertIsNone(cache.get("up.example.com"))
+        time.sleep(0.06)
+        self.assertIsNone(cache.get("down.example.com"))
+
+    def test_connection_failed(self):
+        url = f"http://127.0.0.1:{_closed_port()}/page"
+        hits = crawler2.download.NEGATIVE_CACHE.hits
+        try:
+            resp = download(url)
+            self.assertEqual(resp.status, STATUS_CONNECTION_FAILED)
+            self.assertIsNone(resp.raw_response)
+            self.assertIn("connect", resp.error)
+
+            self.assertIsNone(resp.retry_after)
+
+            # remembered: no new connection is attempted
+            resp = download(url + "2")
+            self.assertEqual(resp.status, STATUS_CONNECTION_FAILED)
+            self.assertEqual(crawler2.download.NEGATIVE_CACHE.hits, hits + 1)
+            self.assertGreater(resp.retry_after, 0)
+        finally:
+            crawler2.download.NEGATIVE_CACHE = NegativeCache()
+
+    def test_reset_not_cached(self):
+        # failures after the connection was made are not remembered
+        server = HTTPServer(("127.0.0.1", 0), _ResetHandler)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        url = f"http://127.0.0.1:{server.server_address[1]}/page"
+        try:
+            for _ in range(2):
+                resp = download(url, content_limit=content_limit)
+                self.assertEqual(resp.status, STATUS_CONNECTION_FAILED)
+                self.assertIsNone(resp.retry_after)
+            self.assertIsNone(crawler2.download.NEGATIVE_CACHE.get("127.0.0.1"))
+        finally:
+            server.shutdown()
+            server.server_close()
+            crawler2.download.NEGATIVE_CACHE = NegativeCache()
+
+    def test_get_resp_retries(self):
+        w = SimpleNamespace(
+            frontier=SimpleNamespace(dpolmut=PoliteMutex(0), batcher=None, record_download=lambda url, status: None,
+                cancel_probe=lambda url: None),
+            config=None,
+            logger=get_logger("test-breaker", "worker"),
+        )
+        port = _closed_port()
+        nurl = Nurl(f"http://127.0.0.1:{port}/page")
+        try:
+            ok, resp = worker_get_resp(w, nurl, use_cache=False)
+            self.assertEqual(ok, PIPE_AGAIN)
+            self.assertEqual(nurl.retries, 1)
+
+            # negative cache hits wait for the entry, without using up retries
+            # (and cancel the probe of the breaker, as there is no status)
+            cancelled = []
+            w.frontier.cancel_probe = cancelled.append
+            ok, resp = worker_get_resp(w, nurl, use_cache=False)
+            self.assertEqual(ok, PIPE_AGAIN)
+            self.assertGreater(resp.retry_after, 0)
+            self.assertEqual(nurl.retries, 1)
+            self.assertListEqual(cancelled, [nurl.url])
+
+            # exhausted: left un-downloaded, with its retries reset
+            crawler2.download.NEGATIVE_CACHE = NegativeCache(ttl=0)
+            nurl.retries = len(RETRY_DELAY)
+            ok, resp = worker_get_resp(w, nurl, use_cache=False)
+            self.assertEqual(ok, PIPE_BAD)
+            self.assertEqual(resp.status, STATUS_CONNECTION_FAILED)
+            self.assertEqual(nurl.retries, 0)
+        finally:
+            crawler2.download.NEGATIVE_CACHE = NegativeCache()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,44 @@
+import unittest
+from threading import Thread
+from crawler2.buckets import Buckets
+
+class TestBuckets(unittest.TestCase):
+    def test_claim(self):
+        buckets = Buckets()
+        self.assertTrue(buckets.claim("abcd", "master"))
+        self.assertTrue(buckets.claim("abcd", "master"))
+        self.assertFalse(buckets.claim("abcd", "dup1"))
+        self.assertFalse(buckets.claim("abcd", "dup2"))
+        self.assertListEqual(buckets["abcd"], ["master", 2, ["dup1", "dup2"]])
+        self.assertDictEqual(buckets.dict, {"abcd": ["master", 2, ["dup1", "dup2"]]})
+
+    def test_bounded(self):
+        # legacy buckets are converted, samples are capped
+        buckets = Buckets({"abcd": ["master", ["dup1", "dup2", "dup3"]]}, sample_cap=2)
+        self.assertListEqual(buckets["abcd"], ["master", 3, ["dup1", "dup2"]])
+        self.assertFalse(buckets.claim("abcd", "dup4"))
+        self.assertListEqual(buckets["abcd"], ["master", 4, ["dup1", "dup2"]])
+
+    def test_claim_threads(self):
+        # exactly one thread becomes the master of each bucket
+        buckets = Buckets(stripes=4)
+        masters = []
+
+        def work(tid):
+            for i in range(200):
+                if buckets.claim(f"{i:08x}", f"t{tid}"):
+                    masters.append(i)
+
+        threads = [Thread(target=work, args=(tid,)) for tid in range(8)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+
+        self.assertListEqual(sorted(masters), list(range(200)))
+        for bucket in buckets.dict.values():
+            self.assertEqual(bucket[1], 7)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,55 @@
+import unittest
+from types import SimpleNamespace
+
+from test.fixtures import FIXTURE_BASE_URL, read_page
+from utils.cache_server import CACHE_ERROR_STATUSES, CacheServer, DirectorySite, SyntheticSite
+from utils.download import download
+
+
+class TestCacheServer(unittest.TestCase):
+    def _config(self, server):
+        return SimpleNamespace(cache_server=server.start(), user_agent="IR_TEST")
+
+    def test_fixtures(self):
+        server = CacheServer(DirectorySite())
+        config = self._config(server)
+        try:
+            resp = download(FIXTURE_BASE_URL + "news.html", config)
+            self.assertEqual(resp.status, 200)
+            self.assertEqual(resp.raw_response.content, read_page("news.html"))
+            self.assertEqual(resp.raw_response.headers["Content-Type"], "text/html")
+
+            resp = download(FIXTURE_BASE_URL + "missing.html", config)
+            self.assertEqual(resp.status, 404)
+        finally:
+            server.stop()
+        self.assertEqual(server.statuses, {200: 1, 404: 1})
+
+    def test_errors(self):
+        server = CacheServer(DirectorySite(), error_rate=1.0, error_statuses=(603, 503), seed=1)
+        config = self._config(server)
+        try:
+            statuses = set()
+            for _ in range(20):
+                resp = download(FIXTURE_BASE_URL + "news.html", config)
+                statuses.add(resp.status)
+                if resp.status in CACHE_ERROR_STATUSES:
+                    self.assertIsNone(resp.raw_response)
+                    self.assertTrue(resp.error)
+                else:
+                    self.assertEqual(resp.raw_response.content, b"")
+        finally:
+            server.stop()
+        self.assertSetEqual(statuses, {603, 503})
+
+    def test_synthetic(self):
+        site = SyntheticSite(pages=10, links=5, seed=3)
+        status, _, content = site.get(site.seed_urls()[0])
+        self.assertEqual(status, 200)
+        self.assertEqual(content, SyntheticSite(pages=10, links=5, seed=3).page(0))
+        self.assertEqual(content.count(b"<a href"), 5)
+        self.assertEqual(site.get(site.base_url + "page/10")[0], 404)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,59 @@
+import random
+import unittest
+from utils.canonical import Canonicalizer
+
+class TestCanonicalizer(unittest.TestCase):
+    def setUp(self):
+        self.canon = Canonicalizer.from_options({
+            "DROP_PARAMS": "utm_*,sid",
+            "DROP_PARAMS.*.ics.uci.edu": "share",
+        })
+
+    def test_equivalent(self):
+        expected = "https://www.ics.uci.edu/about?a=1&b=2"
+        urls = [
+            "https://www.ics.uci.edu/about/?a=1&b=2",
+            "https://WWW.ICS.uci.edu/about?b=2&a=1",
+            "https://www.ics.uci.edu:443/about?a=1&b=2#team",
+            "https://www.ics.uci.edu/about?utm_source=x&a=1&sid=abc&b=2",
+            "https://www.ics.uci.edu/about?a=1&share=twitter&b=2",
+        ]
+        for url in urls:
+            self.assertEqual(self.canon.canonicalize(url), expected)
+
+    def test_paths(self):
+        c = self.canon.canonicalize
+        self.assertEqual(c("http://www.ics.uci.edu/"), "http://www.ics.uci.edu")
+        self.assertEqual(c("http://www.ics.uci.edu:80/a/index.html"), "http://www.ics.uci.edu/a")
+        self.assertEqual(c("http://www.ics.uci.edu/a/index.php?id=2"), "http://www.ics.uci.edu/a/index.php?id=2")
+        self.assertEqual(c("http://www.ics.uci.edu/a;jsessionid=F00/b"), "http://www.ics.uci.edu/a/b")
+        self.assertEqual(c("http://www.ics.uci.edu:8080/A"), "http://www.ics.uci.edu:8080/A")
+
+    def test_idempotent(self):
+        c = self.canon.canonicalize
+        self.assertEqual(c("http://h/a/index.html/"), "http://h/a")
+        self.assertEqual(c("http://h/a/index.html//"), "http://h/a")
+        self.assertEqual(c("http://h/a/index.html/index.php"), "http://h/a")
+
+        # canon(canon(url)) == canon(url) for random URLs
+        rng = random.Random(0)
+        pieces = ["", "/", "//", "a", "B", "index.html", "INDEX.PHP", "default.asp",
+                  ";jsessionid=F00", ";x=1", "?", "?a=1", "?utm_source=x", "&", "#f"]
+        for _ in range(20000):
+            scheme = rng.choice(["http", "https", "HTTP", "mailto"])
+            host = rng.choice(["h", "WWW.ICS.UCI.EDU", "h:80", "h:443", "u@h:8080"])
+            url = f"{scheme}://{host}" + "".join(rng.choice(pieces) for _ in range(rng.randint(0, 6)))
+            once = c(url)
+            self.assertEqual(c(once), once, url)
+
+    def test_host_rules(self):
+        # per-host rules only apply to matching hosts
+        self.assertEqual(self.canon.canonicalize("https://example.com/?share=1"), "https://example.com?share=1")
+
+    def test_other_schemes(self):
+        self.assertEqual(self.canon.canonicalize("mailto:research@ics.uci.edu"), "mailto:research@ics.uci.edu")
+        self.assertEqual(self.canon.canonicalize("javascript:void(0)"), "javascript:void(0)")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,4 +1,6 @@
+import random
 import unittest
+from helpers import contra_set
 from helpers.contra_set import is_contraction
 
 class TestContractions(unittest.TestCase):
@@ -18,6 +20,19 @@ class TestContractions(unittest.TestCase):
 
         self.assertListEqual(test_strs, [True, True, False, True, True, True, False, False])
 
+    def test_suffix_trie(self):
+        # the suffix trie should match the same words as
+        # checking every generic suffix with str.endswith
+        is_contraction("")
+        suffixes = sorted(contra_set.GENERIC_CONTRA_SET)
+        rng = random.Random(34)
+        for _ in range(2000):
+            word = "".join(rng.choice("abdlmnrstv'") for _ in range(rng.randint(0, 8)))
+            if rng.random() < 0.3:
+                word += rng.choice(suffixes)
+            expected = word in contra_set.CONTRA_SET or any(word.endswith(s) for s in suffixes)
+            self.assertEqual(is_contraction(word), expected, word)
+
 
 if __name__ == "__main__":
     unittest.main()
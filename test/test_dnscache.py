@@ -0,0 +1,119 @@
+import socket
+import threading
+import time
+import unittest
+from http.server import BaseHTTPRequestHandler, HTTPServer
+
+import requests
+
+import crawler2.dnscache
+from crawler2.dnscache import DnsCache, install, uninstall
+
+
+class StubResolver:
+    """Resolves every name in `names` to 127.0.0.1 (with a delay)."""
+    def __init__(self, names, ttl=60.0, delay=0.0):
+        self.names = names
+        self.ttl = ttl
+        self.delay = delay
+        self.lookups = []
+
+    def __call__(self, host):
+        self.lookups.append(host)
+        time.sleep(self.delay)
+        if host not in self.names:
+            raise socket.gaierror(socket.EAI_NONAME, "Name or service not known")
+        return ([(socket.AF_INET, socket.SOCK_STREAM, 6, "", ("127.0.0.1", 0))], self.ttl)
+
+
+class _Handler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        body = self.headers["Host"].encode("ascii")
+        self.send_response(200)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+class TestDnsCache(unittest.TestCase):
+    def test_ttl(self):
+        resolver = StubResolver({"a.test"}, ttl=0.05)
+        cache = DnsCache(resolver)
+        self.assertEqual(cache.resolve("a.test")[0][4][0], "127.0.0.1")
+        cache.resolve("a.test")
+        self.assertListEqual(resolver.lookups, ["a.test"])
+
+        # expired: resolved again
+        time.sleep(0.06)
+        cache.resolve("a.test")
+        self.assertListEqual(resolver.lookups, ["a.test", "a.test"])
+        self.assertDictEqual(cache.stats(), {"hosts": 1, "hits": 1, "misses": 2, "prefetches": 0})
+
+    def test_failure(self):
+        resolver = StubResolver(set())
+        cache = DnsCache(resolver)
+        for _ in range(2):
+            with self.assertRaises(socket.gaierror):
+                cache.resolve("missing.test")
+        self.assertListEqual(resolver.lookups, ["missing.test"])
+
+    def test_malformed(self):
+        # the IDNA codec rejects labels over 63 characters (UnicodeError)
+        cache = DnsCache()
+        host = "y" * 70 + ".uci.edu"
+        cache.prefetch(host)
+        done = threading.Event()
+
+        def resolve():
+            for _ in range(2):
+                with self.assertRaises(socket.gaierror):
+                    cache.resolve(host)
+            done.set()
+
+        threading.Thread(target=resolve, daemon=True).start()
+        self.assertTrue(done.wait(3))
+
+    def test_prefetch(self):
+        resolver = StubResolver({"a.test", "b.test"}, delay=0.05)
+        cache = DnsCache(resolver)
+        cache.prefetch("a.test")
+        cache.prefetch("b.test")
+        cache.prefetch("a.test")
+        time.sleep(0.1)
+
+        # the lookups were done in the background
+        start = time.perf_counter()
+        cache.resolve("a.test")
+        cache.resolve("b.test")
+        self.assertLess(time.perf_counter() - start, 0.04)
+        self.assertEqual(sorted(resolver.lookups), ["a.test", "b.test"])
+        self.assertEqual(cache.stats()["hits"], 2)
+
+    def test_requests(self):
+        # requests connect to the addresses of the cache
+        server = HTTPServer(("127.0.0.1", 0), _Handler)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        port = server.server_address[1]
+
+        resolver = StubResolver({"www.stub.test"})
+        default = crawler2.dnscache.DNS_CACHE
+        crawler2.dnscache.DNS_CACHE = DnsCache(resolver)
+        install()
+        try:
+            resp = requests.get(f"http://www.stub.test:{port}/")
+            self.assertEqual(resp.content, f"www.stub.test:{port}".encode("ascii"))
+            with self.assertRaises(requests.exceptions.ConnectionError):
+                requests.get(f"http://missing.stub.test:{port}/")
+            self.assertListEqual(resolver.lookups, ["www.stub.test", "missing.stub.test"])
+        finally:
+            uninstall()
+            crawler2.dnscache.DNS_CACHE = default
+            server.shutdown()
+            server.server_close()
+
+
+if __name__ == "__main__":
+    unittest.main()
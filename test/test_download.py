@@ -0,0 +1,141 @@
+import threading
+import unittest
+from http.server import BaseHTTPRequestHandler, HTTPServer
+
+from crawler2.download import (
+    ABORT_CONTENT_LENGTH, ABORT_CONTENT_TYPE, ABORT_SIZE,
+    DownloadStats, stream_download,
+)
+from crawler2.nurl import Nurl
+from crawler2.workerpipe import MAX_CONTENT_LEN, MAX_SITEMAP_CONTENT_LEN, content_limit, worker_revalidate
+from helpers.exhash import Exhasher, exhash
+
+
+PAGE = b"<html><body>" + b"<p>hello world</p>" * 100 + b"</body></html>"
+
+# path => (content type, body, send Content-Length)
+ROUTES = {
+    "/page": ("text/html; charset=utf-8", PAGE, True),
+    "/binary": ("application/pdf", b"%PDF" * 1000, True),
+    "/large": ("text/html", b"x" * 5000, True),
+    "/unsized": ("text/html", b"x" * 5000, False),
+}
+
+ETAG = '"v1"'
+LAST_MODIFIED = "Mon, 05 Oct 2026 10:00:00 GMT"
+
+
+class _Handler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path == "/conditional" and self.headers.get("If-None-Match") == ETAG:
+            self.send_response(304)
+            self.send_header("ETag", ETAG)
+            self.end_headers()
+            self.close_connection = True
+            return
+
+        content_type, body, sized = ROUTES.get(self.path, ROUTES["/page"])
+        self.send_response(200)
+        self.send_header("Content-Type", content_type)
+        self.send_header("ETag", ETAG)
+        self.send_header("Last-Modified", LAST_MODIFIED)
+        if sized:
+            self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        try:
+            self.wfile.write(body)
+        except (BrokenPipeError, ConnectionResetError):
+            pass
+        self.close_connection = True
+
+    def log_message(self, *args):
+        pass
+
+
+def _limit(content_type):
+    # small limits so that tests do not transfer large bodies
+    return 4096 if content_type.startswith("text/html") else 0
+
+
+class TestDownload(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.server = HTTPServer(("127.0.0.1", 0), _Handler)
+        cls.base = f"http://127.0.0.1:{cls.server.server_address[1]}"
+        threading.Thread(target=cls.server.serve_forever, daemon=True).start()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+        cls.server.server_close()
+
+    def test_complete(self):
+        stats = DownloadStats()
+        resp = stream_download(self.base + "/page", _limit, stats)
+        self.assertIsNone(resp.aborted)
+        self.assertEqual(resp.status, 200)
+        self.assertEqual(resp.raw_response.content, PAGE)
+        self.assertEqual(resp.exhash, exhash(PAGE, len(PAGE)))
+        self.assertEqual(stats.stats()["bytes_read"], len(PAGE))
+
+    def test_abort(self):
+        stats = DownloadStats()
+        for path, reason in [("/binary", ABORT_CONTENT_TYPE),
+                             ("/large", ABORT_CONTENT_LENGTH),
+                             ("/unsized", ABORT_SIZE)]:
+            resp = stream_download(self.base + path, _limit, stats)
+            self.assertEqual(resp.aborted, reason, path)
+            self.assertEqual(resp.raw_response.content, b"", path)
+            self.assertIsNone(resp.exhash, path)
+
+        result = stats.stats()
+        self.assertDictEqual(result["aborted"], {ABORT_CONTENT_TYPE: 1, ABORT_CONTENT_LENGTH: 1, ABORT_SIZE: 1})
+        self.assertEqual(result["bytes_saved"], 4000 + 5000)
+
+    def test_revalidate(self):
+        # first crawl stores the validators
+        nurl = Nurl(self.base + "/conditional")
+        self.assertDictEqual(nurl.validators(), {})
+        resp = stream_download(nurl.url, _limit, DownloadStats(), headers=nurl.validators())
+        self.assertTrue(worker_revalidate(None, nurl, resp))
+        self.assertEqual(nurl.etag, ETAG)
+        self.assertEqual(nurl.lastmod, LAST_MODIFIED)
+        nurl.exhash = resp.exhash
+
+        # recrawl with validators is not modified
+        self.assertDictEqual(Nurl.from_dict(nurl.__dict__).validators(),
+            {"If-None-Match": ETAG, "If-Modified-Since": LAST_MODIFIED})
+        resp = stream_download(nurl.url, _limit, DownloadStats(), headers=nurl.validators())
+        self.assertEqual(resp.status, 304)
+        self.assertIsNone(resp.aborted)
+        self.assertIsNone(resp.exhash)
+        self.assertFalse(worker_revalidate(None, nurl, resp))
+
+        # recrawl without validators (e.g. cache server) compares the exhash
+        resp = stream_download(nurl.url, _limit, DownloadStats())
+        self.assertEqual(resp.status, 200)
+        self.assertFalse(worker_revalidate(None, nurl, resp))
+
+        # a modified body continues, and is scraped again
+        nurl.exhash = exhash(b"old", 3)
+        nurl.links = ["http://example.com/"]
+        self.assertTrue(worker_revalidate(None, nurl, resp))
+        self.assertListEqual(nurl.links, [])
+
+    def test_content_limit(self):
+        self.assertEqual(content_limit("text/html; charset=utf-8"), MAX_CONTENT_LEN)
+        self.assertEqual(content_limit(""), MAX_CONTENT_LEN)
+        self.assertEqual(content_limit("application/xml"), MAX_SITEMAP_CONTENT_LEN)
+        self.assertEqual(content_limit("application/x-gzip"), MAX_SITEMAP_CONTENT_LEN)
+        self.assertEqual(content_limit("image/png"), 0)
+
+    def test_exhasher(self):
+        hasher = Exhasher()
+        for i in range(0, len(PAGE), 100):
+            hasher.update(PAGE[i:i+100])
+        self.assertEqual(hasher.hexdigest(), exhash(PAGE, len(PAGE)))
+        self.assertEqual(Exhasher().hexdigest(), exhash(b"", 0))
+
+
+if __name__ == "__main__":
+    unittest.main()
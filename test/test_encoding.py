@@ -0,0 +1,57 @@
+import unittest
+
+from helpers import encoding
+from helpers.encoding import (
+    DECODE_BOM, DECODE_DETECT, DECODE_HEADER, DECODE_HOST, DECODE_META, DECODE_UTF8,
+    DecodeStats, decode_html, declared_charset, header_charset,
+)
+
+
+TEXT = "<html><body><p>café – naïve – Привет</p></body></html>"
+CP1251_TEXT = "<html><body>" + "<p>Привет, как дела? Это тестовая страница.</p>" * 20 + "</body></html>"
+
+
+class TestEncoding(unittest.TestCase):
+    def setUp(self):
+        encoding.HOST_ENCODINGS = encoding.LRUCache(16, 16, lambda _: 1)
+
+    def assertDecoded(self, content, expected, stage, content_type="", host=None):
+        stats = DecodeStats()
+        self.assertEqual(decode_html(content, content_type, host, stats), expected)
+        self.assertDictEqual(stats.stats(), {stage: 1})
+
+    def test_charsets(self):
+        self.assertEqual(header_charset("text/html; charset=ISO-8859-1"), "ISO-8859-1")
+        self.assertEqual(header_charset('text/html;charset="utf-8"'), "utf-8")
+        self.assertIsNone(header_charset("text/html"))
+        self.assertEqual(declared_charset(b'<meta charset="windows-1251">'), "windows-1251")
+        self.assertEqual(declared_charset(b'<?xml version="1.0" encoding=\'latin-1\'?>'), "latin-1")
+        self.assertIsNone(declared_charset(b"<p>no charset</p>"))
+
+    def test_stages(self):
+        self.assertDecoded(TEXT.encode("utf-8"), TEXT, DECODE_UTF8)
+        self.assertDecoded(b"\xef\xbb\xbf" + TEXT.encode("utf-8"), TEXT, DECODE_BOM)
+        self.assertDecoded(TEXT.encode("utf-16"), TEXT, DECODE_BOM)
+        self.assertDecoded(CP1251_TEXT.encode("cp1251"), CP1251_TEXT, DECODE_HEADER,
+            content_type="text/html; charset=windows-1251")
+
+        meta = '<meta charset="windows-1251">' + CP1251_TEXT
+        self.assertDecoded(meta.encode("cp1251"), meta, DECODE_META)
+
+    def test_untrusted(self):
+        # declared charsets that do not decode the content are skipped
+        self.assertDecoded(TEXT.encode("utf-8"), TEXT, DECODE_UTF8, content_type="text/html; charset=ascii")
+        self.assertDecoded(TEXT.encode("utf-8"), TEXT, DECODE_UTF8, content_type="text/html; charset=bogus")
+        self.assertDecoded(b"<p>plain</p>", "<p>plain</p>", DECODE_UTF8, content_type="text/html; charset=utf-16")
+
+    def test_host_cache(self):
+        content = CP1251_TEXT.encode("cp1251")
+        stats = DecodeStats()
+        first = decode_html(content, "", "www.example.com", stats)
+        second = decode_html(content, "", "www.example.com", stats)
+        self.assertEqual(first, second)
+        self.assertDictEqual(stats.stats(), {DECODE_DETECT: 1, DECODE_HOST: 1})
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,40 @@
+import unittest
+from helpers.lru import LRUCache
+
+class TestLRUCache(unittest.TestCase):
+    def test_entries(self):
+        cache = LRUCache(2, 1000, len)
+        cache["a"] = "1"
+        cache["b"] = "2"
+        self.assertEqual(cache.get("a"), "1") # "b" is now least recently used
+        cache["c"] = "3"
+        self.assertNotIn("b", cache)
+        self.assertEqual(cache.get("b"), None)
+        self.assertDictEqual(cache.stats(),
+            {"entries": 2, "bytes": 2, "hits": 1, "misses": 1, "evictions": 1})
+
+    def test_bytes(self):
+        cache = LRUCache(100, 10, len)
+        cache["a"] = "x" * 4
+        cache["b"] = "x" * 4
+        cache["c"] = "x" * 4
+        self.assertNotIn("a", cache)
+        self.assertEqual(cache.size, 8)
+
+        # values larger than the cache are not cached
+        cache["d"] = "x" * 11
+        self.assertNotIn("d", cache)
+        self.assertEqual(len(cache), 2)
+
+    def test_pop(self):
+        cache = LRUCache(10, 100, len)
+        cache["a"] = "abc"
+        cache["a"] = "abcd"
+        self.assertEqual(cache.size, 4)
+        self.assertEqual(cache.pop("a"), "abcd")
+        self.assertEqual(cache.pop("a", "gone"), "gone")
+        self.assertEqual(cache.size, 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
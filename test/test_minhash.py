@@ -0,0 +1,54 @@
+import unittest
+from helpers.minhash import MinhashEngine, from_key, to_key, signature
+from helpers.simengine import SimhashEngine, SimilarityEngine, get_engine
+
+class TestMinhash(unittest.TestCase):
+    def setUp(self):
+        self.doc = ("the systems group builds operating systems distributed storage and networked "
+                    "services that scale to millions of users current projects examine energy "
+                    "efficient data centers embedded sensing platforms and the reliability of "
+                    "large cloud deployments under partial failures").split()
+        self.other = ("software engineering faculty study how teams design build and maintain "
+                      "complex software the group has a long history of work on software "
+                      "architecture program analysis testing and the human factors").split()
+
+    def test_key_roundtrip(self):
+        sig = signature(self.doc)
+        self.assertListEqual(list(from_key(to_key(sig))), list(sig))
+        self.assertEqual(to_key(signature(self.doc)), to_key(sig))
+
+    def test_find(self):
+        engine = MinhashEngine()
+        engine.index(engine.fingerprint(self.doc, None))
+
+        # the same sentence split in two and swapped
+        reordered = self.doc[20:] + self.doc[:20]
+        self.assertIsNotNone(engine.find(engine.fingerprint(reordered, None)))
+        self.assertIsNone(engine.find(engine.fingerprint(self.other, None)))
+
+    def test_engines(self):
+        self.assertIsInstance(get_engine("simhash"), SimhashEngine)
+        self.assertIsInstance(get_engine("MinHash"), MinhashEngine)
+        self.assertRaises(ValueError, get_engine, "unknown")
+
+        # engines only index their own fingerprints
+        engine = MinhashEngine()
+        key = engine.fingerprint(self.doc, None)
+        engine.index_all(["0" * 32, key])
+        self.assertEqual(engine.find(key), key)
+        self.assertFalse(SimhashEngine().owns(key))
+
+    def test_incomplete_engine(self):
+        # engines missing a method fail when they are constructed
+        class NoFind(SimilarityEngine):
+            name = "nofind"
+            def fingerprint(self, tokens, words): return ""
+            def owns(self, key): return True
+            def index(self, key): pass
+
+        self.assertRaises(TypeError, NoFind)
+        self.assertRaises(TypeError, SimilarityEngine)
+
+
+if __name__ == "__main__":
+    unittest.main()
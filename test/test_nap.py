@@ -0,0 +1,66 @@
+import os
+import tempfile
+import unittest
+import msgpack
+from crawler2.nap import Nap
+from crawler2.nurl import Nurl, NURL_STATUS_IS_DOWN
+from utils import get_urlhash, normalize
+
+
+def _write_nap(fname, data, exdict, smdict, tpdict, verstr=b"ver3"):
+    with open(fname, "wb") as fh:
+        for i, part in enumerate((data, exdict, smdict, tpdict)):
+            packed = msgpack.packb(part, use_bin_type=True)
+            fh.write(len(packed).to_bytes(4, "little"))
+            fh.write(packed)
+            if i == 0:
+                fh.write(verstr)
+
+
+class TestNap(unittest.TestCase):
+    def test_rekey(self):
+        # naps saved before canonicalization are keyed by the raw URLs
+        urls = [
+            "https://www.ics.uci.edu/about",
+            "https://WWW.ics.uci.edu/about/index.html",
+            "https://www.ics.uci.edu/about?utm_source=feed",
+            "https://www.ics.uci.edu/people",
+        ]
+        old = [get_urlhash(url) for url in urls]
+        dicts = [Nurl(url, urlhash).__dict__.copy() for url, urlhash in zip(urls, old)]
+        for dic in dicts:
+            dic["parent"] = old[3]
+        dicts[1]["status"] = NURL_STATUS_IS_DOWN
+        dicts[3]["links"] = old[:3]
+
+        with tempfile.TemporaryDirectory() as tmpdir:
+            fname = os.path.join(tmpdir, "old.nap")
+            _write_nap(fname, dict(zip(old, dicts)),
+                       {"ex": [old[1], 1, [old[2]]]}, {}, {})
+
+            nap = Nap(fname)
+            about = get_urlhash(normalize(urls[0]))
+            people = get_urlhash(normalize(urls[3]))
+            self.assertSetEqual(set(nap.dict), {about, people})
+            # the downloaded nurl wins the merge
+            self.assertEqual(nap[urls[0]].status, NURL_STATUS_IS_DOWN)
+            self.assertEqual(nap[urls[0]].parent, people)
+            self.assertEqual(nap.dict[about]["hash"], about)
+            self.assertListEqual(nap[urls[3]].links, [about])
+            self.assertListEqual(nap.exdict["ex"], [about, 1, [about]])
+            self.assertTrue(nap.close())
+
+            with open(fname, "rb") as fh:
+                size = int.from_bytes(fh.read(4), "little")
+                fh.seek(size, 1)
+                self.assertEqual(fh.read(4), b"ver4")
+
+            # ver4 naps are loaded as they are
+            nap = Nap(fname)
+            self.assertSetEqual(set(nap.dict), {about, people})
+            self.assertEqual(nap.writecnt, 0)
+            nap.close()
+
+
+if __name__ == "__main__":
+    unittest.main()
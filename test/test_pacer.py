@@ -0,0 +1,60 @@
+import time
+import unittest
+from types import SimpleNamespace
+
+from crawler2.pacer import HostPacer
+from crawler2.polmut import PoliteMutex
+
+
+class TestPacer(unittest.TestCase):
+    def test_latency(self):
+        pacer = HostPacer(0.5, 0.1, 2.0)
+        for _ in range(50):
+            pacer.observe(0.2, 200)
+        self.assertAlmostEqual(pacer.delay, 0.2)
+
+        # fast hosts are waited on for the floor, slow hosts for the ceiling
+        for _ in range(50):
+            pacer.observe(0.01, 200)
+        self.assertEqual(pacer.delay, 0.1)
+        for _ in range(50):
+            pacer.observe(10.0, 200)
+        self.assertEqual(pacer.delay, 2.0)
+
+    def test_errors(self):
+        healthy = HostPacer(0.5, 0.0, 10.0)
+        failing = HostPacer(0.5, 0.0, 10.0)
+        for i in range(50):
+            healthy.observe(0.2, 200)
+            failing.observe(0.2, 503 if i % 2 else 200)
+        self.assertGreater(failing.delay, 2 * healthy.delay)
+
+        stats = failing.stats()
+        self.assertEqual(stats["requests"], 50)
+        self.assertEqual(stats["errors"], 25)
+        self.assertEqual(stats["error_rate"], 0.5)
+        self.assertGreater(stats["throughput"], 0)
+
+    def test_crawl_delay(self):
+        config = SimpleNamespace(time_delay=0.5, politeness_floor=0.1, politeness_ceiling=1.0)
+        self.assertEqual(HostPacer.for_host(config).delay, 0.5)
+
+        # the crawl-delay is never undercut
+        pacer = HostPacer.for_host(config, crawl_delay=3.0)
+        self.assertEqual(pacer.delay, 3.0)
+        pacer.observe(0.01, 200)
+        self.assertEqual(pacer.delay, 3.0)
+
+    def test_polmut(self):
+        pacer = HostPacer(0.0, 0.0, 0.0)
+        pmut = PoliteMutex(10.0, pacer=pacer)
+        pmut.lock()
+        pmut.unlock()
+        start = time.perf_counter()
+        pmut.lock()
+        pmut.unlock()
+        self.assertLess(time.perf_counter() - start, 5.0)
+
+
+if __name__ == "__main__":
+    unittest.main()
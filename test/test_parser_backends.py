@@ -0,0 +1,54 @@
+import unittest
+import random
+from helpers.parser import parse_html_bs4, parse_html_lxml
+from test.fixtures import FIXTURE_BASE_URL, page_names, read_page
+
+class TestParserBackends(unittest.TestCase):
+    def assertSameParse(self, content, url):
+        bs4_links, bs4_text = parse_html_bs4(content, url)
+        lxml_links, lxml_text = parse_html_lxml(content, url)
+        self.assertDictEqual(lxml_links, bs4_links)
+        self.assertListEqual(lxml_text, bs4_text)
+
+    def test_fixtures(self):
+        # differential test over the fixture corpus
+        for name in page_names():
+            with self.subTest(page=name):
+                self.assertSameParse(read_page(name), FIXTURE_BASE_URL + name)
+
+    def test_random_markup(self):
+        # differential test over random (often malformed) markup
+        fragments = [
+            "<p>", "</p>", "<b>", "</b>", "<i>", "</i>", "<div>", "</div>",
+            "<script>x = 1 < 2;</script>", "<style>p {}</style>", "<template>", "</template>",
+            "<!-- note -->", "<br>", "<a href='/a'>", "<a href=\"b?x=1#f\">", "</a>",
+            "<td>", "<table>", "</table>", "&amp;", "&nbsp;", "&bogus;", " ", "\n",
+            "word", "другое", "語", "<title>t</title>", "<textarea>", "</textarea>",
+            "<!DOCTYPE html>", "<!doctype foo>",
+        ]
+        rng = random.Random(121)
+        for i in range(200):
+            content = "".join(rng.choice(fragments) for _ in range(40)).encode("utf-8")
+
+            with self.subTest(i=i, content=content):
+                self.assertSameParse(content, FIXTURE_BASE_URL + "random.html")
+
+    def test_doctype(self):
+        # lxml drops a doctype past the start, bs4 splits the text around it
+        for content in (
+            b"<!DOCTYPE html><p>a</p>",
+            b"  <!doctype html><p>a<!DOCTYPE html>b</p>",
+            b"word<!DOCTYPE html>tail<a href='/z'>z</a>",
+        ):
+            with self.subTest(content=content):
+                self.assertSameParse(content, FIXTURE_BASE_URL + "doctype.html")
+        self.assertListEqual(
+            parse_html_lxml(b"<p>a<!DOCTYPE html>b</p>", FIXTURE_BASE_URL)[1], ["a", "b"])
+
+    def test_empty(self):
+        self.assertSameParse(b"", FIXTURE_BASE_URL)
+        self.assertSameParse(b"   ", FIXTURE_BASE_URL)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,76 @@
+import random
+import re
+import unittest
+
+from test.fixtures import FIXTURE_BASE_URL, page_names, read_page
+from utils import get_urlhash
+from utils.resolver import UrlResolver, resolve_url
+
+
+BASES = [
+    "https://www.ics.uci.edu/a/b/page.html?x=1#top",
+    "http://WWW.ics.uci.edu:80",
+    "https://www.ics.uci.edu/a//b/./c/",
+    "https://www.ics.uci.edu/a;p/b;q?z=1",
+]
+
+HREF_PARTS = [
+    "a", "b", ".", "..", "/", "//", "?", "#", "q=1", "&", ";p", ":",
+    "http:", "https:", "HTTP://", "mailto:x", "\t", " ", "index.html",
+    "%20", "@", "~", "x.png", "utm_source=1", "",
+]
+
+
+class TestUrlResolver(unittest.TestCase):
+    def assertResolves(self, resolver, href):
+        url = resolve_url(resolver.base_url, href)
+        self.assertEqual(resolver.resolve(href), (url, get_urlhash(url)), repr(href))
+
+    def test_fast_paths(self):
+        r = UrlResolver("https://www.ics.uci.edu/a/b/page.html?x=1#top")
+        self.assertEqual(r.resolve("#team")[0], "https://www.ics.uci.edu/a/b/page.html?x=1")
+        self.assertEqual(r.resolve("")[0], "https://www.ics.uci.edu/a/b/page.html?x=1")
+        self.assertEqual(r.resolve("?y=2")[0], "https://www.ics.uci.edu/a/b/page.html?y=2")
+        self.assertEqual(r.resolve("/about/")[0], "https://www.ics.uci.edu/about")
+        self.assertEqual(r.resolve("c/index.html")[0], "https://www.ics.uci.edu/a/b/c")
+        self.assertEqual(r.resolve("//www.cs.uci.edu/x")[0], "https://www.cs.uci.edu/x")
+        self.assertEqual(r.resolve("http://www.stat.uci.edu/")[0], "http://www.stat.uci.edu")
+        self.assertEqual(r.resolve("../../c/./d")[0], "https://www.ics.uci.edu/c/d")
+        self.assertEqual(r.resolve("mailto:x@uci.edu")[0], "mailto:x@uci.edu")
+
+    def test_cached(self):
+        r = UrlResolver(FIXTURE_BASE_URL)
+        self.assertIs(r.resolve("a.html"), r.resolve("a.html"))
+        self.assertIsNone(r.resolve("http://[bad"))
+
+    def test_equivalence_random(self):
+        # resolved like urljoin + urldefrag + normalize (without fast paths)
+        rng = random.Random(40)
+        for base in BASES:
+            r = UrlResolver(base)
+            for _ in range(2000):
+                href = "".join(rng.choice(HREF_PARTS) for _ in range(rng.randint(0, 6)))
+                self.assertResolves(r, href)
+
+    def test_equivalence_params(self):
+        # hrefs with params (";") never take fast paths
+        rng = random.Random(48)
+        parts = HREF_PARTS + [";", "/;", ";;", "a;", "?;", "#;", ";=", "/a;b/"]
+        for base in BASES + ["https://www.ics.uci.edu/a/b.html", "https://www.ics.uci.edu/a;p/"]:
+            r = UrlResolver(base)
+            for _ in range(5000):
+                href = "".join(rng.choice(parts) for _ in range(rng.randint(1, 5)))
+                self.assertResolves(r, href)
+        r = UrlResolver("https://www.ics.uci.edu/a/b.html")
+        self.assertEqual(r.resolve(";")[0], "https://www.ics.uci.edu/a/b.html")
+        self.assertEqual(r.resolve("/;")[0], "https://www.ics.uci.edu")
+
+    def test_equivalence_fixtures(self):
+        for name in page_names():
+            r = UrlResolver(FIXTURE_BASE_URL + name)
+            for href in re.findall(rb'href="([^"]*)"', read_page(name)):
+                self.assertResolves(r, href.decode("utf-8"))
+
+
+if __name__ == "__main__":
+    unittest.main()
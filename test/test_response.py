@@ -0,0 +1,62 @@
+import datetime
+import pickle
+import unittest
+
+import requests
+
+from utils.response import RawResponse, Response, loads_raw_response
+
+
+def _requests_response(url, status=200, headers=None, content=b""):
+    # shaped like the responses pickled by the cache server
+    raw = requests.Response()
+    raw.url = url
+    raw.status_code = status
+    raw.reason = "OK"
+    raw._content = content
+    raw.headers.update(headers or {"Content-Type": "text/html"})
+    raw.request = requests.Request("GET", url, headers={"User-Agent": "IR_TEST"}).prepare()
+    raw.cookies.set("session", "abc", domain="example.com")
+    raw.elapsed = datetime.timedelta(milliseconds=120)
+    return raw
+
+
+class _Mock:
+    def __init__(self, content):
+        self.content = content
+
+
+class TestResponse(unittest.TestCase):
+    def test_loads(self):
+        url = "http://example.com/a"
+        raw = _requests_response(url, headers={"Content-Type": "text/html", "ETag": '"1"'}, content=b"<html></html>")
+        for protocol in range(pickle.HIGHEST_PROTOCOL + 1):
+            loaded = loads_raw_response(pickle.dumps(raw, protocol=protocol))
+            self.assertIsInstance(loaded, RawResponse)
+            self.assertEqual(loaded.url, url)
+            self.assertEqual(loaded.status_code, 200)
+            self.assertEqual(loaded.reason, "OK")
+            self.assertEqual(loaded.content, b"<html></html>")
+            self.assertEqual(loaded.headers.get("etag"), '"1"')
+            self.assertFalse(loaded.is_redirect)
+
+    def test_redirect(self):
+        raw = _requests_response("http://example.com/a", 301, {"Location": "/b"})
+        resp = Response({"url": raw.url, "status": 301, "response": pickle.dumps(raw)})
+        self.assertTrue(resp.raw_response.is_redirect)
+        self.assertEqual(resp.raw_response.headers["location"], "/b")
+        self.assertFalse(RawResponse(raw.url, 301).is_redirect)
+
+    def test_other_objects(self):
+        # objects other than requests.Response are loaded as is
+        resp = Response({"url": "http://example.com/", "status": 200, "response": pickle.dumps(_Mock(b"x"))})
+        self.assertIsInstance(resp.raw_response, _Mock)
+        self.assertEqual(resp.raw_response.content, b"x")
+
+    def test_content_is_not_copied(self):
+        body = b"x" * 1000
+        self.assertIs(RawResponse("http://example.com/", 200, content=body).content, body)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,78 @@
+import random
+import threading
+import unittest
+from types import SimpleNamespace
+
+from crawler2.nurl import Nurl
+from crawler2.polmut import PoliteMutex
+from crawler2.retry import RETRY_DELAY, RETRY_JITTER, RetryQueue, retry_delay
+from crawler2.workerpipe import PIPE_AGAIN, PIPE_OK, worker_get_resp
+from test.fixtures import FIXTURE_BASE_URL
+from utils import get_logger
+from utils.cache_server import CacheServer, DirectorySite
+
+
+class TestRetry(unittest.TestCase):
+    def test_delay(self):
+        rng = random.Random(0)
+        for retries in range(1, len(RETRY_DELAY) + 2):
+            base = RETRY_DELAY[min(retries, len(RETRY_DELAY)) - 1]
+            delays = [retry_delay(retries, rng) for _ in range(100)]
+            self.assertGreaterEqual(min(delays), base * (1 - RETRY_JITTER))
+            self.assertLessEqual(max(delays), base * (1 + RETRY_JITTER))
+            # jittered
+            self.assertGreater(len(set(delays)), 1)
+
+    def test_pop_due(self):
+        queue = RetryQueue(lambda nurl: None)
+        queue._thread = True # do not start the releasing thread
+        for name, delay in [("c", 30), ("a", 10), ("b", 20)]:
+            queue.push(Nurl(FIXTURE_BASE_URL + name), delay)
+        self.assertListEqual(queue.pop_due(0), [])
+        now = queue._heap[0][0]
+        self.assertListEqual([nurl.url[-1] for nurl in queue.pop_due(now + 15)], ["a", "b"])
+        self.assertEqual(len(queue), 1)
+
+    def test_release(self):
+        released = []
+        done = threading.Event()
+        def release(nurl):
+            released.append(nurl.url[-1])
+            if len(released) == 3:
+                done.set()
+
+        queue = RetryQueue(release)
+        for name, delay in [("c", 0.15), ("a", 0.05), ("b", 0.1)]:
+            queue.push(Nurl(FIXTURE_BASE_URL + name), delay)
+        self.assertTrue(done.wait(5))
+        self.assertListEqual(released, ["a", "b", "c"])
+
+    def test_get_resp(self):
+        # server errors are not retried in the worker thread
+        server = CacheServer(DirectorySite(), error_rate=1.0, error_statuses=(503,))
+        w = SimpleNamespace(
+            frontier=SimpleNamespace(dpolmut=PoliteMutex(0), batcher=None, record_download=lambda url, status: None,
+                cancel_probe=lambda url: None),
+            config=SimpleNamespace(cache_server=server.start(), user_agent="IR_TEST"),
+            logger=get_logger("test-retry", "worker"),
+        )
+        nurl = Nurl(FIXTURE_BASE_URL + "news.html")
+        try:
+            for retries in range(1, len(RETRY_DELAY) + 1):
+                ok, resp = worker_get_resp(w, nurl)
+                self.assertEqual(ok, PIPE_AGAIN)
+                self.assertEqual(resp.status, 503)
+                self.assertEqual(nurl.retries, retries)
+
+            # retries are kept across restarts, and are exhausted
+            nurl = Nurl.from_dict(nurl.__dict__)
+            ok, resp = worker_get_resp(w, nurl)
+            self.assertEqual(ok, PIPE_OK)
+            self.assertEqual(resp.status, 503)
+        finally:
+            server.stop()
+        self.assertEqual(server.requests, len(RETRY_DELAY) + 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,5 +1,5 @@
 import unittest
-from scraper import is_valid
+from scraper2 import is_valid
 
 class TestIsValid(unittest.TestCase):
     def test_valid(self):
@@ -0,0 +1,121 @@
+import gzip
+import unittest
+from types import SimpleNamespace
+
+import scraper2
+from crawler2.nurl import NURL_FINISH_LOWINFO_PRE, Nurl
+from crawler2.workerpipe import MAX_CONTENT_LEN, worker_filter_resp_pre
+from helpers.parser import PAGE_CACHE, is_sitemap_response, parse_response
+from utils import get_urlhash, normalize
+from helpers.sitemap import (
+    SITEMAP_INDEX, SITEMAP_URLSET, SitemapEntry,
+    iter_batches, iter_sitemap, sitemap_kind,
+)
+from test.fixtures import FIXTURE_BASE_URL, make_response, read_page
+
+
+XML_HEADERS = {"Content-Type": "application/xml"}
+GZIP_HEADERS = {"Content-Type": "application/x-gzip"}
+
+
+def _big_sitemap(amount):
+    urls = "".join(
+        f"<url><loc>https://www.ics.uci.edu/page/{i}</loc><priority>0.{i % 10}</priority></url>"
+        for i in range(amount)
+    )
+    return (
+        '<?xml version="1.0" encoding="UTF-8"?>'
+        f'<urlset xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">{urls}</urlset>'
+    ).encode("utf-8")
+
+
+class TestSitemap(unittest.TestCase):
+    def test_entries(self):
+        entries = list(iter_sitemap(read_page("sitemap.xml"), FIXTURE_BASE_URL))
+        self.assertListEqual(entries, [
+            SitemapEntry("https://www.ics.uci.edu/about/", "2024-09-30", 0.8, False),
+            SitemapEntry("https://www.ics.uci.edu/community/news/", "2024-10-14T09:30:00-07:00", 1.0, False),
+            SitemapEntry("https://www.ics.uci.edu/fixtures/research.html", None, None, False),
+            SitemapEntry("https://www.ics.uci.edu/files/handbook.pdf", None, None, False),
+            SitemapEntry("https://www.example.com/elsewhere", None, 0.9, False),
+        ])
+
+        entries = list(iter_sitemap(read_page("sitemap_index.xml"), FIXTURE_BASE_URL))
+        self.assertListEqual([(e.loc, e.index) for e in entries], [
+            ("https://www.ics.uci.edu/sitemap-pages.xml", True),
+            ("https://www.ics.uci.edu/sitemap-news.xml.gz", True),
+        ])
+
+    def test_kind(self):
+        self.assertEqual(sitemap_kind(read_page("sitemap.xml")), SITEMAP_URLSET)
+        self.assertEqual(sitemap_kind(read_page("sitemap_index.xml")), SITEMAP_INDEX)
+        self.assertEqual(sitemap_kind(gzip.compress(read_page("sitemap.xml"))), SITEMAP_URLSET)
+        self.assertIsNone(sitemap_kind(b"<?xml version='1.0'?><rss></rss>"))
+        self.assertIsNone(sitemap_kind(b"not xml"))
+        self.assertIsNone(sitemap_kind(b"\x1f\x8b not gzip"))
+
+    def test_gzip(self):
+        content = _big_sitemap(1200)
+        plain = list(iter_sitemap(content, FIXTURE_BASE_URL))
+        self.assertEqual(len(plain), 1200)
+        self.assertListEqual(list(iter_sitemap(gzip.compress(content), FIXTURE_BASE_URL)), plain)
+
+        # truncated documents yield the entries read so far
+        truncated = list(iter_sitemap(gzip.compress(content)[:2000], FIXTURE_BASE_URL))
+        self.assertListEqual(truncated, plain[:len(truncated)])
+
+    def test_limit(self):
+        entries = list(iter_sitemap(_big_sitemap(100), FIXTURE_BASE_URL, max_entries=10))
+        self.assertEqual(len(entries), 10)
+
+    def test_batches(self):
+        self.assertListEqual(list(iter_batches(range(7), 3)), [[0, 1, 2], [3, 4, 5], [6]])
+        self.assertListEqual(list(iter_batches([], 3)), [])
+
+    def test_scraper(self):
+        url = "https://www.ics.uci.edu/sitemap.xml.gz"
+        resp = make_response(url, gzip.compress(read_page("sitemap.xml")), headers=GZIP_HEADERS)
+        self.assertTrue(scraper2.is_sitemap(resp))
+        self.assertListEqual(list(scraper2.sitemap_batches(resp, size=2)), [
+            ["https://www.ics.uci.edu/community/news/", "https://www.ics.uci.edu/about/"],
+            ["https://www.ics.uci.edu/fixtures/research.html"],
+        ])
+
+        # sitemaps listed by an index are valid even if they are gzip compressed
+        resp = make_response(FIXTURE_BASE_URL + "sitemap_index.xml", read_page("sitemap_index.xml"), headers=XML_HEADERS)
+        self.assertListEqual(list(scraper2.sitemap_batches(resp)), [[
+            "https://www.ics.uci.edu/sitemap-pages.xml",
+            "https://www.ics.uci.edu/sitemap-news.xml.gz",
+        ]])
+
+        # gzip content that is not a sitemap
+        resp = make_response(FIXTURE_BASE_URL + "data.gz", gzip.compress(b"data"), headers=GZIP_HEADERS)
+        self.assertFalse(parse_response(resp).sitemap)
+
+    def test_filter_large(self):
+        w = SimpleNamespace(
+            frontier=SimpleNamespace(nap=SimpleNamespace(exdict=SimpleNamespace(claim=lambda h, u: True))),
+            logger=None,
+        )
+
+        # large pages are filtered without being parsed (nor cached)
+        url = FIXTURE_BASE_URL + "large.html"
+        resp = make_response(url, b"<html><p>" + b"word " * (MAX_CONTENT_LEN // 5) + b"</p></html>")
+        nurl = Nurl(url)
+        self.assertFalse(is_sitemap_response(resp))
+        self.assertFalse(worker_filter_resp_pre(w, nurl, resp))
+        self.assertEqual(nurl.finish, NURL_FINISH_LOWINFO_PRE)
+        self.assertNotIn(get_urlhash(normalize(url)), PAGE_CACHE)
+
+        # large sitemaps are allowed
+        url = FIXTURE_BASE_URL + "sitemap-large.xml"
+        content = _big_sitemap(20000)
+        self.assertGreater(len(content), MAX_CONTENT_LEN)
+        resp = make_response(url, content, headers=XML_HEADERS)
+        self.assertTrue(is_sitemap_response(resp))
+        self.assertTrue(worker_filter_resp_pre(w, Nurl(url), resp))
+        self.assertNotIn(get_urlhash(normalize(url)), PAGE_CACHE)
+
+
+if __name__ == "__main__":
+    unittest.main()
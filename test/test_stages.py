@@ -0,0 +1,61 @@
+import threading
+import time
+import unittest
+
+from crawler2.polmut import PoliteMutex
+from crawler2.stages import Histogram, StageStats, TimedLock
+
+
+class TestHistogram(unittest.TestCase):
+    def test_percentiles(self):
+        hist = Histogram()
+        for ms in range(1, 101):
+            hist.add(ms / 1e3)
+        stats = hist.stats()
+        self.assertEqual(stats["count"], 100)
+        self.assertAlmostEqual(stats["total"], 5.05)
+        self.assertAlmostEqual(stats["max"], 0.1)
+        # upper bounds of log-linear buckets (within 1/8 of a power of 2)
+        for q, exact in ((50, 0.05), (95, 0.095), (99, 0.099)):
+            self.assertGreaterEqual(stats[f"p{q}"], exact)
+            self.assertLessEqual(stats[f"p{q}"], exact * 1.125)
+
+    def test_small(self):
+        hist = Histogram()
+        self.assertEqual(hist.percentile(50), 0.0)
+        hist.add(0.0)
+        self.assertEqual(hist.percentile(99), 0.0)
+
+
+class TestStageStats(unittest.TestCase):
+    def test_lap(self):
+        stages = StageStats()
+        t = time.perf_counter()
+        t = stages.lap("a", t - 0.01)
+        stages.lap("b", t)
+        stats = stages.stats()
+        self.assertEqual(list(stats), ["a", "b"])
+        self.assertGreaterEqual(stats["a"]["max"], 0.01)
+        self.assertLess(stats["b"]["max"], 0.01)
+
+    def test_lock_waits(self):
+        stages = StageStats()
+        lock = TimedLock(threading.RLock(), stages.histogram("lock:nap"))
+        polmut = PoliteMutex(0.05, waits=stages.histogram("lock:pmut"))
+
+        with lock:
+            with lock:
+                pass
+        polmut.lock()
+        polmut.unlock()
+        polmut.lock() # waits for the politeness delay
+        polmut.unlock()
+
+        stats = stages.stats()
+        self.assertEqual(stats["lock:nap"]["count"], 2)
+        self.assertEqual(stats["lock:pmut"]["count"], 2)
+        self.assertGreaterEqual(stats["lock:pmut"]["max"], 0.04)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,6 +1,20 @@
+import random
 import unittest
 
-from helpers.tokenize import tokenize
+from helpers.tokenize import tokenize, tokenize_graphemes
+
+
+# graphemes that exercise the tokenizer rules
+# (alnum from several scripts, numerics, GROUP_SYMBOLS, repeat sequences,
+# other symbols, unicode whitespace, combining marks, case-changing graphemes)
+EQUIV_GRAPHEMES = list(
+    "abcxyzABCXYZ0129_-./~....,;:!?@#$%^&*()[]{}<>|\\'\"`+="
+    "ßİIıΣσςΑΒΓДЖЯжяハーロ日本語あ한국어١٢٣²½Ⅻ"
+    "\u0301\u0307\u200b\u200d\u00ad\u2019\u00a0\u2003\u3000"
+    "👋🏽\x00\x1f\x7f \t\n\r\x0b\x0c"
+)
+EQUIV_WORDS = ["the", "The", "can't", "it's", "you'll", "a.b", "a..b", "..", "-.-", "e.g.", "σς", "ΣΑΣ"]
+
 
 class TestTokenizer(unittest.TestCase):
     def test_graphemes(self):
@@ -51,5 +65,30 @@ groß pastry.,[]\r\n200 TEST Test TEsT._./~~~TeSt 『Fate/stay night』（フェ
         self.assertListEqual(tokens, expected_tokens)
 
 
+    def test_equivalence(self):
+        # tokenize should produce the same tokens as the
+        # reference implementation (tokenize_graphemes) on any text
+        rng = random.Random(33)
+        for _ in range(2000):
+            parts = []
+            for _ in range(rng.randint(0, 40)):
+                roll = rng.random()
+                if roll < 0.15:
+                    parts.append(rng.choice(EQUIV_WORDS))
+                elif roll < 0.25:
+                    parts.append(chr(rng.randint(0x20, 0x2FFFF)))
+                else:
+                    parts.append(rng.choice(EQUIV_GRAPHEMES))
+            text = "".join(parts)
+            self.assertListEqual(tokenize(text), tokenize_graphemes(text), repr(text))
+
+    def test_equivalence_fixtures(self):
+        from helpers.parser import parse_html_bs4
+        from test.fixtures import FIXTURE_BASE_URL, page_names, read_page
+        for name in page_names():
+            text = " ".join(parse_html_bs4(read_page(name), FIXTURE_BASE_URL + name)[1])
+            self.assertListEqual(tokenize(text), tokenize_graphemes(text), name)
+
+
 if __name__ == "__main__":
     unittest.main()
@@ -0,0 +1,81 @@
+import threading
+import unittest
+from types import SimpleNamespace
+from crawler2.frontier import Frontier
+from crawler2.nurl import *
+from crawler2.traps import *
+from crawler2.workerpipe import PIPE_BAD, PIPE_OK, worker_check_trap
+
+class TestTraps(unittest.TestCase):
+    def test_url_template(self):
+        self.assertEqual(
+            url_template("https://wics.ics.uci.edu/events/2024-10-01/?ical=1&tribe-bar-date=2024-10"),
+            "wics.ics.uci.edu/events/{n}-{n}-{n}?ical&tribe-bar-date")
+        self.assertEqual(
+            url_template("https://swiki.ics.uci.edu/doku.php?id=start&rev=1589&do=diff"),
+            "swiki.ics.uci.edu/doku.php?do&id&rev")
+        self.assertEqual(
+            url_template("https://www.ics.uci.edu/commit/3f2a9c1be07d4e55/files"),
+            "www.ics.uci.edu/commit/{id}/files")
+        self.assertEqual(
+            url_template("https://www.ics.uci.edu/about/people"),
+            "www.ics.uci.edu/about/people")
+
+    def _nurl(self, url, finish):
+        nurl = Nurl(url)
+        nurl.absdepth = 1
+        nurl.finish = finish
+        return nurl
+
+    def test_verdict(self):
+        detector = TrapDetector(dict())
+        for i in range(TRAP_MIN_SAMPLES):
+            detector.record(self._nurl(f"https://a.ics.uci.edu/cal/{i}", NURL_FINISH_TOO_SIMILAR))
+            detector.record(self._nurl(f"https://a.ics.uci.edu/page{i}", NURL_FINISH_OK))
+            detector.record(self._nurl(f"https://a.ics.uci.edu/wiki/{i}",
+                NURL_FINISH_LOWINFO_POST if i % 3 else NURL_FINISH_OK))
+
+            # ignored finish states
+            detector.record(self._nurl(f"https://a.ics.uci.edu/page{i}", NURL_FINISH_NOT_ALLOWED))
+
+        self.assertEqual(detector.verdict(self._nurl("https://a.ics.uci.edu/cal/99", 0)), TRAP_DROP)
+        self.assertEqual(detector.verdict(self._nurl("https://a.ics.uci.edu/page99", 0)), TRAP_OK)
+
+        # demoted only once
+        wiki = self._nurl("https://a.ics.uci.edu/wiki/99", 0)
+        self.assertEqual(detector.verdict(wiki), TRAP_DEMOTE)
+        self.assertEqual(detector.verdict(wiki), TRAP_OK)
+
+        # seeds are never judged
+        seed = self._nurl("https://a.ics.uci.edu/cal/99", 0)
+        seed.absdepth = 0
+        self.assertEqual(detector.verdict(seed), TRAP_OK)
+
+    def test_recrawl(self):
+        detector = TrapDetector(dict())
+        for i in range(TRAP_MIN_SAMPLES):
+            detector.record(self._nurl(f"https://a.ics.uci.edu/cal/{i}", NURL_FINISH_TOO_SIMILAR))
+        w = SimpleNamespace(frontier=SimpleNamespace(traps=detector))
+        self.assertEqual(worker_check_trap(w, self._nurl("https://a.ics.uci.edu/cal/99", 0)), PIPE_BAD)
+
+        # downloaded nurls (recrawls) are revalidated, not judged again
+        nurl = self._nurl("https://a.ics.uci.edu/cal/0", NURL_FINISH_TOO_SIMILAR)
+        nurl.exhash = "0" * 16
+        self.assertEqual(worker_check_trap(w, nurl), PIPE_OK)
+
+        # a not-modified revalidation is not recorded again
+        frontier = SimpleNamespace(nap=_Nap(), traps=detector)
+        Frontier.mark_nurl_complete(frontier, nurl, record=False)
+        self.assertEqual(detector.stats["a.ics.uci.edu/cal/{n}"][TRAP_FETCHED], TRAP_MIN_SAMPLES)
+        Frontier.mark_nurl_complete(frontier, nurl)
+        self.assertEqual(detector.stats["a.ics.uci.edu/cal/{n}"][TRAP_FETCHED], TRAP_MIN_SAMPLES + 1)
+
+
+class _Nap(dict):
+    """Nap stand-in for Frontier.mark_nurl_complete."""
+    def __init__(self):
+        self.mutex = threading.RLock()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,49 @@
+import unittest
+
+from utils.urlfilter import UrlFilter
+
+
+class TestUrlFilter(unittest.TestCase):
+    def test_domains(self):
+        f = UrlFilter([".ics.uci.edu", "stat.uci.edu"])
+        self.assertTrue(f.is_valid("https://www.ics.uci.edu/"))
+        self.assertTrue(f.is_valid("https://a.b.ics.uci.edu/"))
+        self.assertTrue(f.is_valid("https://WWW.ICS.UCI.EDU:8080/"))
+        self.assertTrue(f.is_valid("https://user@vision.ics.uci.edu/"))
+        self.assertFalse(f.is_valid("https://ics.uci.edu/")) # subdomains only
+        self.assertTrue(f.is_valid("https://stat.uci.edu/")) # domain and subdomains
+        self.assertTrue(f.is_valid("https://www.stat.uci.edu/"))
+        self.assertFalse(f.is_valid("https://www.cs.uci.edu/"))
+        self.assertFalse(f.is_valid("https://www.ics.uci.edu.evil.com/"))
+        self.assertFalse(f.is_valid("https://xics.uci.edu/"))
+        self.assertTrue(f.is_valid("https://www.cs.uci.edu/", strict=False))
+
+    def test_extensions(self):
+        f = UrlFilter()
+        self.assertFalse(f.is_valid("https://www.ics.uci.edu/a.PDF"))
+        self.assertFalse(f.is_valid("https://www.ics.uci.edu/a.tar.gz"))
+        self.assertFalse(f.is_valid("https://www.ics.uci.edu/a.pdf;jsessionid=1"))
+        self.assertTrue(f.is_valid("https://www.ics.uci.edu/a.pdf/view"))
+        self.assertTrue(f.is_valid("https://www.ics.uci.edu/view?file=a.pdf"))
+        self.assertTrue(f.is_valid("https://www.ics.uci.edu/a.pdfx"))
+
+    def test_invalid(self):
+        f = UrlFilter()
+        self.assertFalse(f.is_valid("mailto:someone@ics.uci.edu"))
+        self.assertFalse(f.is_valid("http://[::1/"))
+
+    def test_filter(self):
+        f = UrlFilter.from_option(".ics.uci.edu, .cs.uci.edu")
+        urls = [
+            "https://www.ics.uci.edu/a",
+            "https://www.ics.uci.edu/a.png",
+            "https://www.example.com/",
+            "https://www.cs.uci.edu/b",
+        ]
+        self.assertListEqual(f.filter(urls), [urls[0], urls[3]])
+        self.assertListEqual(f.filter(urls, strict=False), [urls[0], urls[2], urls[3]])
+        self.assertListEqual(UrlFilter.from_option(None).domains, UrlFilter().domains)
+
+
+if __name__ == "__main__":
+    unittest.main()
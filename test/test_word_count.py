@@ -0,0 +1,47 @@
+import unittest
+
+from helpers.parser import parse_html_bs4
+from helpers.simengine import get_engine
+from helpers.simhash import SimhashAccumulator, simhash
+from helpers.word_count import count_tokens, iter_tokens, to_tokens, word_count
+from test.fixtures import FIXTURE_BASE_URL, page_names, read_page
+
+
+def _text_content(name):
+    return parse_html_bs4(read_page(name), FIXTURE_BASE_URL + name)[1]
+
+
+class TestWordCount(unittest.TestCase):
+    def test_stream(self):
+        # streaming should count the same words and feed the
+        # same tokens (in document order) as the list-based pipeline
+        for name in page_names():
+            text_content = _text_content(name)
+            tokens = to_tokens(text_content)
+
+            sink = get_engine("minhash").accumulator()
+            self.assertDictEqual(count_tokens(text_content, sink), word_count(tokens), name)
+            self.assertListEqual(sink.tokens, tokens, name)
+            self.assertListEqual(list(iter_tokens(text_content)), tokens, name)
+
+    def test_simhash_accumulator(self):
+        for name in page_names():
+            text_content = _text_content(name)
+            words = word_count(to_tokens(text_content))
+
+            # the fingerprint is folded from the streamed tokens
+            sink = get_engine("simhash").accumulator()
+            count_tokens(text_content, sink)
+            self.assertEqual(sink.total, sum(words.values()), name)
+            self.assertEqual(sink.fingerprint(None), simhash(words), name)
+
+            acc = SimhashAccumulator()
+            for word, cnt in words.items():
+                acc.add(word, cnt)
+            self.assertEqual(acc.fingerprint(), simhash(words), name)
+
+        self.assertEqual(SimhashAccumulator().fingerprint(), simhash(dict()))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -2,6 +2,7 @@ import os
 import logging
 from hashlib import sha256
 from urllib.parse import urlparse
+from utils.canonical import canonicalize
 
 def get_logger(name, filename=None):
     logger = logging.getLogger(name)
@@ -30,6 +31,5 @@ def get_urlhash(url):
         f"{parsed.query}/{parsed.fragment}".encode("utf-8")).hexdigest()
 
 def normalize(url):
-    if url.endswith("/"):
-        return url.rstrip("/")
-    return url
+    # see utils/canonical.py for the canonicalization rules
+    return canonicalize(url)
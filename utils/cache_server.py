@@ -0,0 +1,421 @@
+# utils/cache_server.py
+#
+# local stand-in for the spacetime cache server
+# used by launch.py / launchman.py (--local_cache) and by benchmarks
+#
+# implements the same protocol as the remote cache server
+# (see utils/download.py):
+#   -   GET /?q=<url>&u=<user agent>
+#   -   the body is a CBOR map of {"url", "status", "response"} where
+#       "response" is a pickled requests.Response
+#   -   cache server errors (600-606) have {"url", "status", "error"}
+#
+# and a batch extension (not supported by the remote cache server,
+# see utils.download.download_batch):
+#   -   GET /batch?q=<url>&q=<url>...&u=<user agent>
+#   -   the body is a sequence of the CBOR maps above, one per URL,
+#       streamed in the order the URLs complete (the connection is closed
+#       after the last one)
+#
+# pages are served from a site:
+#   -   DirectorySite serves the files of a directory (e.g. the fixture corpus)
+#   -   SyntheticSite generates a deterministic site of linked pages
+# unknown URLs are served as 404s (like the origin server would)
+#
+# latency (a fixed delay plus uniform jitter) and errors (cache server
+# errors 600-606 and origin 5xx) are injected per request
+#
+# usage: python -m utils.cache_server [--source fixtures|synthetic|<dir>] [--port N] ...
+
+from argparse import ArgumentParser
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from threading import Lock, Thread
+from urllib.parse import parse_qs, urlsplit
+import mimetypes
+import os
+import pickle
+import random
+import time
+import cbor
+import requests
+
+
+FIXTURES_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "test", "fixtures", "pages")
+FIXTURES_BASE_URL = "https://www.ics.uci.edu/fixtures/"
+SYNTHETIC_BASE_URL = "https://www.synthetic.ics.uci.edu/"
+
+# injected error statuses
+CACHE_ERROR_STATUSES = tuple(range(600, 606+1))
+SERVER_ERROR_STATUSES = (500, 502, 503, 504)
+
+# syllables of the words of synthetic pages
+SYNTHETIC_SYLLABLES = (
+    "ba be bi bo bu da de di do du ka ke ki ko ku la le li lo lu "
+    "ma me mi mo mu na ne ni no nu ra re ri ro ru sa se si so su "
+    "ta te ti to tu va ve vi vo vu"
+).split()
+
+# words of the vocabulary of synthetic sites / words of the topic of a page
+SYNTHETIC_VOCABULARY = 20000
+SYNTHETIC_TOPIC = 400
+
+
+def _raw_response(url, status, headers, content):
+    """Returns a requests.Response (the object pickled by the cache server)."""
+    raw = requests.Response()
+    raw.url = url
+    raw.status_code = status
+    raw._content = content
+    raw.headers.update(headers)
+    return raw
+
+
+def cache_response(url, status, headers=None, content=b""):
+    """Returns the CBOR body of a cache server response.
+
+    :param url str: The requested URL
+    :param status int: The status (600-606 are cache server errors)
+    :param headers dict[str, str]: The headers of the origin response
+    :param content bytes: The body of the origin response
+    :rtype: bytes
+    """
+    if status in CACHE_ERROR_STATUSES:
+        return cbor.dumps({
+            "url": url,
+            "status": status,
+            "error": f"Cache server error {status} (emulated)",
+        })
+    raw = _raw_response(url, status, headers or dict(), content)
+    return cbor.dumps({
+        "url": url,
+        "status": status,
+        "response": pickle.dumps(raw),
+    })
+
+
+class DirectorySite:
+    """Serves the files of a directory under a base URL.
+
+    pages_dir   The directory
+    base_url    The URL of the directory (ends with "/")
+
+    """
+    def __init__(self, pages_dir=FIXTURES_DIR, base_url=FIXTURES_BASE_URL):
+        self.pages_dir = pages_dir
+        self.base_url = base_url
+        self.names = sorted(
+            name for name in os.listdir(pages_dir)
+            if os.path.isfile(os.path.join(pages_dir, name))
+        )
+
+
+    def seed_urls(self):
+        """Returns the URLs of the pages.
+
+        :rtype: list[str]
+        """
+        return [self.base_url + name for name in self.names]
+
+
+    def get(self, url):
+        """Returns the origin response of the URL.
+
+        :param url str: The URL
+        :return: The status, the headers and the body
+        :rtype: (int, dict[str, str], bytes)
+        """
+        name = url[len(self.base_url):] if url.startswith(self.base_url) else None
+        if name not in self.names:
+            return 404, {"Content-Type": "text/html"}, b""
+        with open(os.path.join(self.pages_dir, name), "rb") as fh:
+            content = fh.read()
+        content_type = mimetypes.guess_type(name)[0] or "application/octet-stream"
+        return 200, {"Content-Type": content_type}, content
+
+
+class SyntheticSite:
+    """Generates a deterministic site of linked pages.
+    Page n is at <base_url>page/<n> and links to `links` other pages.
+
+    base_url    The URL of the site (ends with "/")
+    pages       Amount of pages
+    links       Amount of links per page
+    words       Amount of words per page
+    seed        Seed of the generator
+
+    """
+    def __init__(self, base_url=SYNTHETIC_BASE_URL, pages=1000, links=20, words=300, seed=0):
+        self.base_url = base_url
+        self.pages = pages
+        self.links = links
+        self.words = words
+        self.seed = seed
+
+        rng = random.Random(seed)
+        self.vocabulary = [
+            "".join(rng.choice(SYNTHETIC_SYLLABLES) for _ in range(rng.randint(2, 4)))
+            for _ in range(SYNTHETIC_VOCABULARY)
+        ]
+
+
+    def seed_urls(self):
+        """Returns the URL of the first page.
+
+        :rtype: list[str]
+        """
+        return [f"{self.base_url}page/0"]
+
+
+    def page(self, n):
+        """Returns the HTML of page n.
+        The words of each page are drawn from its own topic
+        (a slice of the vocabulary), so pages are not near-duplicates.
+
+        :param n int: The page number
+        :rtype: bytes
+        """
+        rng = random.Random(self.seed * 1000003 + n)
+        start = rng.randrange(len(self.vocabulary) - SYNTHETIC_TOPIC)
+        topic = self.vocabulary[start:start + SYNTHETIC_TOPIC]
+        words = " ".join(rng.choice(topic) for _ in range(self.words))
+        links = "".join(
+            f'<li><a href="/page/{rng.randrange(self.pages)}">{rng.choice(topic)}</a></li>'
+            for _ in range(self.links)
+        )
+        return (
+            f"<html><head><title>{topic[0]} {n}</title></head><body>"
+            f"<h1>{topic[0]}</h1><p>{words}</p><ul>{links}</ul>"
+            f"</body></html>"
+        ).encode("utf-8")
+
+
+    def get(self, url):
+        """Returns the origin response of the URL (see DirectorySite.get)."""
+        prefix = self.base_url + "page/"
+        n = url[len(prefix):] if url.startswith(prefix) else ""
+        if not n.isdigit() or int(n) >= self.pages:
+            return 404, {"Content-Type": "text/html"}, b""
+        return 200, {"Content-Type": "text/html; charset=utf-8"}, self.page(int(n))
+
+
+class _Handler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        parts = urlsplit(self.path)
+        params = parse_qs(parts.query)
+        if "q" not in params:
+            self.send_error(400, "missing q")
+            return
+        if parts.path == "/batch":
+            self._batch(params["q"], params.get("u", [""])[0])
+            return
+        body = self.server.emulator.respond(params["q"][0], params.get("u", [""])[0])
+        self.send_response(200)
+        self.send_header("Content-Type", "application/cbor")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        try:
+            self.wfile.write(body)
+        except (BrokenPipeError, ConnectionResetError):
+            pass
+
+    def _batch(self, urls, user_agent):
+        """Streams the responses of the URLs as they complete."""
+        self.send_response(200)
+        self.send_header("Content-Type", "application/cbor-seq")
+        self.send_header("Connection", "close")
+        self.end_headers()
+        self.close_connection = True
+
+        emulator = self.server.emulator
+        with emulator._mutex:
+            emulator.batches += 1
+        with ThreadPoolExecutor(len(urls)) as executor:
+            futures = [executor.submit(emulator.respond, url, user_agent) for url in urls]
+            try:
+                for future in as_completed(futures):
+                    self.wfile.write(future.result())
+                    self.wfile.flush()
+            except (BrokenPipeError, ConnectionResetError):
+                pass
+
+    def log_message(self, *args):
+        pass
+
+
+class CacheServer:
+    """Local cache server emulator (see the protocol above).
+
+    site            The site (DirectorySite or SyntheticSite)
+    latency         Seconds added to every request
+    jitter          Maximum seconds of uniform jitter added to the latency
+    error_rate      Probability that a request fails with one of error_statuses
+    error_statuses  Statuses of injected errors
+    requests        Amount of requests served (URLs of batches included)
+    statuses        Amount of requests served by status
+    batches         Amount of batch requests served
+
+    """
+    def __init__(self, site, host="127.0.0.1", port=0, latency=0.0, jitter=0.0,
+                 error_rate=0.0, error_statuses=CACHE_ERROR_STATUSES + SERVER_ERROR_STATUSES, seed=None):
+        self.site = site
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.error_statuses = tuple(error_statuses)
+        self.requests = 0
+        self.statuses = dict()
+        self.batches = 0
+
+        self._rng = random.Random(seed)
+        self._mutex = Lock()
+        self._server = ThreadingHTTPServer((host, port), _Handler)
+        self._server.daemon_threads = True
+        self._server.emulator = self
+        self._thread = None
+
+
+    @classmethod
+    def from_options(cls, options):
+        """Creates a cache server from the [LOCAL CACHE] options of config.ini.
+
+            SOURCE = fixtures | synthetic | <directory>
+            BASE_URL = https://...
+            PAGES = 1000
+            LINKS = 20
+            HOST = 127.0.0.1
+            PORT = 0
+            LATENCY = 0.0
+            JITTER = 0.0
+            ERROR_RATE = 0.0
+            SEED = 0
+
+        Missing options use the defaults.
+
+        :param options dict[str, str]: The options (keys are case-insensitive)
+        :rtype: CacheServer
+        """
+        options = {k.strip().lower(): v.strip() for k, v in options.items()}
+        source = options.get("source", "fixtures")
+        seed = int(options.get("seed", "0"))
+
+        if source == "synthetic":
+            site = SyntheticSite(
+                options.get("base_url", SYNTHETIC_BASE_URL),
+                pages=int(options.get("pages", "1000")),
+                links=int(options.get("links", "20")),
+                seed=seed,
+            )
+        elif source == "fixtures":
+            site = DirectorySite(FIXTURES_DIR, options.get("base_url", FIXTURES_BASE_URL))
+        else:
+            site = DirectorySite(source, options.get("base_url", FIXTURES_BASE_URL))
+
+        return cls(
+            site,
+            host=options.get("host", "127.0.0.1"),
+            port=int(options.get("port", "0")),
+            latency=float(options.get("latency", "0")),
+            jitter=float(options.get("jitter", "0")),
+            error_rate=float(options.get("error_rate", "0")),
+            seed=seed,
+        )
+
+
+    @property
+    def address(self):
+        """The (host, port) of the server (the value of config.cache_server)."""
+        return self._server.server_address[:2]
+
+
+    def respond(self, url, user_agent=""):
+        """Returns the CBOR body of the response to the URL.
+        Latency and errors are injected here.
+
+        :param url str: The requested URL
+        :param user_agent str: The user agent of the crawler
+        :rtype: bytes
+        """
+        with self._mutex:
+            delay = self.latency + (self._rng.uniform(0, self.jitter) if self.jitter else 0.0)
+            error = None
+            if self.error_rate and self._rng.random() < self.error_rate:
+                error = self._rng.choice(self.error_statuses)
+
+        if delay:
+            time.sleep(delay)
+
+        if error is not None:
+            status, headers, content = error, {"Content-Type": "text/html"}, b""
+        else:
+            status, headers, content = self.site.get(url)
+
+        with self._mutex:
+            self.requests += 1
+            self.statuses[status] = self.statuses.get(status, 0) + 1
+        return cache_response(url, status, headers, content)
+
+
+    def start(self):
+        """Serves requests in a daemon thread.
+
+        :return: The (host, port) of the server
+        :rtype: (str, int)
+        """
+        self._thread = Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self.address
+
+
+    def stop(self):
+        """Stops serving requests."""
+        self._server.shutdown()
+        self._server.server_close()
+        if self._thread:
+            self._thread.join()
+
+
+def start_local_cache_server(config):
+    """Registration shim: starts a local cache server instead of
+    registering with the remote one (see utils/server_registration.py).
+
+    The seed URLs are replaced by the seed URLs of the site, since
+    the local cache server only serves the pages of its site.
+
+    :param config Config: The config (uses config.local_cache)
+    :return: The (host, port) of the local cache server (config.cache_server)
+    :rtype: (str, int)
+    """
+    server = CacheServer.from_options(config.local_cache)
+    config.seed_urls = server.site.seed_urls()
+    return server.start()
+
+
+def main():
+    parser = ArgumentParser()
+    parser.add_argument("--source", type=str, default="fixtures")
+    parser.add_argument("--base_url", type=str, default=None)
+    parser.add_argument("--pages", type=int, default=1000)
+    parser.add_argument("--links", type=int, default=20)
+    parser.add_argument("--host", type=str, default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=9000)
+    parser.add_argument("--latency", type=float, default=0.0)
+    parser.add_argument("--jitter", type=float, default=0.0)
+    parser.add_argument("--error_rate", type=float, default=0.0)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    options = {k: str(v) for k, v in vars(args).items() if v is not None}
+    server = CacheServer.from_options(options)
+    host, port = server.address
+    print(f"serving {len(server.site.seed_urls())} seed URLs on {host}:{port}")
+    try:
+        server._server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server._server.server_close()
+
+
+if __name__ == "__main__":
+    main()
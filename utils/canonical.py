@@ -0,0 +1,179 @@
+# utils/canonical.py
+#
+# rule-based URL canonicalization
+# used by utils.normalize (and therefore by Nurl, Nap and the parser)
+#
+# equivalent URLs should have the same canonical form so that they
+# hash the same and are only fetched once
+#
+# the pipeline (in order):
+#   -   lowercase scheme and host, drop default ports
+#   -   drop path parameters for sessions (e.g. ";jsessionid=...")
+#   -   drop tracking/session query parameters (global and per-host rules)
+#   -   sort the remaining query parameters
+#   -   drop directory index files (e.g. "/index.html") if there is no query
+#   -   strip trailing slashes from the path
+#   -   drop the fragment
+#
+# query parameters are compared and sorted as raw strings and are never
+# re-encoded, so canonical URLs are still fetchable
+
+from fnmatch import fnmatch, translate
+from urllib.parse import urlsplit, urlunsplit
+import re
+
+
+DEFAULT_DROP_PARAMS = [
+    "utm_*", "fbclid", "gclid", "msclkid", "mc_cid", "mc_eid",
+    "sid", "sessionid", "session_id", "phpsessid", "jsessionid", "aspsessionid*",
+]
+
+DEFAULT_INDEX_FILES = [
+    "index.html", "index.htm", "index.php", "default.htm", "default.html",
+]
+
+DEFAULT_PORTS = {"http": 80, "https": 443}
+
+_PATH_SESSION_RE = re.compile(r";(jsessionid|phpsessid|sid)=[^/?#]*", re.IGNORECASE)
+
+
+def _compile_params(patterns):
+    """Compiles glob patterns of query parameter names as one regex.
+    Returns None if there are no patterns.
+    """
+    patterns = [p.strip().lower() for p in patterns if p.strip()]
+    if not patterns:
+        return None
+    return re.compile("|".join(translate(p) for p in patterns))
+
+
+class Canonicalizer:
+    """URL canonicalization pipeline.
+
+    drop_params     Glob patterns of query parameters dropped for all hosts
+    index_files     Directory index file names dropped from paths
+    host_rules      Pairs of (host glob, drop_params) applied to matching hosts
+
+    Rules for each host are compiled once and cached.
+
+    """
+    def __init__(self, drop_params=None, index_files=None, host_rules=None):
+        self.drop_params = list(DEFAULT_DROP_PARAMS if drop_params is None else drop_params)
+        self.index_files = {f.strip().lower() for f in (DEFAULT_INDEX_FILES if index_files is None else index_files) if f.strip()}
+        self.host_rules = list(host_rules or [])
+        self._host_cache = dict()
+
+
+    @classmethod
+    def from_options(cls, options):
+        """Creates a canonicalizer from the [CANONICAL] options of config.ini.
+
+            DROP_PARAMS = utm_*,sid,...
+            INDEX_FILES = index.html,...
+            DROP_PARAMS.<host glob> = share,...
+
+        Missing options use the defaults.
+
+        :param options dict[str, str]: The options (keys are case-insensitive)
+        :rtype: Canonicalizer
+        """
+        drop_params = None
+        index_files = None
+        host_rules = []
+        for key, value in options.items():
+            key = key.strip().lower()
+            values = value.split(",")
+            if key == "drop_params":
+                drop_params = values
+            elif key == "index_files":
+                index_files = values
+            elif key.startswith("drop_params."):
+                host_rules.append((key[len("drop_params."):], values))
+        return cls(drop_params, index_files, host_rules)
+
+
+    def _host_rule(self, host):
+        """Returns the compiled query parameter rule for the host (cached)."""
+        rule = self._host_cache.get(host, False)
+        if rule is False:
+            patterns = list(self.drop_params)
+            for host_glob, params in self.host_rules:
+                if fnmatch(host, host_glob):
+                    patterns.extend(params)
+            rule = _compile_params(patterns)
+            self._host_cache[host] = rule
+        return rule
+
+
+    def canonicalize(self, url):
+        """Returns the canonical form of the URL.
+
+        :param url str: The URL
+        :return: The canonical URL
+        :rtype: str
+        """
+        try:
+            parts = urlsplit(url)
+        except ValueError:
+            return url.rstrip("/")
+
+        scheme = parts.scheme.lower()
+
+        # non-hierarchical URLs (mailto:, javascript:, ...) are kept as is
+        if scheme not in DEFAULT_PORTS:
+            return url.rstrip("/")
+
+        # lowercase host, drop default port (userinfo is kept as is)
+        netloc = parts.netloc
+        userinfo, _, hostport = netloc.rpartition("@")
+        host, sep, port = hostport.rpartition(":")
+        if not sep or "]" in port:
+            host, port = hostport, ""
+        host = host.lower()
+        if port and port.isdigit() and int(port) == DEFAULT_PORTS[scheme]:
+            port = ""
+        netloc = (f"{userinfo}@" if userinfo else "") + host + (f":{port}" if port else "")
+
+        # drop tracking/session parameters, then sort the rest
+        query = parts.query
+        if query:
+            rule = self._host_rule(host)
+            params = [p for p in query.split("&") if p]
+            if rule:
+                params = [p for p in params if not rule.fullmatch(p.partition("=")[0].lower())]
+            query = "&".join(sorted(params))
+
+        # drop session path parameters, trailing slashes and index files
+        # (scripts might depend on the query, so only if there is none)
+        # slashes are stripped first and again after each index file,
+        # so that the canonical form is canonical too ("a/index.html/")
+        path = parts.path
+        if ";" in path:
+            path = _PATH_SESSION_RE.sub("", path)
+        path = path.rstrip("/")
+        while not query:
+            head, _, tail = path.rpartition("/")
+            if tail.lower() not in self.index_files:
+                break
+            path = head.rstrip("/")
+
+        return urlunsplit((scheme, netloc, path, query, ""))
+
+
+# the canonicalizer used by utils.normalize
+# replaced by configure(...) when the crawler starts
+CANONICALIZER = Canonicalizer()
+
+
+def configure(options):
+    """Replaces the canonicalizer used by utils.normalize.
+
+    :param options dict[str, str]: The [CANONICAL] options of config.ini
+    """
+    global CANONICALIZER
+    CANONICALIZER = Canonicalizer.from_options(options)
+
+
+def canonicalize(url):
+    """Returns the canonical form of the URL (see Canonicalizer)."""
+    return CANONICALIZER.canonicalize(url)
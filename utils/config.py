@@ -9,11 +9,24 @@ class Config(object):
         assert re.match(r"^[a-zA-Z0-9_ ,]+$", self.user_agent), "User agent should not have any special characters outside '_', ',' and 'space'"
         self.threads_count = int(config["LOCAL PROPERTIES"]["THREADCOUNT"])
         self.save_file = config["LOCAL PROPERTIES"]["SAVE"]
+        self.dup_log = config["LOCAL PROPERTIES"].getboolean("DUPLOG", False)
 
         self.host = config["CONNECTION"]["HOST"]
         self.port = int(config["CONNECTION"]["PORT"])
+        self.batch_size = int(config["CONNECTION"].get("BATCH", "1"))
 
         self.seed_urls = config["CRAWLER"]["SEEDURL"].split(",")
         self.time_delay = float(config["CRAWLER"]["POLITENESS"])
+        self.politeness_floor = float(config["CRAWLER"].get("POLITENESS_FLOOR", self.time_delay))
+        self.politeness_ceiling = float(config["CRAWLER"].get("POLITENESS_CEILING", self.time_delay))
+        self.sim_engine = config["CRAWLER"].get("SIMENGINE", "simhash")
+        self.html_backend = config["CRAWLER"].get("PARSER", "lxml")
+        self.domains = config["CRAWLER"].get("DOMAINS", None)
+        self.canonical = dict(config["CANONICAL"]) if config.has_section("CANONICAL") else dict()
+        self.local_cache = dict(config["LOCAL CACHE"]) if config.has_section("LOCAL CACHE") else dict()
+        self.archive = dict(config["ARCHIVE"]) if config.has_section("ARCHIVE") else dict()
 
-        self.cache_server = None
\ No newline at end of file
+        self.cache_server = None
+
+        # set by --recrawl (revalidates downloaded nurls of the save file)
+        self.recrawl = False
\ No newline at end of file
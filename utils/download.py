@@ -19,3 +19,36 @@ def download(url, config, logger=None):
         "error": f"Spacetime Response error {resp} with url {url}.",
         "status": resp.status_code,
         "url": url})
+
+
+def download_batch(urls, config, logger=None):
+    """Fetches the responses of several URLs from the cache server node
+    in one request (see the batch extension in utils/cache_server.py).
+    Yields (url, Response) in the order the URLs complete.
+
+    URLs the node did not answer (e.g. it does not support batches)
+    are downloaded one by one.
+    """
+    host, port = config.cache_server
+    pending = set(urls)
+    resp = requests.get(
+        f"http://{host}:{port}/batch",
+        params=[("q", f"{url}") for url in pending] + [("u", f"{config.user_agent}")],
+        stream=True)
+    try:
+        while resp.status_code == 200 and pending:
+            try:
+                resp_dict = cbor.load(resp.raw)
+            except (EOFError, ValueError):
+                break
+            url = resp_dict.get("url", None)
+            if url in pending:
+                pending.discard(url)
+                yield url, Response(resp_dict)
+    finally:
+        resp.close()
+
+    for url in urls:
+        if url in pending:
+            pending.discard(url)
+            yield url, download(url, config, logger)
@@ -0,0 +1,172 @@
+# utils/resolver.py
+#
+# per-page URL resolver for link extraction
+# used by the HTML backends of helpers/parser.py
+#
+# every href of a page is resolved against the same base URL, so the
+# base URL is parsed once per page and common hrefs take fast paths
+# that skip urljoin / urldefrag:
+#   -   "" and "#fragment" resolve to the base URL itself
+#   -   "http://..." / "https://..." / "//host/..." are already absolute
+#   -   "/path" (no dot segments) is appended to the origin of the base URL
+#   -   "path" (no dot segments or empty segments) is appended to the
+#       directory of the base URL
+#   -   "?query" replaces the query of the base URL
+# anything else (dot segments, other schemes, params, ...) goes through urljoin
+# hrefs with ";" always do: urljoin splits params off the last segment
+# (e.g. ";" resolves to the base URL itself, "/;" to the origin)
+#
+# every resolved URL is canonicalized (utils.normalize) and hashed
+# (utils.get_urlhash) exactly once, so the hash can be reused by
+# Nurl / Nap instead of re-parsing and re-hashing the URL
+
+from urllib.parse import urljoin, urldefrag, urlparse, urlunparse
+from utils import get_urlhash, normalize
+
+
+# schemes with fast paths (urljoin resolves these relative to the base)
+FAST_SCHEMES = frozenset(("http", "https"))
+
+# stripped / removed by urlparse before parsing (see urllib.parse.urlsplit)
+_LEADING_STRIP = "".join(map(chr, range(0, 33)))
+_UNSAFE_CHARS = ("\t", "\r", "\n")
+
+
+def resolve_url(base_url, href):
+    """Resolves the href against the base URL without fast paths.
+    The absolute URL is defragged and normalized.
+
+    :param base_url str: The base URL
+    :param href str: The href
+    :return: The canonical URL (or None if the href cannot be parsed)
+    :rtype: str | None
+    """
+    try:
+        abs_link = urljoin(base_url, href)
+        abs_link = urldefrag(abs_link).url
+    except ValueError:
+        return None
+    return normalize(abs_link)
+
+
+def _no_dot_segments(path):
+    """Returns whether no segment of the path starts with "." (conservative)."""
+    return not path.startswith(".") and "/." not in path
+
+
+class UrlResolver:
+    """Resolves the hrefs of one page (see the fast paths above).
+
+    base_url    The URL of the page
+
+    Results are cached by href, and hashes by canonical URL,
+    so repeated links of a page are only resolved once.
+
+    """
+    def __init__(self, base_url):
+        self.base_url = base_url
+        self._resolved = dict() # href => (canonical URL, hash) | None
+        self._hashes = dict() # canonical URL => hash
+        self._fast = False
+
+        try:
+            scheme, netloc, path, params, _, _ = urlparse(base_url)
+        except ValueError:
+            return
+        if scheme not in FAST_SCHEMES or not netloc:
+            return
+
+        self._fast = True
+        self._scheme = scheme + ":"
+        self._origin = f"{scheme}://{netloc}"
+        self._noquery = urlunparse((scheme, netloc, path, params, "", ""))
+
+        # urljoin collapses empty segments and resolves dot segments of the
+        # base directory; only take the fast path if there are none
+        directory = path[:path.rfind("/") + 1] or "/"
+        self._directory = None
+        if "//" not in directory and _no_dot_segments(directory):
+            self._directory = self._origin + directory
+
+
+    def _absolute(self, href):
+        """Returns the absolute URL of the href if a fast path applies (or None)."""
+        c = href[:1]
+
+        # fragment-only
+        if c == "#":
+            return self.base_url
+
+        # query-only (an empty query keeps the query of the base URL)
+        if c == "?":
+            if href[1:2] in ("", "#"):
+                return None
+            return self._noquery + href
+
+        path = href.partition("?")[0].partition("#")[0]
+
+        # scheme-relative / root-relative
+        if c == "/":
+            if href[1:2] == "/":
+                if href[2:3] in ("", "/", "?", "#"):
+                    return None
+                return self._scheme + href
+            if _no_dot_segments(path):
+                return self._origin + href
+            return None
+
+        # absolute
+        if href.startswith(("http://", "https://")):
+            start = href.find("//") + 2
+            if href[start:start + 1] in ("", "/", "?", "#"):
+                return None
+            return href
+
+        # relative to the directory of the base URL
+        # (anything with ":" might be a scheme, e.g. "mailto:")
+        if (self._directory is not None
+            and ":" not in path
+            and "//" not in path
+            and _no_dot_segments(path)):
+            return self._directory + href
+
+        return None
+
+
+    def resolve(self, href):
+        """Resolves the href against the base URL.
+
+        :param href str: The href of a link on the page
+        :return: The canonical URL and its hash (or None if the href cannot be parsed)
+        :rtype: (str, str) | None
+        """
+        try:
+            return self._resolved[href]
+        except KeyError:
+            pass
+
+        url = None
+        if self._fast and ";" not in href:
+            stripped = href.lstrip(_LEADING_STRIP)
+            for c in _UNSAFE_CHARS:
+                stripped = stripped.replace(c, "")
+            absolute = self._absolute(stripped) if stripped else self.base_url
+            if absolute is not None:
+                url = normalize(absolute)
+        if url is None:
+            url = resolve_url(self.base_url, href)
+
+        result = None
+        if url is not None:
+            urlhash = self._hashes.get(url, None)
+            if urlhash is None:
+                try:
+                    urlhash = get_urlhash(url)
+                except ValueError:
+                    urlhash = None
+                self._hashes[url] = urlhash
+            if urlhash is not None:
+                result = (url, urlhash)
+
+        self._resolved[href] = result
+        return result
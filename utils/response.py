@@ -1,13 +1,123 @@
+import io
 import pickle
 
+from requests.structures import CaseInsensitiveDict
+
+
+# statuses of redirects (with a Location header)
+REDIRECT_STATUSES = (301, 302, 303, 307, 308)
+
+
+class RawResponse(object):
+    """Compact stand-in for requests.Response.
+    Only keeps what the crawler uses: the status, headers, body and URL.
+
+    Cache server responses are unpickled straight into it (see
+    loads_raw_response), and direct downloads are copied into it once
+    their body is read, so the request, cookies, history and connection
+    of the requests.Response are never kept.
+
+    `content` is the body itself (no copy is made).
+
+    url             The URL of the response
+    status_code     The HTTP status
+    reason          The HTTP reason
+    headers         The headers (case-insensitive, kept as is if they
+                    already are a CaseInsensitiveDict)
+
+    """
+    __slots__ = ("url", "status_code", "reason", "headers", "_content")
+
+    def __init__(self, url, status_code, headers=None, content=b"", reason=""):
+        self.url = url
+        self.status_code = status_code
+        self.reason = reason
+        if not isinstance(headers, CaseInsensitiveDict):
+            headers = CaseInsensitiveDict(headers)
+        self.headers = headers
+        self._content = content
+
+    def __setstate__(self, state):
+        # state of a pickled requests.Response (see requests.Response.__getstate__)
+        self.url = state.get("url", None)
+        self.status_code = state.get("status_code", None)
+        self.reason = state.get("reason", None) or ""
+        headers = state.get("headers", None)
+        self.headers = headers if headers is not None else CaseInsensitiveDict()
+        self._content = state.get("_content", None) or b""
+
+    @property
+    def content(self):
+        return self._content
+
+    @property
+    def is_redirect(self):
+        return self.status_code in REDIRECT_STATUSES and "location" in self.headers
+
+
+class _Discarded(object):
+    """Placeholder for unpickled objects that are never used
+    (their state is dropped as soon as it is loaded).
+    """
+    __slots__ = ()
+
+    def __new__(cls, *args, **kwargs):
+        return _DISCARDED
+
+    def __init__(self, *args, **kwargs):
+        pass
+
+    def __setstate__(self, state):
+        pass
+
+
+_DISCARDED = object.__new__(_Discarded)
+
+# classes of a pickled requests.Response => classes they are loaded as
+_RAW_CLASSES = {
+    ("requests.models", "Response"): RawResponse,
+    ("requests.models", "PreparedRequest"): _Discarded,
+    ("requests.cookies", "RequestsCookieJar"): _Discarded,
+    ("http.cookiejar", "Cookie"): _Discarded,
+    ("datetime", "timedelta"): _Discarded,
+}
+
+
+class _RawUnpickler(pickle.Unpickler):
+    def find_class(self, module, name):
+        cls = _RAW_CLASSES.get((module, name), None)
+        if cls is not None:
+            return cls
+        return super().find_class(module, name)
+
+
+def loads_raw_response(data):
+    """Unpickles a requests.Response (pickled by the cache server)
+    into a RawResponse. Other pickled objects are loaded as is.
+
+    :param data bytes: The pickled response
+    :rtype: RawResponse
+    """
+    return _RawUnpickler(io.BytesIO(data)).load()
+
+
 class Response(object):
+    # set by streamed direct downloads (see crawler2/download.py)
+    # aborted: reason the body was not read (or None)
+    # exhash: exhash of the body computed while reading (or None)
+    # retry_after: seconds left on the host's negative cache entry,
+    #   if the download failed on it without a connection (or None)
+    aborted = None
+    exhash = None
+    retry_after = None
+
     def __init__(self, resp_dict):
         self.url = resp_dict["url"]
         self.status = resp_dict["status"]
         self.error = resp_dict["error"] if "error" in resp_dict else None
         try:
             self.raw_response = (
-                pickle.loads(resp_dict["response"])
+                loads_raw_response(resp_dict["response"])
                 if "response" in resp_dict else
                 None)
         except TypeError:
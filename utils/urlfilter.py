@@ -0,0 +1,167 @@
+# utils/urlfilter.py
+#
+# precompiled URL validity filter
+# used by scraper2.is_valid and scraper2.scraper
+#
+# a URL is valid if:
+#   -   its scheme is http or https
+#   -   its path does not end with a file extension in BAD_EXTENSIONS
+#   -   (strict mode) its host is in one of the allowed domains
+#
+# allowed domains are compiled into a trie of reversed host labels
+# (e.g. ".ics.uci.edu" => edu -> uci -> ics), and results are cached per host
+
+from urllib.parse import urlsplit
+import re
+
+
+# allowed domains (from the requirements spec)
+# a leading "." only allows subdomains (".ics.uci.edu" does not allow "ics.uci.edu")
+DEFAULT_DOMAINS = [".ics.uci.edu", ".cs.uci.edu", ".informatics.uci.edu", ".stat.uci.edu"]
+
+BAD_EXTENSIONS = (
+    "css|js|bmp|gif|jpe?g|ico"
+    "|png|tiff?|mid|mp2|mp3|mp4"
+    "|wav|avi|mov|mpeg|ram|m4v|mkv|ogg|ogv|pdf"
+    "|ps|eps|tex|ppt|pptx|doc|docx|xls|xlsx|names"
+    "|data|dat|exe|bz2|tar|msi|bin|7z|psd|dmg|iso"
+    "|epub|dll|cnf|tgz|sha1"
+    "|thmx|mso|arff|rtf|jar|csv"
+    "|rm|smil|wmv|swf|wma|zip|rar|gz"
+)
+BAD_EXTENSIONS_RE = re.compile(rf"\.(?:{BAD_EXTENSIONS})$")
+
+SCHEMES = frozenset(("http", "https"))
+
+# trie node markers (not strings, so they never collide with labels)
+_DOMAIN = 0 # the domain itself is allowed
+_SUBDOMAINS = 1 # subdomains of the domain are allowed
+
+
+def _host(netloc):
+    """Returns the lowercased host of the netloc (without userinfo and port)."""
+    host = netloc.rpartition("@")[2]
+    if host.startswith("["):
+        return host.partition("]")[0][1:].lower()
+    return host.partition(":")[0].lower()
+
+
+class UrlFilter:
+    """URL validity filter.
+
+    domains     Allowed domains (see DEFAULT_DOMAINS)
+
+    The domains are compiled into a trie of reversed host labels.
+    Results are cached per host.
+
+    """
+    def __init__(self, domains=None):
+        self.domains = [d.strip().lower() for d in (DEFAULT_DOMAINS if domains is None else domains) if d.strip()]
+        self._trie = dict()
+        self._host_cache = dict()
+
+        for domain in self.domains:
+            node = self._trie
+            for label in reversed(domain.lstrip(".").split(".")):
+                node = node.setdefault(label, dict())
+            node[_SUBDOMAINS] = True
+            if not domain.startswith("."):
+                node[_DOMAIN] = True
+
+
+    @classmethod
+    def from_option(cls, option):
+        """Creates a URL filter from the DOMAINS option of config.ini.
+
+            DOMAINS = .ics.uci.edu,.cs.uci.edu,...
+
+        A missing option uses the defaults.
+
+        :param option str: The option value (or None)
+        :rtype: UrlFilter
+        """
+        if option is None:
+            return cls()
+        return cls(option.split(","))
+
+
+    def allows_host(self, host):
+        """Returns whether the host is in one of the allowed domains (cached).
+
+        :param host str: The lowercased host
+        :rtype: bool
+        """
+        allowed = self._host_cache.get(host, None)
+        if allowed is None:
+            allowed = self._match(host)
+            self._host_cache[host] = allowed
+        return allowed
+
+
+    def _match(self, host):
+        """Walks the trie with the reversed labels of the host."""
+        node = self._trie
+        labels = host.split(".")
+        for i in range(len(labels) - 1, -1, -1):
+            node = node.get(labels[i], None)
+            if node is None:
+                return False
+            # labels are left, so the host is a subdomain of this node
+            if i > 0 and _SUBDOMAINS in node:
+                return True
+        return _DOMAIN in node
+
+
+    def is_valid(self, url, strict=True):
+        """Decide whether to crawl this url or not.
+
+        :param url str: The URL
+        :param strict bool: Whether the host must be in an allowed domain
+        :rtype: bool
+        """
+        try:
+            scheme, netloc, path, _, _ = urlsplit(url)
+        except ValueError:
+            return False
+
+        if scheme not in SCHEMES:
+            return False
+
+        # Strict mode
+        # Only consider URLs that meet the requirements spec
+        if strict and not self.allows_host(_host(netloc)):
+            return False
+
+        # Ignore paths that end with file extensions
+        # (parameters of the last path segment are not part of the path)
+        if ";" in path:
+            semi = path.find(";", max(path.rfind("/"), 0))
+            if semi >= 0:
+                path = path[:semi]
+        return not BAD_EXTENSIONS_RE.search(path.lower())
+
+
+    def filter(self, urls, strict=True):
+        """Returns the valid URLs (see is_valid) in order.
+        Used to validate every link of a page at once.
+
+        :param urls Iterable[str]: The URLs
+        :param strict bool: Whether the host must be in an allowed domain
+        :rtype: list[str]
+        """
+        is_valid = self.is_valid
+        return [url for url in urls if is_valid(url, strict)]
+
+
+# the filter used by scraper2
+# replaced by configure(...) when the crawler starts
+URL_FILTER = UrlFilter()
+
+
+def configure(option):
+    """Replaces the URL filter used by scraper2.
+
+    :param option str: The DOMAINS option of config.ini (or None)
+    """
+    global URL_FILTER
+    URL_FILTER = UrlFilter.from_option(option)